@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class WimsConfig(AppConfig):
+    name = 'wims'
+
+    def ready(self):
+        from . import signals  # noqa: F401  Register signal handlers
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wims.settings')
 
 application = get_asgi_application()
+
+# Optional in-process reservation expiry (RESERVATION_SWEEP_INTERVAL); imported once apps are loaded
+from wims.utils.reservations import start_sweeper  # noqa: E402
+
+start_sweeper()
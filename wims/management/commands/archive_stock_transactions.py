@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from wims.models import StockTransactions
+from wims.utils.ledger_archive import archive_cutoff, archive_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Move StockTransactions rows from whole months older than LEDGER_ARCHIVE_AFTER_DAYS into "
+        "StockTransactionArchive, leaving one OPENING balance row per placement. Safe to run while "
+        "stock is moving; schedule it monthly (e.g. from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help=f"Archive horizon in days (default {settings.LEDGER_ARCHIVE_AFTER_DAYS})")
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help=f"Placements per transaction (default {settings.LEDGER_ARCHIVE_CHUNK_SIZE})")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be archived")
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError("--days must not be negative")
+        cutoff = archive_cutoff(options['days'])
+        self.stdout.write(f"Archiving ledger rows dated before {cutoff:%Y-%m-%d %H:%M %Z}")
+
+        if options['dry_run']:
+            old = StockTransactions.objects.filter(transaction_date__lt=cutoff).order_by()
+            totals = old.aggregate(rows=Count('pk'), placements=Count('stock_id', distinct=True))
+            self.stdout.write(f"Would archive {totals['rows']} rows of {totals['placements']} placements")
+            return
+
+        placements = rows = 0
+        for chunk_placements, chunk_rows in archive_ledger(cutoff, options['chunk_size']):
+            placements += chunk_placements
+            rows += chunk_rows
+            self.stdout.write(f"Archived {rows} rows of {placements} placements")
+        remaining = StockTransactions.objects.count()
+        self.stdout.write(self.style.SUCCESS(f"Ledger archived: {rows} rows moved, {remaining} rows left in the hot table"))
@@ -0,0 +1,181 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from wims.models import (
+    Category, Customer, Order, Product, StockTransactions, Supplier, Warehouse, WarehouseLocation,
+    WarehouseStockPlacement,
+)
+
+# (label, model, index name, queryset built from a sample row)
+HOT_QUERIES = [
+    ("placement lookup (product, warehouse, location)", WarehouseStockPlacement, 'placement_lookup_idx',
+     lambda s: WarehouseStockPlacement.objects.filter(
+         product_id=s['product_id'], warehouse_id=s['warehouse_id'], location_id=s['location_id'])[:1]),
+    ("placement list by last_updated", WarehouseStockPlacement, 'placement_updated_idx',
+     lambda s: WarehouseStockPlacement.objects.order_by('-last_updated', '-pk')[:50]),
+    ("ledger of one placement", StockTransactions, 'ledger_stock_date_idx',
+     lambda s: StockTransactions.objects.filter(stock_id=s['stock_id']).order_by('-transaction_date')[:50]),
+    ("ledger list by transaction_date", StockTransactions, 'ledger_date_idx',
+     lambda s: StockTransactions.objects.order_by('-transaction_date', '-pk')[:50]),
+    ("customer order history", Order, 'order_customer_date_idx',
+     lambda s: Order.objects.filter(customer_id=s['customer_id']).order_by('-order_date')[:50]),
+    ("orders by status", Order, 'order_status_date_idx',
+     lambda s: Order.objects.filter(status='Reserved').order_by('-order_date')[:50]),
+    ("order list by order_date", Order, 'order_date_idx',
+     lambda s: Order.objects.order_by('-order_date', '-pk')[:50]),
+    ("active products by name", Product, 'product_active_name_idx',
+     lambda s: Product.objects.filter(is_active=True).order_by('name', 'pk')[:50]),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot query paths and show their EXPLAIN plans with and without the composite indexes "
+        "declared on the models. Use --seed to generate volume first (e.g. --seed 10000000 on a scratch "
+        "database; the rows stay unless --drop-seed is given)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Generate N ledger rows (N/10 orders, N/100 placements, N/1000 products)")
+        parser.add_argument('--drop-seed', action='store_true', help="Delete the generated rows afterwards")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per query")
+        parser.add_argument('--explain', action='store_true', help="Print the full EXPLAIN output")
+        parser.add_argument('--only', default='', help="Comma-separated index names to benchmark")
+
+    def handle(self, *args, **options):
+        tag = None
+        if options['seed']:
+            tag = self._seed(options['seed'])
+        try:
+            sample = self._sample()
+            only = {name.strip() for name in options['only'].split(',') if name.strip()}
+            for label, model, index_name, build in HOT_QUERIES:
+                if only and index_name not in only:
+                    continue
+                self._compare(label, model, index_name, lambda: build(sample), options)
+        finally:
+            if tag and options['drop_seed']:
+                self._drop_seed(tag)
+
+    def _sample(self):
+        placement = WarehouseStockPlacement.objects.values('stock_id', 'product_id', 'warehouse_id', 'location_id').order_by('?').first()
+        customer_id = Order.objects.values_list('customer_id', flat=True).order_by('?').first()
+        if placement is None or customer_id is None:
+            raise CommandError("Need placements and orders to benchmark; load data or pass --seed N")
+        return dict(placement, customer_id=customer_id)
+
+    def _index_exists(self, model, index_name):
+        with connection.cursor() as cursor:
+            return index_name in connection.introspection.get_constraints(cursor, model._meta.db_table)
+
+    def _measure(self, build, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(build())
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), build().explain()
+
+    def _compare(self, label, model, index_name, build, options):
+        index = next(index for index in model._meta.indexes if index.name == index_name)
+        present = self._index_exists(model, index_name)
+        results = {}
+        try:
+            # Measure the current state first, then toggle the index and measure again
+            for state in (present, not present):
+                if state != self._index_exists(model, index_name):
+                    with connection.schema_editor() as editor:
+                        (editor.add_index if state else editor.remove_index)(model, index)
+                results[state] = self._measure(build, options['repeat'])
+        finally:
+            if self._index_exists(model, index_name) != present:
+                with connection.schema_editor() as editor:
+                    (editor.add_index if present else editor.remove_index)(model, index)
+
+        (without_ms, without_plan), (with_ms, with_plan) = results[False], results[True]
+        speedup = without_ms / with_ms if with_ms else float('inf')
+        self.stdout.write(
+            f"{label} [{index_name}{'' if present else ', not yet migrated'}]: "
+            f"{without_ms:.2f} ms -> {with_ms:.2f} ms ({speedup:.1f}x)"
+        )
+        for name, plan in (("without", without_plan), ("with", with_plan)):
+            lines = plan.splitlines()
+            shown = lines if options['explain'] else lines[:2]
+            for line in shown:
+                self.stdout.write(f"    {name:>7}: {line}")
+
+    def _seed(self, ledger_rows):
+        tag = f"idx-bench-{time.time_ns()}"
+        rng = random.Random(0)
+        now = timezone.now()
+        product_count = max(ledger_rows // 1000, 10)
+        placement_count = max(ledger_rows // 100, 20)
+        order_count = max(ledger_rows // 10, 50)
+        batch = 5000
+
+        category = Category.objects.create(name_category=tag)
+        supplier = Supplier.objects.create(name_company=tag)
+        warehouses = [Warehouse.objects.create(name=f"{tag}-{i}", address=tag) for i in range(4)]
+        locations = [
+            WarehouseLocation.objects.create(warehouse=warehouse, section_name=f"{tag[-20:]}-{i}", storage_type='Shelf',
+                                             capacity_class='Large', max_capacity=10 ** 9)
+            for warehouse in warehouses for i in range(25)
+        ]
+        Product.objects.bulk_create(
+            [Product(name=f"{tag} product {i}", category=category, supplier=supplier, sku=f"{tag[-30:]}-{i}",
+                     barcode=f"{tag[-30:]}-B{i}", price=1, is_active=rng.random() < 0.9)
+             for i in range(product_count)],
+            batch_size=batch,
+        )
+        product_ids = list(Product.objects.filter(category=category).values_list('pk', flat=True))
+        self.stdout.write(f"Seeded {len(product_ids)} products")
+
+        # Placements are bulk created, so no signals: StockLevel/alerts are not maintained for them
+        for start in range(0, placement_count, batch):
+            placements = []
+            for i in range(start, min(start + batch, placement_count)):
+                location = rng.choice(locations)
+                placements.append(WarehouseStockPlacement(
+                    warehouse_id=location.warehouse_id, product_id=rng.choice(product_ids), location=location,
+                    category=category, quantity=rng.randint(0, 500), storage_type='shelf', batch_number=f"{tag[-30:]}-{i}",
+                ))
+            WarehouseStockPlacement.objects.bulk_create(placements)
+        stock_ids = list(WarehouseStockPlacement.objects.filter(category=category).values_list('pk', flat=True))
+        self.stdout.write(f"Seeded {len(stock_ids)} placements")
+
+        for start in range(0, ledger_rows, batch):
+            StockTransactions.objects.bulk_create([
+                StockTransactions(stock_id=rng.choice(stock_ids), transaction_type=rng.choice(('INBOUND', 'OUTBOUND')),
+                                  quantity=rng.randint(1, 20))
+                for _ in range(start, min(start + batch, ledger_rows))
+            ])
+        self.stdout.write(f"Seeded {ledger_rows} ledger rows")
+
+        customers = Customer.objects.bulk_create(
+            [Customer(full_name=f"{tag[-30:]}-{i}") for i in range(max(order_count // 20, 5))]
+        )
+        customer_ids = list(Customer.objects.filter(full_name__startswith=tag[-30:]).values_list('pk', flat=True))
+        statuses = [status for status, _ in Order.STATUS_CHOICES]
+        for start in range(0, order_count, batch):
+            Order.objects.bulk_create([
+                Order(customer_id=rng.choice(customer_ids), status=rng.choice(statuses), pos_terminal_id=tag[-50:],
+                      order_date=now - timedelta(minutes=rng.randint(0, 525600)))
+                for _ in range(start, min(start + batch, order_count))
+            ])
+        self.stdout.write(f"Seeded {order_count} orders for {len(customers)} customers")
+        return tag
+
+    def _drop_seed(self, tag):
+        Order.objects.filter(pos_terminal_id=tag[-50:]).delete()
+        Customer.objects.filter(full_name__startswith=tag[-30:]).delete()
+        Product.objects.filter(category__name_category=tag).delete()
+        Warehouse.objects.filter(name__startswith=tag).delete()
+        Category.objects.filter(name_category=tag).delete()
+        Supplier.objects.filter(name_company=tag).delete()
+        self.stdout.write("Dropped seeded rows")
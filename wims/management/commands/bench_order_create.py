@@ -0,0 +1,87 @@
+import statistics
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from wims.models import Category, Customer, Product, Supplier, Warehouse, WarehouseLocation, WarehouseStockPlacement
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure POST /api/orders/ query count and latency against the number of order lines. "
+        "Runs on generated data inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', default='1,10,50,200', help="Comma-separated line counts")
+        parser.add_argument('--batches', type=int, default=3, help="Placements (batches) per product")
+        parser.add_argument('--warehouses', type=int, default=1,
+                            help="Spread the batches over this many warehouses; above 1 the lines name no warehouse")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        line_counts = [int(value) for value in options['lines'].split(',')]
+        try:
+            with transaction.atomic():
+                self._run(line_counts, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, line_counts, options):
+        tag = f"order-bench-{time.time_ns()}"
+        products_needed = max(line_counts)
+        category = Category.objects.create(name_category=tag)
+        supplier = Supplier.objects.create(name_company=tag)
+        warehouses = [Warehouse.objects.create(name=f"{tag} {i}", address=tag) for i in range(options['warehouses'])]
+        locations = [
+            WarehouseLocation.objects.create(warehouse=warehouse, section_name=tag[-40:], storage_type='Shelf',
+                                             capacity_class='Large', max_capacity=10 ** 9)
+            for warehouse in warehouses
+        ]
+        Product.objects.bulk_create([
+            Product(name=f"{tag} {i}", category=category, supplier=supplier, sku=f"{tag[-30:]}-{i}",
+                    barcode=f"{tag[-30:]}-B{i}", price=1)
+            for i in range(products_needed)
+        ])
+        products = list(Product.objects.filter(category=category).order_by('pk'))
+        WarehouseStockPlacement.objects.bulk_create([
+            WarehouseStockPlacement(warehouse_id=location.warehouse_id, product=product, location=location, category=category,
+                                    quantity=10 ** 6, storage_type='shelf', batch_number=f"{product.pk}-{batch}")
+            for product in products for batch in range(options['batches'])
+            for location in [locations[(product.pk + batch) % len(locations)]]
+        ])
+        # bulk_create skips the signals that keep StockLevel in step
+        call_command('rebuild_stock_levels', stdout=StringIO())
+        customer = Customer.objects.create(full_name=tag[-40:])
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create(username=tag[-40:]))
+
+        self.stdout.write(f"{'lines':>6} {'queries':>8} {'median ms':>10} {'ms/line':>8}")
+        for count in line_counts:
+            items = [{'product': product.pk, 'quantity': 2} for product in products[:count]]
+            if len(warehouses) == 1:
+                for item in items:
+                    item['warehouse'] = warehouses[0].pk
+            payload = {'customer': customer.pk, 'items': items}
+            timings = []
+            for _ in range(options['repeat']):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.post('/api/orders/', payload, format='json')
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 201:
+                    self.stderr.write(f"Order with {count} lines failed: {response.status_code} {response.data}")
+                    return
+            median = statistics.median(timings)
+            self.stdout.write(f"{count:>6} {len(queries.captured_queries):>8} {median:>10.1f} {median / count:>8.2f}")
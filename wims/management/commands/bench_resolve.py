@@ -0,0 +1,58 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from wims.models import Category, Product, Supplier
+from wims.utils.barcode_resolver import resolve_codes, resolver_cache
+
+
+class Command(BaseCommand):
+    help = "Benchmark barcode/SKU resolution (scans per second for one worker), cold vs cached."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Create N throwaway products (rolled back afterwards)")
+        parser.add_argument('--duration', type=float, default=5.0, help="Seconds per scenario")
+        parser.add_argument('--batch', type=int, default=1, help="Codes resolved per call")
+        parser.add_argument('--sample', type=int, default=10000, help="Distinct barcodes to scan")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self._seed(options['seed'])
+            barcodes = list(Product.objects.values_list('barcode', flat=True)[:options['sample']])
+            if not barcodes:
+                raise CommandError("No products to scan; load data or pass --seed N")
+
+            for label, warm in (("cold (database)", False), ("cached", True)):
+                resolver_cache.clear()
+                if warm:
+                    for start in range(0, len(barcodes), 500):
+                        resolve_codes(barcodes[start:start + 500])
+                scans, elapsed = self._run(barcodes, options['batch'], options['duration'], clear=not warm)
+                self.stdout.write(
+                    f"{label:>16}: {scans / elapsed:,.0f} scans/s "
+                    f"({scans} scans in {elapsed:.2f}s, batch={options['batch']})"
+                )
+            transaction.set_rollback(True)
+
+    def _run(self, barcodes, batch, duration, clear):
+        scans = 0
+        started = time.perf_counter()
+        deadline = started + duration
+        while time.perf_counter() < deadline:
+            if clear:
+                resolver_cache.clear()
+            resolve_codes(random.sample(barcodes, min(batch, len(barcodes))))
+            scans += batch
+        return scans, time.perf_counter() - started
+
+    def _seed(self, count):
+        category, _ = Category.objects.get_or_create(name_category='Benchmark')
+        supplier, _ = Supplier.objects.get_or_create(name_company='Benchmark')
+        Product.objects.bulk_create(
+            [Product(name=f"Bench {i}", category=category, supplier=supplier, sku=f"BENCH{i}",
+                     barcode=f"BENCH-BC-{i}", price=1) for i in range(count)],
+            batch_size=1000,
+        )
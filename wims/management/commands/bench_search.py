@@ -0,0 +1,68 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from wims.models import Category, Product, Supplier
+from wims.utils.product_search import index_products, ranked_products, search_products
+
+WORDS = ['steel', 'cable', 'bolt', 'screw', 'usb', 'charger', 'milk', 'rice', 'paper', 'box', 'tape', 'glue',
+         'lamp', 'bulb', 'fan', 'filter', 'pump', 'valve', 'hose', 'drill', 'blade', 'sensor', 'switch', 'plug']
+
+
+class Command(BaseCommand):
+    help = "Measure product search latency (index scan + ranking + page fetch)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Create N throwaway products (rolled back afterwards)")
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self._seed(options['seed'])
+            total = Product.objects.count()
+            if not total:
+                raise CommandError("No products to search; load data or pass --seed N")
+
+            skus = list(Product.objects.values_list('sku', flat=True)[:1000])
+            queries = []
+            for _ in range(options['queries']):
+                kind = random.random()
+                if kind < 0.3:
+                    sku = random.choice(skus)
+                    queries.append(sku[:max(3, len(sku) - 2)])
+                elif kind < 0.6:
+                    queries.append(random.choice(WORDS)[:3])
+                else:
+                    queries.append(' '.join(random.sample(WORDS, 2)))
+
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                ranked_products(list(search_products(query)[:options['page_size']]))
+                timings.append((time.perf_counter() - started) * 1000)
+
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            self.stdout.write(
+                f"{connection.vendor}, {total:,} products, {len(timings)} queries: "
+                f"median {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms, max {timings[-1]:.2f} ms"
+            )
+            transaction.set_rollback(True)
+
+    def _seed(self, count):
+        category, _ = Category.objects.get_or_create(name_category='Benchmark')
+        supplier, _ = Supplier.objects.get_or_create(name_company='Benchmark')
+        for start in range(0, count, 5000):
+            batch = [
+                Product(name=' '.join(random.sample(WORDS, 3)) + f" {i}", category=category, supplier=supplier,
+                        sku=f"BS{i:08d}", barcode=f"BB{i:012d}", price=1)
+                for i in range(start, min(start + 5000, count))
+            ]
+            Product.objects.bulk_create(batch)
+            index_products(Product.objects.filter(sku__in=[p.sku for p in batch]).only('product_id', 'name', 'sku', 'barcode'))
+            self.stdout.write(f"Seeded {min(start + 5000, count):,} products")
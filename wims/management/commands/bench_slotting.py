@@ -0,0 +1,59 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from wims.models import Warehouse, WarehouseLocation
+from wims.utils.slotting import slotting_index, suggest_locations
+
+
+class Command(BaseCommand):
+    help = (
+        "Time /stock-placements/suggest-location/ lookups against a generated warehouse "
+        "(default 100k locations). Everything runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=100000)
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        storage_types = [value for value, _ in WarehouseLocation.STORAGE_TYPES]
+        capacity_classes = [value for value, _ in WarehouseLocation.CAPACITY_CLASSES]
+
+        with transaction.atomic():
+            warehouse = Warehouse.objects.create(name=f"slotting-bench-{time.time_ns()}", address="bench")
+            for start in range(0, options['locations'], 5000):
+                locations = []
+                for i in range(start, min(start + 5000, options['locations'])):
+                    capacity = rng.choice((100, 500, 1000, 5000))
+                    locations.append(WarehouseLocation(
+                        warehouse=warehouse, section_name=f"B-{i}", storage_type=rng.choice(storage_types),
+                        capacity_class=rng.choice(capacity_classes), max_capacity=capacity,
+                        occupied_quantity=rng.randint(0, capacity), placement_count=rng.randint(0, 8),
+                    ))
+                WarehouseLocation.objects.bulk_create(locations)
+            self.stdout.write(f"Seeded {options['locations']} locations")
+
+            slotting_index.clear()
+            started = time.perf_counter()
+            slotting_index.snapshot(warehouse.pk)
+            self.stdout.write(f"Snapshot build: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+            timings = []
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                suggest_locations(warehouse.pk, rng.randint(1, 400), storage_type=rng.choice(storage_types),
+                                  weight=rng.randint(0, 100))
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(timings)} suggestions: median {statistics.median(timings):.2f} ms, p99 {p99:.2f} ms"
+            ))
+
+            slotting_index.clear()
+            transaction.set_rollback(True)
@@ -0,0 +1,184 @@
+import multiprocessing
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import Sum
+from rest_framework import serializers
+
+from wims.models import (
+    Category, Product, StockLevel, StockTransactions, Supplier, Warehouse, WarehouseLocation, WarehouseStockPlacement,
+)
+from wims.utils.ledger_archive import signed_quantity
+from wims.utils.stock import PLACEMENT_KEY_FIELDS, apply_transaction
+
+
+def _naive_move(placement, kind, quantity):
+    # The pre-F() pattern: read, modify in Python, save the whole row back
+    stock = WarehouseStockPlacement.objects.get(stock_id=placement.pk)
+    if kind == 'OUTBOUND' and stock.quantity - stock.reserved_quantity < quantity:
+        raise serializers.ValidationError("Insufficient stock")
+    stock.quantity += quantity if kind == 'INBOUND' else -quantity
+    stock.save()
+
+
+def _worker(stock_ids, ops, max_quantity, seed, naive):
+    rng = random.Random(seed)
+    placements = WarehouseStockPlacement.objects.only(*PLACEMENT_KEY_FIELDS).in_bulk(stock_ids)
+    tally = Counter()
+    net = Counter()
+    try:
+        for _ in range(ops):
+            placement = placements[rng.choice(stock_ids)]
+            kind = rng.choice(('INBOUND', 'OUTBOUND'))
+            quantity = rng.randint(1, max_quantity)
+            try:
+                with transaction.atomic():
+                    if naive:
+                        _naive_move(placement, kind, quantity)
+                    else:
+                        apply_transaction(placement, kind, quantity)
+                    StockTransactions.objects.create(stock_id=placement.pk, transaction_type=kind, quantity=quantity)
+            except serializers.ValidationError:
+                tally['rejected'] += 1
+                continue
+            except OperationalError:
+                # SQLite serialises writers and may time out under contention
+                tally['lock_errors'] += 1
+                continue
+            tally['applied'] += 1
+            net[placement.pk] += quantity if kind == 'INBOUND' else -quantity
+    finally:
+        connections.close_all()
+    return tally, net
+
+
+def _process_main(queue, stock_ids, ops, max_quantity, seed, naive, threads):
+    queue.put(_run_threads(stock_ids, ops, max_quantity, seed, naive, threads))
+
+
+def _run_threads(stock_ids, ops, max_quantity, seed, naive, threads):
+    tally, net = Counter(), Counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(_worker, stock_ids, ops, max_quantity, seed * 1000 + i, naive) for i in range(threads)]
+        for future in futures:
+            worker_tally, worker_net = future.result()
+            tally.update(worker_tally)
+            net.update(worker_net)
+    return tally, net
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress stock movements from concurrent threads/processes and verify that no update is lost: "
+        "final quantity == initial + sum of applied movements == ledger total, and never negative."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Worker threads (per process)")
+        parser.add_argument('--processes', type=int, default=0, help="Forked worker processes (0 = threads in this process)")
+        parser.add_argument('--ops', type=int, default=200, help="Movements per worker")
+        parser.add_argument('--placements', type=int, default=4, help="Hot placements shared by all workers")
+        parser.add_argument('--initial', type=int, default=50, help="Starting quantity per placement")
+        parser.add_argument('--max-quantity', type=int, default=5, help="Largest single movement")
+        parser.add_argument('--naive', action='store_true', help="Use read-modify-write saves instead, for comparison")
+
+    def handle(self, *args, **options):
+        # Workers use their own connections, so the fixture is committed and removed afterwards
+        fixture = self._create_fixture(options['placements'], options['initial'])
+        stock_ids = [placement.pk for placement in fixture['placements']]
+        try:
+            started = time.perf_counter()
+            tally, net = self._run(stock_ids, options)
+            elapsed = time.perf_counter() - started
+            self._report(stock_ids, options, tally, net, elapsed)
+        finally:
+            self._drop_fixture(fixture)
+
+    def _run(self, stock_ids, options):
+        args = (stock_ids, options['ops'], options['max_quantity'])
+        if not options['processes']:
+            return _run_threads(*args, 1, options['naive'], options['threads'])
+
+        connections.close_all()  # Never share a connection across fork()
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        processes = [
+            context.Process(target=_process_main, args=(queue, *args, i + 1, options['naive'], options['threads']))
+            for i in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        tally, net = Counter(), Counter()
+        for _ in processes:
+            process_tally, process_net = queue.get()
+            tally.update(process_tally)
+            net.update(process_net)
+        for process in processes:
+            process.join()
+        return tally, net
+
+    def _report(self, stock_ids, options, tally, net, elapsed):
+        workers = options['threads'] * max(options['processes'], 1)
+        attempted = sum(tally.values())
+        self.stdout.write(
+            f"{'naive' if options['naive'] else 'atomic'}: {workers} workers, {attempted} attempts in {elapsed:.2f}s "
+            f"({tally['applied'] / elapsed:,.0f} mutations/s); applied={tally['applied']} "
+            f"rejected={tally['rejected']} lock_errors={tally['lock_errors']}"
+        )
+
+        ledger = dict(
+            StockTransactions.objects.filter(stock_id__in=stock_ids).values_list('stock_id')
+            .annotate(total=Sum(signed_quantity()))
+        )
+        problems = []
+        for stock_id, quantity in WarehouseStockPlacement.objects.filter(stock_id__in=stock_ids).values_list('stock_id', 'quantity'):
+            expected = options['initial'] + net[stock_id]
+            if quantity != expected or quantity != options['initial'] + ledger.get(stock_id, 0) or quantity < 0:
+                problems.append(
+                    f"placement {stock_id}: quantity={quantity} expected={expected} "
+                    f"ledger={options['initial'] + ledger.get(stock_id, 0)}"
+                )
+
+        on_hand = sum(WarehouseStockPlacement.objects.filter(stock_id__in=stock_ids).values_list('quantity', flat=True))
+        level = StockLevel.objects.filter(product__stock_placements__stock_id=stock_ids[0]).values_list('on_hand', flat=True).first()
+        if level != on_hand:
+            problems.append(f"stock level on_hand={level} but placements hold {on_hand}")
+
+        if not problems:
+            self.stdout.write(self.style.SUCCESS("Invariants hold: no lost updates, no negative stock, stock level in step"))
+            return
+        for problem in problems:
+            self.stdout.write(self.style.WARNING(problem))
+        if not options['naive']:
+            raise CommandError(f"{len(problems)} placement(s) drifted from their ledger")
+
+    def _create_fixture(self, count, initial):
+        tag = f"bench-{time.time_ns()}"
+        category = Category.objects.create(name_category=tag)
+        supplier = Supplier.objects.create(name_company=tag)
+        warehouse = Warehouse.objects.create(name=tag, address=tag)
+        location = WarehouseLocation.objects.create(
+            warehouse=warehouse, section_name=tag[:50], storage_type='Shelf', capacity_class='Large', max_capacity=10 ** 9,
+        )
+        product = Product.objects.create(
+            name=tag, category=category, supplier=supplier, sku=tag[:50], barcode=tag[:50], price=1,
+        )
+        placements = [
+            WarehouseStockPlacement.objects.create(
+                warehouse=warehouse, product=product, location=location, category=category, quantity=initial,
+                storage_type='shelf', batch_number=f"{tag}-{i}"[:50],
+            )
+            for i in range(count)
+        ]
+        return {'category': category, 'supplier': supplier, 'warehouse': warehouse, 'product': product, 'placements': placements}
+
+    def _drop_fixture(self, fixture):
+        # Cascades remove the placements, their ledger rows and the location
+        fixture['product'].delete()
+        fixture['warehouse'].delete()
+        fixture['category'].delete()
+        fixture['supplier'].delete()
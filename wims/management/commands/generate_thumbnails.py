@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from wims.models import Product
+from wims.utils.thumbnails import generate_product_variants, needs_variants
+
+
+class Command(BaseCommand):
+    help = "Generate missing or stale image variants for products (synchronously)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate variants even if they look current")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).only('product_id', 'image', 'image_variants')
+        done = 0
+        for product in products.iterator(chunk_size=500):
+            if options['force'] or needs_variants(product):
+                generate_product_variants(product.product_id, product.image.name)
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {done} products"))
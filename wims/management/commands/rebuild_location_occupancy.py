@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from wims.models import WarehouseLocation, WarehouseStockPlacement
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute WarehouseLocation occupancy counters from WarehouseStockPlacement (needed once for data "
+        "that predates the counters). Run it when stock is not moving."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drifted locations")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            totals = {
+                row['location_id']: row
+                for row in (WarehouseStockPlacement.objects.order_by().values('location_id')
+                            .annotate(quantity=Sum('quantity'), weight=Sum('weight'), count=Count('pk')))
+            }
+            drifted = []
+            over_capacity = 0
+            for location in WarehouseLocation.objects.all():
+                row = totals.get(location.pk, {'quantity': 0, 'weight': 0, 'count': 0})
+                values = {
+                    'occupied_quantity': row['quantity'] or 0,
+                    'occupied_weight': row['weight'] or 0,
+                    'placement_count': row['count'],
+                }
+                over_capacity += values['occupied_quantity'] > location.max_capacity
+                if any(getattr(location, name) != value for name, value in values.items()):
+                    for name, value in values.items():
+                        setattr(location, name, value)
+                    drifted.append(location)
+
+            self.stdout.write(f"{len(drifted)} locations drifted, {over_capacity} over capacity")
+            if options['dry_run']:
+                return
+            WarehouseLocation.objects.bulk_update(drifted, list(WarehouseLocation.COUNTER_FIELDS), batch_size=1000)
+        self.stdout.write(self.style.SUCCESS("Location occupancy rebuilt"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from wims.models import Product
+from wims.utils.product_search import index_products
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search token index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        queryset = Product.objects.order_by('pk').only('product_id', 'name', 'sku', 'barcode')
+        last_pk = 0
+        total = 0
+        while True:
+            products = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not products:
+                break
+            index_products(products)
+            total += len(products)
+            last_pk = products[-1].pk
+            self.stdout.write(f"Indexed {total} products")
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt for {total} products"))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from wims.models import StockLevel, WarehouseStockPlacement
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the StockLevel summary from WarehouseStockPlacement and repair rows that drifted. "
+        "Run it when stock is not moving; movements committed during the run can be missed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drifted rows")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = {
+                (row['product_id'], row['warehouse_id']): row
+                for row in (WarehouseStockPlacement.objects.order_by()
+                            .values('product_id', 'warehouse_id')
+                            .annotate(on_hand=Sum('quantity'), reserved=Sum('reserved_quantity'),
+                                      available=Sum(F('quantity') - F('reserved_quantity')), weight=Sum('weight')))
+            }
+            current = {(level.product_id, level.warehouse_id): level for level in StockLevel.objects.all()}
+
+            now = timezone.now()
+            to_create, to_update = [], []
+            for key, row in expected.items():
+                level = current.get(key)
+                values = {name: row[name] for name in ('on_hand', 'reserved', 'available', 'weight')}
+                if level is None:
+                    to_create.append(StockLevel(product_id=key[0], warehouse_id=key[1], **values))
+                elif any(getattr(level, name) != value for name, value in values.items()):
+                    for name, value in values.items():
+                        setattr(level, name, value)
+                    level.updated_at = now
+                    to_update.append(level)
+            orphans = [level.pk for key, level in current.items() if key not in expected]
+
+            self.stdout.write(
+                f"{len(expected)} product/warehouse pairs: {len(to_create)} missing, "
+                f"{len(to_update)} drifted, {len(orphans)} without placements"
+            )
+            if options['dry_run']:
+                return
+            StockLevel.objects.bulk_create(to_create, batch_size=1000)
+            StockLevel.objects.bulk_update(to_update, ['on_hand', 'reserved', 'available', 'weight', 'updated_at'], batch_size=1000)
+            StockLevel.objects.filter(pk__in=orphans).delete()
+        self.stdout.write(self.style.SUCCESS("Stock levels rebuilt"))
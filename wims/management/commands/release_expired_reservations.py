@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+
+from wims.models import OrderItem
+from wims.utils.reservations import expired_orders, expiry_cutoff, release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        "Cancel orders that have been Reserved for longer than RESERVATION_TTL and give their reserved "
+        "stock back, in short per-chunk transactions. Schedule it every few minutes (e.g. from cron), "
+        "or set RESERVATION_SWEEP_INTERVAL to run it inside the web workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, default=None,
+                            help=f"Reservation lifetime in seconds (default {settings.RESERVATION_TTL})")
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help=f"Orders per transaction (default {settings.RESERVATION_SWEEP_CHUNK_SIZE})")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be released")
+
+    def handle(self, *args, **options):
+        if options['ttl'] is not None and options['ttl'] < 0:
+            raise CommandError("--ttl must not be negative")
+        cutoff = expiry_cutoff(options['ttl'])
+        self.stdout.write(f"Releasing orders reserved before {cutoff:%Y-%m-%d %H:%M:%S %Z}")
+
+        if options['dry_run']:
+            items = OrderItem.objects.filter(order__in=expired_orders(cutoff), stock__isnull=False).order_by()
+            totals = items.aggregate(orders=Count('order_id', distinct=True), units=Sum('quantity'))
+            self.stdout.write(f"Would cancel {totals['orders']} orders holding {totals['units'] or 0} reserved units")
+            return
+
+        orders = units = 0
+        for chunk_orders, chunk_units in release_expired_reservations(cutoff, options['chunk_size']):
+            orders += chunk_orders
+            units += chunk_units
+            self.stdout.write(f"Cancelled {orders} orders, released {units} units")
+        self.stdout.write(self.style.SUCCESS(f"Expired reservations released: {orders} orders cancelled, {units} units freed"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from wims.models import StockAlert, WarehouseStockPlacement
+from wims.utils.stock_alerts import THRESHOLD_FIELDS, sync_alerts
+
+
+class Command(BaseCommand):
+    help = (
+        "One-off backfill of min/max stock alerts for existing placements. After that, alerts are "
+        "maintained as stock changes and this command is only needed after bulk data loads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        breaching = Q(quantity__lt=F('min_stock_level')) | Q(quantity__gt=F('max_stock_level'))
+
+        # Placements outside their thresholds, plus placements holding an open alert that may be stale
+        candidates = (WarehouseStockPlacement.objects
+                      .filter(breaching | Q(alerts__is_open=True))
+                      .order_by('pk').values(*THRESHOLD_FIELDS).distinct())
+        last_pk = 0
+        checked = 0
+        while True:
+            rows = list(candidates.filter(pk__gt=last_pk)[:chunk_size])
+            if not rows:
+                break
+            with transaction.atomic():
+                for row in rows:
+                    sync_alerts(row)
+            checked += len(rows)
+            last_pk = rows[-1]['stock_id']
+            self.stdout.write(f"Checked {checked} placements")
+
+        open_alerts = StockAlert.objects.filter(is_open=True).count()
+        self.stdout.write(self.style.SUCCESS(f"Stock alerts in sync: {open_alerts} open"))
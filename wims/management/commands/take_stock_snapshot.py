@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from wims.models import StockSnapshot, WarehouseStockPlacement
+
+SNAPSHOT_FIELDS = ('stock_id', 'product_id', 'warehouse_id', 'quantity', 'reserved_quantity')
+
+
+class Command(BaseCommand):
+    help = (
+        "Record the quantity of every placement as a StockSnapshot, the starting point for point-in-time "
+        "stock queries. Schedule it (e.g. nightly and at month end) when stock is not moving."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--warehouse', type=int, action='append', help="Only this warehouse (repeatable)")
+        parser.add_argument('--chunk-size', type=int, default=settings.STOCK_BATCH_INSERT_SIZE)
+
+    def handle(self, *args, **options):
+        taken_at = timezone.now()
+        placements = WarehouseStockPlacement.objects.order_by('pk')
+        if options['warehouse']:
+            placements = placements.filter(warehouse_id__in=options['warehouse'])
+
+        written = 0
+        last_pk = 0
+        while True:
+            rows = list(placements.filter(pk__gt=last_pk).values(*SNAPSHOT_FIELDS)[:options['chunk_size']])
+            if not rows:
+                break
+            with transaction.atomic():
+                StockSnapshot.objects.bulk_create([
+                    StockSnapshot(placement_id=row['stock_id'], product_id=row['product_id'],
+                                  warehouse_id=row['warehouse_id'], taken_at=taken_at,
+                                  quantity=row['quantity'], reserved_quantity=row['reserved_quantity'])
+                    for row in rows
+                ])
+            written += len(rows)
+            last_pk = rows[-1]['stock_id']
+        self.stdout.write(self.style.SUCCESS(f"Snapshot of {written} placements taken at {taken_at:%Y-%m-%d %H:%M:%S %Z}"))
@@ -1,3 +1,6 @@
 from .category_wims import Category
-from .product_wims import Product,Warehouse,WarehouseLocation,WarehouseStockPlacement,StockTransactions,WarehouseStockAudit,Customer,CustomerAccount,OrderItem,POSTransaction,Order
-from .supplies_wims import Supplier
\ No newline at end of file
+from .product_wims import Product,Warehouse,WarehouseLocation,WarehouseStockPlacement,StockTransactions,StockTransactionArchive,WarehouseStockAudit,Customer,CustomerAccount,OrderItem,POSTransaction,Order
+from .supplies_wims import Supplier
+from .import_wims import ProductImportJob
+from .search_wims import ProductSearchToken
+from .stock_wims import StockLevel, StockAlert, StockSnapshot, StockVelocity, JobWatermark
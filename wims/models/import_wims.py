@@ -0,0 +1,46 @@
+from django.db import models
+
+
+class ProductImportJob(models.Model):
+    """
+    Progress of a streaming product import. Every committed chunk advances
+    rows_processed in the same transaction, so a failed import can be resumed
+    from the last committed chunk by re-uploading the same file.
+    """
+    STATUS_CHOICES = [
+        ('Running', 'Running'),
+        ('Completed', 'Completed'),
+        ('Failed', 'Failed'),
+    ]
+
+    job_id = models.AutoField(primary_key=True)
+    file_name = models.CharField(max_length=255, verbose_name="File Name")
+    file_sha256 = models.CharField(max_length=64, db_index=True, verbose_name="File Checksum")
+    mode = models.CharField(max_length=10, default='insert', verbose_name="Import Mode")
+    chunk_size = models.PositiveIntegerField(default=1000, verbose_name="Chunk Size")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Running')
+    total_rows = models.PositiveIntegerField(null=True, blank=True, verbose_name="Total Rows")
+    rows_processed = models.PositiveIntegerField(default=0, verbose_name="Rows Processed")
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # Capped, see MAX_STORED_ERRORS
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    MAX_STORED_ERRORS = 500
+
+    class Meta:
+        verbose_name = "Product Import Job"
+        verbose_name_plural = "Product Import Jobs"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import {self.job_id} - {self.file_name} ({self.status})"
+
+    @property
+    def progress(self):
+        if not self.total_rows:
+            return None
+        return round(min(self.rows_processed / self.total_rows, 1) * 100, 1)
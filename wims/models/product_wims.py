@@ -22,6 +22,7 @@ class Product(models.Model):
     weight = models.FloatField(default=0, validators=[MinValueValidator(0)], verbose_name="Weight")
     quantity = models.IntegerField(default=0, validators=[MinValueValidator(0)], verbose_name="Quantity")
     image = models.ImageField(upload_to='product_images/', null=True, blank=True)  # Update field for image upload
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # Resized copies, see wims/utils/thumbnails.py
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True, verbose_name="Is Active")
@@ -30,6 +31,10 @@ class Product(models.Model):
         verbose_name = "Product"
         verbose_name_plural = "Products"
         ordering = ["name"]
+        indexes = [
+            # Active catalogue listings sorted by name
+            models.Index(fields=['is_active', 'name'], name='product_active_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -74,9 +79,15 @@ class WarehouseLocation(models.Model):
     max_capacity = models.PositiveIntegerField(
         validators=[MinValueValidator(1)]
     )
+    # Occupancy counters, maintained with F() updates by wims.utils.stock
+    occupied_quantity = models.IntegerField(default=0, editable=False)
+    occupied_weight = models.FloatField(default=0, editable=False)
+    placement_count = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    COUNTER_FIELDS = ('occupied_quantity', 'occupied_weight', 'placement_count')
+
     class Meta:
         verbose_name = "Warehouse Location"
         verbose_name_plural = "Warehouse Locations"
@@ -84,6 +95,19 @@ class WarehouseLocation(models.Model):
 
     def __str__(self):
         return f"{self.warehouse.name} - {self.section_name}"
+
+    def save(self, *args, **kwargs):
+        # Never write back counters read earlier; stock changes move them concurrently
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def utilisation(self):
+        return self.occupied_quantity / self.max_capacity if self.max_capacity else 0
     
 
 class WarehouseStockPlacement(models.Model):
@@ -180,16 +204,31 @@ class WarehouseStockPlacement(models.Model):
                 name='weight_non_negative'
             ),
         ]
+        indexes = [
+            # Placement lookup by (product, warehouse, location), as in order reservation
+            models.Index(fields=['product', 'warehouse', 'location'], name='placement_lookup_idx'),
+            # Default list ordering (keyset pagination on last_updated, stock_id)
+            models.Index(fields=['last_updated'], name='placement_updated_idx'),
+            # FEFO allocation: batches of a product in a warehouse by expiry date
+            models.Index(fields=['product', 'warehouse', 'expiry_date'], name='placement_fefo_idx'),
+            # Recalls look batches up by number
+            models.Index(fields=['batch_number'], name='placement_batch_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} at {self.warehouse.name} - {self.location.section_name}"    
     
 
 class StockTransactions(models.Model):
-    TRANSACTION_TYPES = [
+    MOVEMENT_TYPES = [
         ('INBOUND', 'Inbound'),
         ('OUTBOUND', 'Outbound'),
     ]
+    # OPENING rows are written by archive_stock_transactions: the signed net of the
+    # archived history of a placement, dated at the archive cutoff
+    TRANSACTION_TYPES = MOVEMENT_TYPES + [
+        ('OPENING', 'Opening balance'),
+    ]
 
     transaction_id = models.AutoField(primary_key=True)
     stock = models.ForeignKey(
@@ -216,12 +255,59 @@ class StockTransactions(models.Model):
         verbose_name = "Stock Transaction"
         verbose_name_plural = "Stock Transactions"
         ordering = ['-transaction_date']
+        indexes = [
+            # Ledger of one placement in date order
+            models.Index(fields=['stock', 'transaction_date'], name='ledger_stock_date_idx'),
+            # Ledger list ordering
+            models.Index(fields=['transaction_date'], name='ledger_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.transaction_type} - {self.stock.product.name} ({self.quantity})"    
+
+
+class StockTransactionArchive(models.Model):
+    """Ledger rows moved out of StockTransactions, bucketed by calendar month."""
+    transaction_id = models.IntegerField(primary_key=True)  # Kept from the hot table
+    stock = models.ForeignKey(
+        'WarehouseStockPlacement',
+        on_delete=models.CASCADE,
+        related_name='archived_transactions',
+        verbose_name="Stock Placement"
+    )
+    transaction_type = models.CharField(
+        max_length=8,
+        choices=StockTransactions.TRANSACTION_TYPES,
+        verbose_name="Transaction Type"
+    )
+    quantity = models.IntegerField(verbose_name="Quantity")
+    transaction_date = models.DateTimeField(verbose_name="Transaction Date")
+    period = models.DateField(verbose_name="Period")  # First day of the transaction's month
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Archived Stock Transaction"
+        verbose_name_plural = "Archived Stock Transactions"
+        ordering = ['-transaction_date']
+        indexes = [
+            # One month of history, optionally for one placement
+            models.Index(fields=['period', 'stock'], name='ledger_archive_period_idx'),
+            models.Index(fields=['stock', 'transaction_date'], name='ledger_archive_stock_idx'),
+            models.Index(fields=['transaction_date'], name='ledger_archive_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} - stock {self.stock_id} ({self.quantity}, {self.period:%Y-%m})"
     
 
 class WarehouseStockAudit(models.Model):
+    PLANNED = 'PLANNED'
+    COUNTED = 'COUNTED'
+    STATUS_CHOICES = [
+        (PLANNED, 'Planned'),  # Cycle-count task waiting for its count
+        (COUNTED, 'Counted'),
+    ]
+
     audit_id = models.AutoField(primary_key=True)
     warehouse = models.ForeignKey(
         'Warehouse',
@@ -242,18 +328,31 @@ class WarehouseStockAudit(models.Model):
         verbose_name="Location"
     )
     recorded_quantity = models.IntegerField(
+        null=True,
+        blank=True,
         validators=[MinValueValidator(0)],
         verbose_name="Recorded Quantity"
     )
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=COUNTED, verbose_name="Status")
+    scheduled_for = models.DateField(null=True, blank=True, verbose_name="Scheduled For")
     audit_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name="Audit Date"
     )
+    # Reconciliation, filled in by the batch audit endpoint
+    audit_batch = models.CharField(max_length=32, blank=True, default='', verbose_name="Audit Batch")
+    system_quantity = models.IntegerField(null=True, blank=True, verbose_name="System Quantity")
+    variance = models.IntegerField(null=True, blank=True, verbose_name="Variance")  # recorded - system
+    adjusted = models.BooleanField(default=False, verbose_name="Adjusted")
 
     class Meta:
         verbose_name = "Warehouse Stock Audit"
         verbose_name_plural = "Warehouse Stock Audits"
         ordering = ['-audit_date']
+        indexes = [
+            models.Index(fields=['audit_batch'], name='stock_audit_batch_idx'),
+            models.Index(fields=['status', 'scheduled_for'], name='stock_audit_status_idx'),
+        ]
 
     def __str__(self):
         return f"Audit {self.audit_id} - {self.product.name} at {self.warehouse.name}"    
@@ -343,11 +442,22 @@ class Order(models.Model):
     pos_terminal_id = models.CharField(max_length=50, null=True, blank=True)
     reserved_at = models.DateTimeField(null=True, blank=True)
     fulfilled_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Order"
         verbose_name_plural = "Orders"
         ordering = ['-order_date']
+        indexes = [
+            # A customer's order history
+            models.Index(fields=['customer', 'order_date'], name='order_customer_date_idx'),
+            # Order queues by status (Reserved, Picked, ...)
+            models.Index(fields=['status', 'order_date'], name='order_status_date_idx'),
+            # Expired reservations (manage.py release_expired_reservations)
+            models.Index(fields=['status', 'reserved_at'], name='order_status_reserved_idx'),
+            # Order list ordering
+            models.Index(fields=['order_date'], name='order_date_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.order_id} - {self.customer.full_name}"
@@ -361,6 +471,14 @@ class OrderItem(models.Model):
     quantity = models.IntegerField(validators=[MinValueValidator(1)])
     price = models.DecimalField(max_digits=10, decimal_places=2)
     pos_transaction = models.ForeignKey('POSTransaction', on_delete=models.SET_NULL, null=True, blank=True)
+    stock = models.ForeignKey(
+        'WarehouseStockPlacement',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='order_items',
+        verbose_name="Allocated Batch"
+    )
 
     class Meta:
         verbose_name = "Order Item"
@@ -0,0 +1,26 @@
+from django.db import models
+from .product_wims import Product
+
+
+class ProductSearchToken(models.Model):
+    """
+    Inverted index for product search: one row per lowercased word of the
+    product name plus its SKU and barcode. Prefix searches become range scans
+    over the (token, product) index on MySQL and SQLite alike.
+    """
+    NAME_WEIGHT = 1
+    CODE_WEIGHT = 10  # SKU/barcode matches outrank name matches
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=50)
+    weight = models.PositiveSmallIntegerField(default=NAME_WEIGHT)
+
+    class Meta:
+        verbose_name = "Product Search Token"
+        verbose_name_plural = "Product Search Tokens"
+        indexes = [
+            models.Index(fields=['token', 'product', 'weight'], name='search_token_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.product_id}"
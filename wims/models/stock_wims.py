@@ -0,0 +1,138 @@
+from django.db import models
+from .product_wims import Product, Warehouse
+
+
+class StockLevel(models.Model):
+    """
+    Per product and warehouse totals of WarehouseStockPlacement, so stock
+    questions are answered without aggregating at request time. Rows are
+    kept in step inside the same transaction as every placement change by
+    wims.utils.stock; `manage.py rebuild_stock_levels` recomputes them.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_levels')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='stock_levels')
+    on_hand = models.IntegerField(default=0, verbose_name="On Hand")
+    reserved = models.IntegerField(default=0, verbose_name="Reserved")
+    available = models.IntegerField(default=0, verbose_name="Available")  # on_hand - reserved
+    weight = models.FloatField(default=0, verbose_name="Total Weight")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Stock Level"
+        verbose_name_plural = "Stock Levels"
+        ordering = ['product_id', 'warehouse_id']
+        unique_together = ('product', 'warehouse')
+        indexes = [
+            models.Index(fields=['warehouse', 'product'], name='stock_level_warehouse_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}@{self.warehouse_id}: {self.available}/{self.on_hand}"
+
+
+class StockAlert(models.Model):
+    """
+    A placement outside its min/max stock levels. Alerts are opened and
+    resolved by wims.utils.stock_alerts when a stock change crosses a
+    threshold. `open_key` is unique while an alert is open and NULL once it is
+    resolved, so each placement has at most one open alert per kind, on MySQL
+    too (which has no partial unique indexes).
+    """
+    LOW = 'LOW'
+    OVER = 'OVER'
+    KIND_CHOICES = [
+        (LOW, 'Below minimum stock level'),
+        (OVER, 'Above maximum stock level'),
+    ]
+
+    placement = models.ForeignKey('WarehouseStockPlacement', on_delete=models.CASCADE, related_name='alerts')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_alerts')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='stock_alerts')
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES)
+    threshold = models.IntegerField()
+    quantity = models.IntegerField(verbose_name="Quantity When Opened")
+    open_key = models.CharField(max_length=32, null=True, unique=True, editable=False)
+    is_open = models.BooleanField(default=True)
+    opened_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    resolved_quantity = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Stock Alert"
+        verbose_name_plural = "Stock Alerts"
+        ordering = ['-opened_at']
+        indexes = [
+            models.Index(fields=['is_open', 'opened_at'], name='stock_alert_open_idx'),
+            models.Index(fields=['is_open', 'warehouse', 'opened_at'], name='stock_alert_open_wh_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} placement {self.placement_id} ({'open' if self.is_open else 'resolved'})"
+
+
+class StockSnapshot(models.Model):
+    """
+    Quantity of every placement at `taken_at`, written by
+    `manage.py take_stock_snapshot`. Point-in-time stock is the nearest
+    earlier snapshot plus the ledger movements after it (wims.utils.stock_history).
+    """
+    placement = models.ForeignKey('WarehouseStockPlacement', on_delete=models.CASCADE, related_name='snapshots')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='stock_snapshots')
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+    reserved_quantity = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Stock Snapshot"
+        verbose_name_plural = "Stock Snapshots"
+        ordering = ['-taken_at', 'placement_id']
+        unique_together = ('placement', 'taken_at')
+        indexes = [
+            models.Index(fields=['warehouse', 'taken_at'], name='stock_snapshot_wh_idx'),
+        ]
+
+    def __str__(self):
+        return f"placement {self.placement_id} @ {self.taken_at:%Y-%m-%d %H:%M}: {self.quantity}"
+
+
+class StockVelocity(models.Model):
+    """
+    Movement velocity of a product at one location, maintained incrementally
+    by wims.utils.velocity from new ledger rows and order lines. `hits` and
+    `units` are exponentially decayed sums scaled to a common epoch, so a run
+    only touches the keys that moved; ABC classes drive cycle-count frequency.
+    """
+    ABC_CHOICES = [('A', 'A'), ('B', 'B'), ('C', 'C')]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='velocities')
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name='velocities')
+    location = models.ForeignKey('WarehouseLocation', on_delete=models.CASCADE, related_name='velocities')
+    hits = models.FloatField(default=0)  # Ledger movements and order lines
+    units = models.FloatField(default=0)  # Outbound and ordered units
+    last_movement_at = models.DateTimeField(null=True, blank=True)
+    abc_class = models.CharField(max_length=1, choices=ABC_CHOICES, default='C')
+    next_count_due = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Stock Velocity"
+        verbose_name_plural = "Stock Velocities"
+        ordering = ['warehouse_id', 'abc_class', 'product_id', 'location_id']
+        unique_together = ('product', 'location')
+        indexes = [
+            models.Index(fields=['warehouse', 'next_count_due'], name='stock_velocity_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}@{self.location_id}: {self.abc_class}"
+
+
+class JobWatermark(models.Model):
+    """How far an incremental job has read a source table (by primary key)."""
+    name = models.CharField(max_length=64, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    ran_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
@@ -0,0 +1,143 @@
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination, _reverse_ordering
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on (natural ordering field, primary key).
+
+    The ordering is taken from the paginator's or the view's `cursor_ordering`
+    if set, otherwise from the first field of the model's Meta.ordering, and
+    the primary key is appended as a tie-breaker in the same direction. Since (field, pk) is
+    unique, the cursor never needs an offset: every page is a
+    `WHERE (field, pk) < (last_field, last_pk) ORDER BY field, pk LIMIT n`
+    query and costs the same no matter how deep it is.
+    """
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(self, 'cursor_ordering', None) or getattr(view, 'cursor_ordering', None)
+        if ordering is None:
+            model_ordering = [o for o in queryset.model._meta.ordering if isinstance(o, str)]
+            first = model_ordering[0] if model_ordering else '-pk'
+            if first.lstrip('-') in ('pk', queryset.model._meta.pk.name):
+                ordering = (first,)
+            else:
+                ordering = (first, '-pk' if first.startswith('-') else 'pk')
+        return tuple(ordering)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            if field_name == 'pk':
+                attr = instance['pk'] if isinstance(instance, dict) else instance.pk
+            elif isinstance(instance, dict):
+                attr = instance[field_name]
+            else:
+                attr = getattr(instance, field_name)
+            values.append(str(attr))
+        return json.dumps(values, separators=(',', ':'))
+
+    def _keyset_filter(self, position, reverse):
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        # Lexicographic comparison: (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        condition = Q()
+        equal = {}
+        for order, value in zip(self.ordering, values):
+            attr = order.lstrip('-')
+            lookup = '__lt' if reverse != order.startswith('-') else '__gt'
+            condition |= Q(**equal, **{attr + lookup: value})
+            equal[attr] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            reverse, current_position = self.cursor.reverse, self.cursor.position
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self._keyset_filter(current_position, reverse))
+
+        # Fetch one extra row to know whether another page follows
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Page-number pagination for ranked results, which have no stable keyset.
+    The ranking is capped (SEARCH_MAX_CANDIDATES), so no total count is given.
+    """
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PAGINATION_MAX_PAGE_SIZE
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties'].pop('count', None)
+        response_schema['required'] = ['results']
+        return response_schema
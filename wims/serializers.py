@@ -1,7 +1,11 @@
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Category,Product
 from .models import Supplier,Warehouse,WarehouseLocation,WarehouseStockPlacement,StockTransactions,WarehouseStockAudit,Customer,CustomerAccount,Order, OrderItem, POSTransaction
+from .models import ProductImportJob, StockAlert, StockLevel, StockTransactionArchive
+from .utils.reference_cache import category_cache, location_cache, supplier_cache, warehouse_cache
 
 class UserSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()  # ✅ Ensures proper name handling
@@ -13,6 +17,169 @@ class UserSerializer(serializers.ModelSerializer):
     def get_full_name(self, obj):
         return obj.get_full_name() or obj.username  # ✅ Falls back to username if no full name
 
+class SparseFieldsetMixin:
+    """
+    Read-side field selection driven by query params:
+      ?fields=a,b      only return these fields
+      ?expand=rel,...  nest a related object (Meta.expandable_fields) instead of its id
+    optimize_queryset() turns the same params into select_related()/only(),
+    so list endpoints run one query and fetch only the requested columns.
+    SerializerMethodFields declare the model fields they read in
+    Meta.method_field_sources.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = self.requested_fields(self.context.get('request'))
+        for name in expand:
+            self.fields[name] = self.Meta.expandable_fields[name](read_only=True)
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+    @classmethod
+    def requested_fields(cls, request):
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return set(), []
+        params = request.query_params
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        expand = [name for name in params.get('expand', '').split(',') if name.strip() in expandable]
+        expand = [name.strip() for name in expand]
+        fields = {name.strip() for name in params.get('fields', '').split(',') if name.strip()}
+        if fields:
+            fields.update(expand)
+        return fields, expand
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request):
+        serializer = cls(context={'request': request})
+        select_related, only = set(), {queryset.model._meta.pk.name}
+        can_defer = _collect_field_paths(serializer, queryset.model, '', select_related, only)
+        if select_related:
+            queryset = queryset.select_related(*sorted(select_related))
+        if can_defer:
+            queryset = queryset.only(*sorted(only))
+        return queryset
+
+
+def _concrete_path(model, path):
+    """True if the '__' separated path ends on a concrete model field."""
+    parts = path.split('__')
+    for index, part in enumerate(parts):
+        try:
+            field = model._meta.get_field(part)
+        except Exception:
+            return False
+        if not getattr(field, 'concrete', False):
+            return False
+        if index < len(parts) - 1:
+            if not field.is_relation or field.many_to_many:
+                return False
+            model = field.related_model
+    return True
+
+
+def _collect_field_paths(serializer, model, prefix, select_related, only):
+    """
+    Walk a serializer's fields and record the select_related paths and
+    only() columns they need. Returns False when a field reads something
+    that cannot be expressed as a column (only() is then skipped).
+    """
+    method_sources = getattr(getattr(serializer, 'Meta', None), 'method_field_sources', {})
+    can_defer = True
+    for name, field in serializer.fields.items():
+        if getattr(field, 'write_only', False):
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            if name not in method_sources:
+                can_defer = False
+            only.update(prefix + source for source in method_sources.get(name, ()))
+            continue
+        if field.source == '*' or isinstance(field, serializers.ListSerializer):
+            can_defer = False
+            continue
+
+        path = field.source.replace('.', '__')
+        if isinstance(field, serializers.BaseSerializer):
+            # Expanded relation: join it and recurse into the nested serializer's own needs
+            related_model = model._meta.get_field(path).related_model
+            select_related.add(prefix + path)
+            only.add(prefix + path + '__' + related_model._meta.pk.name)
+            can_defer &= _collect_field_paths(field, related_model, prefix + path + '__', select_related, only)
+            continue
+
+        if not _concrete_path(model, path):
+            can_defer = False
+            continue
+        parts = path.split('__')
+        if len(parts) > 1:
+            select_related.add(prefix + '__'.join(parts[:-1]))
+        only.add(prefix + path)
+    return can_defer
+
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField that validates through a ReferenceCache instead of a query per value."""
+
+    def __init__(self, reference_cache, **kwargs):
+        self.reference_cache = reference_cache
+        if not kwargs.get('read_only'):
+            kwargs.setdefault('queryset', reference_cache.model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = self.reference_cache.model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        instance = self.reference_cache.get(pk)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField that resolves from `prefetched` ({pk: instance}, set by a parent list) when it is set."""
+    prefetched = None
+
+    def to_internal_value(self, data):
+        if self.prefetched is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.prefetched:
+            self.fail('does_not_exist', pk_value=data)
+        return self.prefetched[pk]
+
+
+class PrefetchingListSerializer(serializers.ListSerializer):
+    """Loads the related objects of every item's PrefetchedPrimaryKeyRelatedFields with one query per field."""
+
+    def to_internal_value(self, data):
+        fields = {name: field for name, field in self.child.fields.items()
+                  if isinstance(field, PrefetchedPrimaryKeyRelatedField) and not field.read_only}
+        if isinstance(data, list):
+            for name, field in fields.items():
+                pks = set()
+                for item in data:
+                    try:
+                        pks.add(field.get_queryset().model._meta.pk.to_python(item.get(name)))
+                    except (AttributeError, TypeError, ValueError, DjangoValidationError):
+                        pass  # Reported per item by the field itself
+                field.prefetched = field.get_queryset().in_bulk(pks - {None})
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field in fields.values():
+                field.prefetched = None
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -23,19 +190,24 @@ class SupplierSerializer(serializers.ModelSerializer):
         model = Supplier
         fields = "__all__"  # Include all fields in the API     
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    category = CachedPrimaryKeyRelatedField(category_cache)
+    supplier = CachedPrimaryKeyRelatedField(supplier_cache)
     category_name = serializers.CharField(source='category.name_category', read_only=True)
     supplier_name = serializers.CharField(source='supplier.name_company', read_only=True)
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
             'product_id', 'name', 'category', 'category_name', 'supplier', 'supplier_name',
-            'sku', 'barcode', 'price', 'weight', 'quantity', 'image', 'image_url','unit_type',
+            'sku', 'barcode', 'price', 'weight', 'quantity', 'image', 'image_url', 'image_variants', 'unit_type',
             'created_at', 'updated_at', 'is_active'
         ]
         read_only_fields = ['product_id', 'created_at', 'updated_at', 'category_name', 'supplier_name']
+        expandable_fields = {'category': CategorySerializer, 'supplier': SupplierSerializer}
+        method_field_sources = {'image_url': ['image'], 'image_variants': ['image', 'image_variants']}
     def get_unit_type_choices(self):
         return [{'value': value, 'label': label} for value, label in Product.UNIT_CHOICES]    
 
@@ -44,7 +216,34 @@ class ProductSerializer(serializers.ModelSerializer):
         if obj.image:
             return request.build_absolute_uri(obj.image.url)
         return None
+
+    def get_image_variants(self, obj):
+        """{size: {'webp': url, 'jpeg': url}}; empty until the thumbnail worker has run."""
+        variants = obj.image_variants or {}
+        if not obj.image or variants.get('source') != obj.image.name:
+            return {}
+        request = self.context.get('request')
+        urls = {}
+        for size_name, paths in variants.items():
+            if size_name == 'source':
+                continue
+            urls[size_name] = {
+                extension: request.build_absolute_uri(default_storage.url(path)) if request else default_storage.url(path)
+                for extension, path in paths.items()
+            }
+        return urls
     
+class ProductImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ProductImportJob
+        fields = [
+            'job_id', 'file_name', 'mode', 'chunk_size', 'status', 'total_rows', 'rows_processed', 'progress',
+            'created_count', 'updated_count', 'error_count', 'errors', 'last_error', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
 class WarehouseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Warehouse
@@ -64,14 +263,29 @@ class WarehouseSerializer(serializers.ModelSerializer):
         return value
     
 class WarehouseLocationSerializer(serializers.ModelSerializer):
-    warehouse = serializers.PrimaryKeyRelatedField(queryset=Warehouse.objects.all())
+    warehouse = CachedPrimaryKeyRelatedField(warehouse_cache)
+    utilisation = serializers.FloatField(read_only=True)
 
     class Meta:
         model = WarehouseLocation
-        fields = ['id', 'warehouse', 'section_name', 'storage_type', 'capacity_class', 'max_capacity', 'created_at', 'updated_at']
+        fields = [
+            'id', 'warehouse', 'section_name', 'storage_type', 'capacity_class', 'max_capacity',
+            'occupied_quantity', 'occupied_weight', 'placement_count', 'utilisation', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['occupied_quantity', 'occupied_weight', 'placement_count']
 
+    def validate_max_capacity(self, value):
+        if self.instance is not None and value < self.instance.occupied_quantity:
+            raise serializers.ValidationError(
+                f"Location currently holds {self.instance.occupied_quantity} units; capacity cannot be lower."
+            )
+        return value
 
-class WarehouseStockPlacementSerializer(serializers.ModelSerializer):
+
+class WarehouseStockPlacementSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    warehouse = CachedPrimaryKeyRelatedField(warehouse_cache)
+    location = CachedPrimaryKeyRelatedField(location_cache)
+    category = CachedPrimaryKeyRelatedField(category_cache)
     warehouse_name = serializers.CharField(source='warehouse.name', read_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
     location_section = serializers.CharField(source='location.section_name', read_only=True)
@@ -85,22 +299,71 @@ class WarehouseStockPlacementSerializer(serializers.ModelSerializer):
             'weight', 'storage_type', 'batch_number', 'expiry_date', 'last_updated',
             'min_stock_level', 'max_stock_level'
         ]
-        read_only_fields = ['stock_id', 'last_updated']        
+        read_only_fields = ['stock_id', 'last_updated']
+        expandable_fields = {
+            'warehouse': WarehouseSerializer,
+            'product': ProductSerializer,
+            'location': WarehouseLocationSerializer,
+            'category': CategorySerializer,
+        }
 
-class StockTransactionsSerializer(serializers.ModelSerializer):
+class StockTransactionsSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     stock_id = serializers.PrimaryKeyRelatedField(
         queryset=WarehouseStockPlacement.objects.all(),
         source='stock'
     )
+    # OPENING balance rows are only written by the ledger archive
+    transaction_type = serializers.ChoiceField(choices=StockTransactions.MOVEMENT_TYPES)
     product_name = serializers.CharField(source='stock.product.name', read_only=True)
     warehouse_name = serializers.CharField(source='stock.warehouse.name', read_only=True)
 
     class Meta:
         model = StockTransactions
-        fields = ['transaction_id', 'stock_id', 'transaction_type', 'quantity', 'transaction_date', 'product_name', 'warehouse_name']   
+        fields = ['transaction_id', 'stock_id', 'transaction_type', 'quantity', 'transaction_date', 'product_name', 'warehouse_name']
+        expandable_fields = {'stock': WarehouseStockPlacementSerializer}
+
+
+class StockTransactionArchiveSerializer(serializers.ModelSerializer):
+    stock_id = serializers.IntegerField(read_only=True)
+    product_name = serializers.CharField(source='stock.product.name', read_only=True)
+    warehouse_name = serializers.CharField(source='stock.warehouse.name', read_only=True)
+
+    class Meta:
+        model = StockTransactionArchive
+        fields = ['transaction_id', 'stock_id', 'transaction_type', 'quantity', 'transaction_date', 'period', 'archived_at', 'product_name', 'warehouse_name']
+        read_only_fields = fields
+
+
+class StockLevelSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    sku = serializers.CharField(source='product.sku', read_only=True)
+    warehouse_name = serializers.CharField(source='warehouse.name', read_only=True)
+
+    class Meta:
+        model = StockLevel
+        fields = ['id', 'product', 'product_name', 'sku', 'warehouse', 'warehouse_name', 'on_hand', 'reserved', 'available', 'weight', 'updated_at']
+        read_only_fields = fields
+
+
+class StockAlertSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    warehouse_name = serializers.CharField(source='warehouse.name', read_only=True)
+    location_name = serializers.CharField(source='placement.location.section_name', read_only=True)
+    batch_number = serializers.CharField(source='placement.batch_number', read_only=True)
+    current_quantity = serializers.IntegerField(source='placement.quantity', read_only=True)
+
+    class Meta:
+        model = StockAlert
+        fields = [
+            'id', 'kind', 'placement', 'product', 'product_name', 'warehouse', 'warehouse_name', 'location_name',
+            'batch_number', 'threshold', 'quantity', 'current_quantity', 'is_open', 'opened_at', 'resolved_at', 'resolved_quantity'
+        ]
+        read_only_fields = fields
 
 
 class WarehouseStockAuditSerializer(serializers.ModelSerializer):
+    warehouse = CachedPrimaryKeyRelatedField(warehouse_cache)
+    location = CachedPrimaryKeyRelatedField(location_cache)
     warehouse_name = serializers.CharField(source='warehouse.name', read_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
     location_name = serializers.CharField(source='location.section_name', read_only=True)
@@ -109,9 +372,12 @@ class WarehouseStockAuditSerializer(serializers.ModelSerializer):
         model = WarehouseStockAudit
         fields = [
             'audit_id', 'warehouse', 'warehouse_name', 'product', 'product_name',
-            'location', 'location_name', 'recorded_quantity', 'audit_date'
+            'location', 'location_name', 'recorded_quantity', 'audit_date',
+            'audit_batch', 'system_quantity', 'variance', 'adjusted', 'status', 'scheduled_for',
         ]
-        read_only_fields = ['audit_id', 'audit_date']
+        read_only_fields = ['audit_id', 'audit_date', 'audit_batch', 'system_quantity', 'variance', 'adjusted', 'status', 'scheduled_for']
+        # Only planned cycle-count tasks exist without a count
+        extra_kwargs = {'recorded_quantity': {'required': True, 'allow_null': False}}
 
 class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
@@ -154,37 +420,70 @@ class POSTransactionSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
-    warehouse = serializers.PrimaryKeyRelatedField(queryset=Warehouse.objects.all())
-    location = serializers.PrimaryKeyRelatedField(queryset=WarehouseLocation.objects.all())
+    product = PrefetchedPrimaryKeyRelatedField(queryset=Product.objects.all())
+    warehouse = CachedPrimaryKeyRelatedField(warehouse_cache, required=False)  # Optional: split across warehouses
+    location = CachedPrimaryKeyRelatedField(location_cache, required=False)  # Optional: FEFO picks the batches
     product_name = serializers.CharField(source='product.name', read_only=True)
+    batch_number = serializers.CharField(source='stock.batch_number', read_only=True, default=None)
+    expiry_date = serializers.DateField(source='stock.expiry_date', read_only=True, default=None)
 
     class Meta:
         model = OrderItem
-        fields = ['order_item_id', 'order', 'product', 'product_name', 'warehouse', 'location', 'quantity', 'price', 'pos_transaction']
-        read_only_fields = ['order', 'price', 'order_item_id', 'pos_transaction']  # These are set by the backend
+        fields = ['order_item_id', 'order', 'product', 'product_name', 'warehouse', 'location', 'stock', 'batch_number', 'expiry_date', 'quantity', 'price', 'pos_transaction']
+        read_only_fields = ['order', 'price', 'order_item_id', 'pos_transaction', 'stock']  # These are set by the backend
+        list_serializer_class = PrefetchingListSerializer  # One product query for all lines
+
+    def validate(self, data):
+        location = data.get('location')
+        if location is not None and data.get('warehouse') is None:
+            data['warehouse'] = location.warehouse
+        if location is not None and location.warehouse_id != data['warehouse'].pk:
+            raise serializers.ValidationError({"location": "Location does not belong to the selected warehouse."})
+        return data
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
 
     class Meta:
         model = Order
-        fields = ['order_id', 'customer', 'order_date', 'status', 'total_price', 'pos_processed', 'pos_terminal_id', 'reserved_at', 'fulfilled_at', 'items']
-        read_only_fields = ['order_id', 'order_date', 'status', 'total_price', 'reserved_at', 'fulfilled_at']
+        fields = ['order_id', 'customer', 'order_date', 'status', 'total_price', 'pos_processed', 'pos_terminal_id', 'reserved_at', 'fulfilled_at', 'updated_at', 'items']
+        read_only_fields = ['order_id', 'order_date', 'status', 'total_price', 'reserved_at', 'fulfilled_at', 'updated_at']
 
     def create(self, validated_data):
+        """
+        `allocations` (required, passed to save() by the view) holds one [(placement, quantity), ...]
+        split per line; each part becomes its own OrderItem tied to that batch, with
+        its own POS transaction. Items and POS transactions are bulk inserted.
+        """
         items_data = validated_data.pop('items')
+        allocations = validated_data.pop('allocations', None)
+        if allocations is None:
+            raise TypeError("OrderSerializer.save() needs allocations=allocate_order_lines(items)")
         order = Order.objects.create(**validated_data)
-        
-        # Manually create OrderItems since we handle price and order in the view
-        for item_data in items_data:
-            OrderItem.objects.create(
-                order=order,
-                product=item_data['product'],
-                warehouse=item_data['warehouse'],
-                location=item_data['location'],
-                quantity=item_data['quantity'],
-                price=item_data['product'].price * item_data['quantity']  # Calculate price here
-            )
-            print(f"OrderItem created: {item_data['product'].quantity} with quantity {item_data['quantity']}")
-        return order
\ No newline at end of file
+
+        parts = []
+        for item_data, line_allocations in zip(items_data, allocations):
+            parts.extend((item_data, placement, placement.warehouse_id, placement.location_id, quantity)
+                         for placement, quantity in line_allocations)
+
+        terminal = order.pos_terminal_id or "POS_DEFAULT"
+        POSTransaction.objects.bulk_create([
+            POSTransaction(order=order, customer_id=order.customer_id, product=item_data['product'],
+                           barcode=item_data['product'].barcode, quantity=quantity, pos_terminal_id=terminal,
+                           status='Verified')
+            for item_data, _, _, _, quantity in parts
+        ])
+        # bulk_create does not return primary keys on MySQL; they come back in insertion order
+        pos_ids = list(POSTransaction.objects.filter(order=order).order_by('pk').values_list('pk', flat=True))
+
+        items = [
+            OrderItem(order=order, product=item_data['product'], warehouse_id=warehouse_id,
+                      location_id=location_id, stock=placement, quantity=quantity,
+                      price=item_data['product'].price * quantity, pos_transaction_id=pos_id)
+            for (item_data, placement, warehouse_id, location_id, quantity), pos_id in zip(parts, pos_ids)
+        ]
+        OrderItem.objects.bulk_create(items)
+
+        order.total_price = sum(item.price for item in items)
+        Order.objects.filter(pk=order.pk).update(total_price=order.total_price)
+        return order
@@ -104,9 +104,85 @@ REST_FRAMEWORK = {
                                           'rest_framework.authentication.TokenAuthentication',  'rest_framework.authentication.SessionAuthentication'],
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated",'rest_framework.permissions.AllowAny'],
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
-    
+    "DEFAULT_PAGINATION_CLASS": "wims.pagination.KeysetPagination",
+    "PAGE_SIZE": 50,
 }
 
+# Hard cap for ?page_size= on paginated list endpoints
+PAGINATION_MAX_PAGE_SIZE = 500
+
+# Streaming product import (rows validated and committed per chunk)
+PRODUCT_IMPORT_CHUNK_SIZE = 1000
+PRODUCT_IMPORT_MAX_CHUNK_SIZE = 10000
+PRODUCT_IMPORT_STALE_AFTER = 600  # seconds without a committed chunk before a Running job may be resumed
+
+# Product search (/api/products/search/)
+SEARCH_MIN_PREFIX_LENGTH = 3  # shorter terms only match whole tokens
+SEARCH_MAX_CANDIDATES = 5000  # index rows read and ranked per query
+
+# Rows fetched per round trip by the streaming export endpoints
+EXPORT_CHUNK_SIZE = 2000
+# xlsx is sent only once fully written (a zip); larger exports must use csv
+EXPORT_XLSX_MAX_ROWS = 1000000
+
+# POS barcode/SKU resolver: per-worker LRU cache, invalidated on product save
+BARCODE_CACHE_SIZE = 50000
+BARCODE_CACHE_TTL = 30  # seconds
+BARCODE_RESOLVE_MAX_CODES = 500
+
+# Product image derivatives: longest side in px per size name
+PRODUCT_IMAGE_VARIANTS = {
+    'thumb': 160,
+    'small': 320,
+    'medium': 640,
+}
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_WORKERS = 2
+
+# In-process reference data (categories, suppliers, warehouses, locations).
+# Invalidation goes through a version key in CACHES; use a shared backend
+# (Redis/Memcached) in production so every worker sees it.
+REFERENCE_CACHE_CHECK_INTERVAL = 1.0  # seconds between version checks
+REFERENCE_CACHE_MAX_AGE = 300  # seconds, upper bound on staleness
+
+# Batch stock-movement endpoint (/api/stock-transactions/batch/)
+STOCK_BATCH_MAX_ITEMS = 50000
+STOCK_BATCH_INSERT_SIZE = 2000  # Ledger rows per INSERT statement
+
+# Put-away slotting (/api/stock-placements/suggest-location/)
+SLOTTING_INDEX_TTL = 300  # seconds before a warehouse's location snapshot is rebuilt in the background
+SLOTTING_CANDIDATE_WINDOW = 200  # best-fit locations examined per storage type
+SLOTTING_WEIGHTS = {
+    'storage_type_match': 4,
+    'colocated': 3,  # Location already holds batches of the product
+    'fit': 2,  # quantity / free capacity
+    'fragmentation': 1,  # 1 / (1 + placements already in the location)
+}
+SLOTTING_CLASS_MAX_WEIGHT = {  # Heaviest inbound load (kg) per capacity class; None = no limit
+    'Small': 50,
+    'Medium': 500,
+    'Large': None,
+}
+
+# Batch stock audits (/api/stock-audits/batch/)
+STOCK_AUDIT_MAX_ROWS = 100000
+
+# Velocity, ABC classes and cycle counts (manage.py update_stock_velocity)
+VELOCITY_HALF_LIFE_DAYS = 30  # weight of a movement halves every N days
+ABC_THRESHOLDS = (0.8, 0.95)  # cumulative share of hits closing classes A and B
+CYCLE_COUNT_INTERVAL_DAYS = {'A': 30, 'B': 90, 'C': 180}
+CYCLE_COUNT_DAILY_LIMIT = 200  # count tasks per warehouse per day
+CYCLE_COUNT_TASK_WINDOW_DAYS = 7  # an uncounted PLANNED task stops blocking a re-plan after this
+
+# Ledger archival (manage.py archive_stock_transactions)
+LEDGER_ARCHIVE_AFTER_DAYS = 365  # whole months older than this move to StockTransactionArchive
+LEDGER_ARCHIVE_CHUNK_SIZE = 500  # placements per archive transaction
+
+# Reservation expiry (manage.py release_expired_reservations)
+RESERVATION_TTL = 24 * 3600  # seconds a Reserved order holds its stock
+RESERVATION_SWEEP_CHUNK_SIZE = 200  # orders released per transaction
+RESERVATION_SWEEP_INTERVAL = None  # seconds; set to also sweep from a thread in each web worker
+
 # Spectacular API Schema settings
 SPECTACULAR_SETTINGS = {
     "TITLE": "My API",
@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, Product, Supplier, Warehouse, WarehouseLocation, WarehouseStockPlacement
+from .utils.barcode_resolver import invalidate_product
+from .utils.product_search import index_products
+from .utils.reference_cache import REFERENCE_CACHES
+from .utils.stock import add_placement_to_levels, add_placement_to_location
+from .utils.stock_alerts import THRESHOLD_FIELDS, sync_alerts
+from .utils.thumbnails import needs_variants, schedule_variants
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_resolved_product(sender, instance, **kwargs):
+    invalidate_product(instance.product_id, instance.sku, instance.barcode)
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance, **kwargs):
+    index_products([instance])
+
+
+@receiver(post_save, sender=Product)
+def generate_image_variants(sender, instance, **kwargs):
+    if needs_variants(instance):
+        schedule_variants(instance)
+
+
+@receiver([post_save, post_delete], sender=WarehouseStockPlacement)
+def invalidate_resolved_stock(sender, instance, **kwargs):
+    # Available stock is part of the resolver payload
+    invalidate_product(instance.product_id)
+
+
+@receiver(post_save, sender=WarehouseStockPlacement)
+def add_stock_level(sender, instance, created, **kwargs):
+    # Later quantity changes go through wims.utils.stock, which bumps the counters itself
+    if created:
+        add_placement_to_location(instance)  # Raises if the location is full; the caller's transaction rolls back
+        add_placement_to_levels(instance)
+        sync_alerts({field: getattr(instance, field) for field in THRESHOLD_FIELDS})
+
+
+@receiver(post_delete, sender=WarehouseStockPlacement)
+def remove_stock_level(sender, instance, **kwargs):
+    # Also runs for cascades (location/warehouse/product deletes)
+    add_placement_to_location(instance, sign=-1)
+    add_placement_to_levels(instance, sign=-1, create=False)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Supplier)
+@receiver([post_save, post_delete], sender=Warehouse)
+@receiver([post_save, post_delete], sender=WarehouseLocation)
+def invalidate_reference_data(sender, instance, **kwargs):
+    # After commit, so no worker re-caches the row as it was before this change
+    for reference_cache in REFERENCE_CACHES[sender]:
+        transaction.on_commit(reference_cache.invalidate)
@@ -0,0 +1,123 @@
+import math
+from datetime import timedelta
+from unittest import mock
+
+import pandas as pd
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from wims.models import (
+    Category, Product, StockTransactions, StockVelocity, Supplier, Warehouse, WarehouseLocation, WarehouseStockPlacement,
+)
+from wims.utils import thumbnails
+from wims.utils.product_import import ProductBulkImporter
+from wims.utils.velocity import current_factor, refresh_velocity
+
+
+class WimsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(username='tester'))
+        self.category = Category.objects.create(name_category='C')
+        self.supplier = Supplier.objects.create(name_company='S')
+
+    def make_product(self, index=0, **fields):
+        fields = {'name': f'P{index}', 'sku': f'SKU{index}', 'barcode': f'B{index}', 'price': 2, 'quantity': 100, **fields}
+        return Product.objects.create(category=self.category, supplier=self.supplier, **fields)
+
+
+class ProductConditionalGetTests(WimsTestCase):
+    def test_attaching_variants_changes_etag(self):
+        product = self.make_product()
+        Product.objects.filter(pk=product.pk).update(image='product_images/p.png')
+        urls = ['/api/products/', f'/api/products/{product.pk}/']
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+
+        variants = {'source': 'product_images/p.png', 'small': {'webp': 'product_images/variants/x_160.webp'}}
+        with mock.patch.object(thumbnails, 'build_variants', return_value=variants):
+            thumbnails.generate_product_variants(product.pk, 'product_images/p.png')
+
+        for url in urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etags[url])
+
+
+class ProductImportFallbackTests(WimsTestCase):
+    def test_row_by_row_fallback_keeps_existing_columns(self):
+        product = self.make_product(image_variants={'source': 'product_images/p.png'})
+        Product.objects.filter(pk=product.pk).update(image='product_images/p.png')
+        df = pd.DataFrame([
+            {'Name': 'Renamed', 'SKU': 'SKU0', 'Barcode': 'B0', 'Price': 5, 'Quantity': 7},
+            {'Name': 'New', 'SKU': 'SKU1', 'Barcode': 'B1', 'Price': 3, 'Quantity': 1},
+        ])
+        with mock.patch.object(Product.objects, 'bulk_update', side_effect=IntegrityError('forced')):
+            importer = ProductBulkImporter(mode='upsert').run(df)
+
+        self.assertEqual(importer.summary(), {'created': 1, 'updated': 1, 'errors': None})
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.quantity), ('Renamed', 7))
+        self.assertEqual(product.image.name, 'product_images/p.png')
+        self.assertEqual(product.image_variants, {'source': 'product_images/p.png'})
+        self.assertIsNotNone(product.created_at)
+        self.assertTrue(Product.objects.filter(sku='SKU1').exists())
+
+
+class PlacementProductPoolTests(WimsTestCase):
+    def test_create_patch_delete_round_trip(self):
+        product = self.make_product()
+        warehouse = Warehouse.objects.create(name='W', address='a')
+        location = WarehouseLocation.objects.create(
+            warehouse=warehouse, section_name='L0', storage_type='Shelf', capacity_class='Small', max_capacity=1000)
+        base = {'warehouse': warehouse.pk, 'product': product.pk, 'location': location.pk, 'category': self.category.pk,
+                'storage_type': 'shelf'}
+
+        for transaction_type in ('INBOUND', 'OUTBOUND'):
+            response = self.client.post('/api/stock-placements/', {
+                **base, 'batch_number': transaction_type, 'quantity': 30, 'transaction_type': transaction_type,
+            }, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            stock_id = response.data['stock_id']
+            product.refresh_from_db()
+            self.assertEqual(product.quantity, 70)
+
+            response = self.client.patch(f'/api/stock-placements/{stock_id}/', {'quantity': 50}, format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+            product.refresh_from_db()
+            self.assertEqual(product.quantity, 50)
+
+            response = self.client.patch(f'/api/stock-placements/{stock_id}/', {'quantity': 20}, format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+            product.refresh_from_db()
+            self.assertEqual(product.quantity, 80)
+
+            self.assertEqual(self.client.delete(f'/api/stock-placements/{stock_id}/').status_code, 204)
+            product.refresh_from_db()
+            self.assertEqual(product.quantity, 100)
+
+
+@override_settings(VELOCITY_HALF_LIFE_DAYS=2)
+class VelocityEpochTests(WimsTestCase):
+    def test_short_half_life_scores_stay_finite(self):
+        product = self.make_product()
+        warehouse = Warehouse.objects.create(name='W', address='a')
+        location = WarehouseLocation.objects.create(
+            warehouse=warehouse, section_name='L0', storage_type='Shelf', capacity_class='Small', max_capacity=1000)
+        placement = WarehouseStockPlacement.objects.create(
+            warehouse=warehouse, product=product, location=location, category=self.category, quantity=50,
+            storage_type='shelf', batch_number='B')
+
+        def move(moment):
+            movement = StockTransactions.objects.create(stock=placement, transaction_type='OUTBOUND', quantity=1)
+            StockTransactions.objects.filter(pk=movement.pk).update(transaction_date=moment)
+            refresh_velocity()
+
+        now = timezone.now()
+        move(now - timedelta(days=20))  # Ten half-lives before the second movement
+        move(now)
+        velocity = StockVelocity.objects.get(product=product, location=location)
+        self.assertTrue(math.isfinite(velocity.hits) and math.isfinite(velocity.units))
+        self.assertAlmostEqual(velocity.hits * current_factor(now), 1 + 2 ** -10, places=6)
@@ -9,7 +9,7 @@ from .views import SupplierViewSet,ProductViewSet,WarehouseViewSet,WarehouseLoca
 from django.conf import settings
 from django.conf.urls.static import static
 
-from .views import admin_dashboard, get_user_info, ProtectedResourceView, CustomTokenObtainPairView, CustomTokenVerifyView, LogoutView,WarehouseStockPlacementViewSet,WarehouseStockAuditListCreateView, WarehouseStockAuditDetailView,UserAPIView
+from .views import admin_dashboard, get_user_info, ProtectedResourceView, CustomTokenObtainPairView, CustomTokenVerifyView, LogoutView,WarehouseStockPlacementViewSet,WarehouseStockAuditListCreateView, WarehouseStockAuditDetailView,WarehouseStockAuditBatchView,UserAPIView,StockLevelViewSet,StockAlertViewSet,StockTransactionArchiveViewSet
 # Home route
 def home(request):
     return JsonResponse({"message": "Welcome to the API Home", "status": "success"})
@@ -22,6 +22,9 @@ router.register(r'warehouses', WarehouseViewSet, basename='warehouse')
 # router.register(r'warehouse-locations', WarehouseLocationViewSet)
 router.register(r'stock-placements', WarehouseStockPlacementViewSet, basename='stock-placement')
 router.register(r'stock-transactions', StockTransactionsViewSet, basename='stock-transactions')
+router.register(r'stock-transactions-archive', StockTransactionArchiveViewSet, basename='stock-transactions-archive')
+router.register(r'stock-levels', StockLevelViewSet, basename='stock-level')
+router.register(r'stock-alerts', StockAlertViewSet, basename='stock-alert')
 router.register(r'customer-accounts', CustomerAccountViewSet)
 router.register(r'orders', OrderViewSet)
 urlpatterns = [
@@ -31,6 +34,7 @@ urlpatterns = [
     path('api/customers/', CustomerListCreateView.as_view(), name='customer-list-create'),
     path('api/customers/<int:customer_id>/', CustomerDetailView.as_view(), name='customer-detail'),
     path('api/stock-audits/', WarehouseStockAuditListCreateView.as_view(), name='stock_audit_list_create'),
+    path('api/stock-audits/batch/', WarehouseStockAuditBatchView.as_view(), name='stock_audit_batch'),
     path('api/stock-audits/<int:pk>/', WarehouseStockAuditDetailView.as_view(), name='stock_audit_detail'),
     path('api/warehouse-locations/', WarehouseLocationListCreateView.as_view(), name='warehouse-location-list-create'),
     path('api/warehouse-locations/<int:id>/', WarehouseLocationDetailView.as_view(), name='warehouse-location-detail'),
@@ -0,0 +1,212 @@
+"""
+First-expired-first-out stock allocation.
+
+An order line is split across the batches (placements) of one warehouse in
+expiry order: the earliest expiry_date first, batches without an expiry date
+last, already expired batches never.
+
+allocate_order_lines() does this for a whole order as a fixed number of
+queries: one locking read of every candidate batch and one reserving UPDATE
+(the conditional UPDATE from wims.utils.stock). Lines that name no warehouse
+are split across warehouses from that same in-memory snapshot, touching as
+few warehouses and batches as it can.
+"""
+from collections import defaultdict
+from datetime import date
+from functools import reduce
+from itertools import accumulate
+from operator import or_
+
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from wims.models import WarehouseStockPlacement
+from wims.utils.stock import PLACEMENT_KEY_FIELDS, reserve_placements
+
+ALLOCATION_FIELDS = PLACEMENT_KEY_FIELDS + ('quantity', 'reserved_quantity', 'expiry_date', 'batch_number')
+
+
+def _fefo_key(placement):
+    return (placement.expiry_date is None, placement.expiry_date, placement.stock_id)
+
+
+def _take_fefo(batches, free, quantity, location_id=None):
+    """Take up to `quantity` from `batches` (FEFO order) batch by batch. Returns [(placement, quantity), ...]."""
+    parts = []
+    for placement in batches:
+        if not quantity:
+            break
+        if location_id is not None and placement.location_id != location_id:
+            continue
+        take = min(quantity, free[placement.stock_id])
+        if take > 0:
+            parts.append((placement, take))
+            free[placement.stock_id] -= take
+            quantity -= take
+    return parts
+
+
+def _take_fewest(batches, free, quantity):
+    """
+    Take up to `quantity` from `batches` (FEFO order) in as few batches as
+    possible and, among the ways to do that, from the earliest expiring ones:
+    each step takes the first batch in FEFO order after which the rest still
+    fits in one batch fewer. Returns [(placement, quantity), ...].
+    """
+    available = [placement for placement in batches if free[placement.stock_id] > 0]
+    parts = []
+    while quantity and available:
+        sizes = sorted((free[placement.stock_id] for placement in available), reverse=True)
+        totals = list(accumulate(sizes))
+        slots = next((count for count, total in enumerate(totals, 1) if total >= quantity), None)
+        if slots is None:
+            return parts + _take_fefo(available, free, quantity)  # Short: everything there is
+        chosen = available[0]
+        for placement in available:
+            size = free[placement.stock_id]
+            # Largest total the other batches can add in the slots left
+            if slots == 1:
+                others = 0
+            elif size >= sizes[slots - 2]:
+                others = totals[slots - 1] - size
+            else:
+                others = totals[slots - 2]
+            if size + others >= quantity:
+                chosen = placement
+                break
+        take = min(quantity, free[chosen.stock_id])
+        parts.append((chosen, take))
+        free[chosen.stock_id] -= take
+        quantity -= take
+        available.remove(chosen)
+    return parts
+
+
+def _choose_warehouses(demand, stock, touched, soonest):
+    """
+    Greedy set cover over warehouses for {product_id: units} of demand, `stock`
+    being {warehouse_id: {product_id: free units}}. Warehouses the order
+    already uses come first, then the one covering the most whole products,
+    the most units, and the earliest expiry (`soonest`, {warehouse_id: date}).
+    Returns warehouse ids in the order they were chosen.
+    """
+    remaining = dict(demand)
+    candidates = set(stock)
+    chosen = []
+
+    def score(warehouse_id):
+        free = stock[warehouse_id]
+        covered = sum(min(units, free.get(product_id, 0)) for product_id, units in remaining.items())
+        whole = sum(1 for product_id, units in remaining.items() if units and free.get(product_id, 0) >= units)
+        expiry = soonest.get(warehouse_id) or date.max
+        return covered > 0, warehouse_id in touched, whole, covered, -expiry.toordinal(), -warehouse_id
+
+    while candidates and any(remaining.values()):
+        best = max(candidates, key=score)
+        if not score(best)[0]:
+            break
+        candidates.discard(best)
+        chosen.append(best)
+        for product_id, units in remaining.items():
+            remaining[product_id] = max(0, units - stock[best].get(product_id, 0))
+    return chosen
+
+
+def allocate_order_lines(lines):
+    """
+    Allocate every line of an order at once. `lines` are dicts with product,
+    quantity and optional warehouse and location. The candidate batches of
+    all lines are read in one query and locked in primary-key order (so
+    concurrent orders lock rows in the same order), split in memory and
+    reserved with a single conditional UPDATE.
+
+    A line naming a warehouse is split FEFO within it (and within its location,
+    if given). Lines without a warehouse are split across warehouses: as few
+    warehouses as possible for the whole order, then as few batches per line
+    as possible, earliest expiry first among equals.
+
+    Returns one [(placement, quantity), ...] per line; raises ValidationError
+    if a line cannot be covered, StockConflict if stock moved underneath an
+    unlocked read.
+    """
+    if not lines:
+        return []
+    pinned = defaultdict(set)
+    floating = set()
+    for line in lines:
+        if line.get('warehouse'):
+            pinned[line['warehouse'].pk].add(line['product'].pk)
+        else:
+            floating.add(line['product'].pk)
+    scope = [Q(warehouse_id=warehouse_id, product_id__in=sorted(product_ids)) for warehouse_id, product_ids in sorted(pinned.items())]
+    if floating:
+        scope.append(Q(product_id__in=sorted(floating)))
+    candidates = (WarehouseStockPlacement.objects
+                  .select_for_update(of=('self',))
+                  .filter(reduce(or_, scope))
+                  .filter(quantity__gt=F('reserved_quantity'))
+                  .exclude(expiry_date__lt=timezone.localdate())
+                  .order_by('pk')
+                  .values_list(*ALLOCATION_FIELDS, named=True))
+    # The snapshot is plain rows; only the batches picked become model instances
+    by_pair = defaultdict(list)
+    free = {}
+    for row in candidates:
+        by_pair[row.product_id, row.warehouse_id].append(row)
+        free[row.stock_id] = row.quantity - row.reserved_quantity
+    for batches in by_pair.values():
+        batches.sort(key=_fefo_key)
+
+    allocations = [None] * len(lines)
+    touched = set()
+    for index, line in enumerate(lines):
+        if line.get('warehouse'):
+            location = line.get('location')
+            allocations[index] = _take_fefo(by_pair[line['product'].pk, line['warehouse'].pk], free, line['quantity'],
+                                            location.pk if location is not None else None)
+            touched.add(line['warehouse'].pk)
+
+    if floating:
+        demand = defaultdict(int)
+        for line in lines:
+            if not line.get('warehouse'):
+                demand[line['product'].pk] += line['quantity']
+        stock = defaultdict(lambda: defaultdict(int))
+        soonest = {}
+        for (product_id, warehouse_id), batches in by_pair.items():
+            if product_id in demand:
+                stock[warehouse_id][product_id] += sum(free[placement.stock_id] for placement in batches)
+                expiry = next((placement.expiry_date for placement in batches if free[placement.stock_id] > 0), None)
+                if expiry is not None and expiry < (soonest.get(warehouse_id) or date.max):
+                    soonest[warehouse_id] = expiry
+        warehouses = _choose_warehouses(demand, stock, touched, soonest)
+
+        for index, line in enumerate(lines):
+            if line.get('warehouse'):
+                continue
+            product_id, remaining = line['product'].pk, line['quantity']
+            # One chosen warehouse holding the whole line beats splitting it
+            whole = next((warehouse_id for warehouse_id in warehouses
+                          if sum(free[placement.stock_id] for placement in by_pair[product_id, warehouse_id]) >= remaining), None)
+            parts = []
+            for warehouse_id in [whole] if whole is not None else warehouses:
+                taken = _take_fewest(by_pair[product_id, warehouse_id], free, remaining)
+                parts.extend(taken)
+                remaining -= sum(quantity for _, quantity in taken)
+                if not remaining:
+                    break
+            allocations[index] = parts
+
+    reserved = defaultdict(int)
+    placements = {}
+    for line, parts in zip(lines, allocations):
+        if sum(quantity for _, quantity in parts) < line['quantity']:
+            raise serializers.ValidationError(f"Insufficient stock for {line['product'].name}")
+        for row, quantity in parts:
+            reserved[row.stock_id] += quantity
+            if row.stock_id not in placements:
+                placements[row.stock_id] = WarehouseStockPlacement(**row._asdict())
+
+    reserve_placements(placements, reserved)
+    return [[(placements[row.stock_id], quantity) for row, quantity in parts] for parts in allocations]
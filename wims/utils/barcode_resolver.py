@@ -0,0 +1,64 @@
+import logging
+
+from django.conf import settings
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from wims.models import Product
+from wims.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# code (barcode or SKU) -> resolved product dict, or None for unknown codes.
+# ('product', product_id) -> set of codes cached for that product, used for invalidation.
+resolver_cache = TTLCache(maxsize=settings.BARCODE_CACHE_SIZE, ttl=settings.BARCODE_CACHE_TTL)
+
+
+def _lookup(codes):
+    """Resolve codes against barcode or SKU in a single query, with available stock summed per product."""
+    rows = (Product.objects
+            .filter(Q(barcode__in=codes) | Q(sku__in=codes))
+            .order_by()
+            .annotate(available_stock=Coalesce(
+                Sum(F('stock_placements__quantity') - F('stock_placements__reserved_quantity')), 0))
+            .values('product_id', 'name', 'sku', 'barcode', 'price', 'is_active', 'available_stock'))
+    found = {}
+    for row in rows:
+        row['price'] = str(row['price'])  # Same representation as ProductSerializer
+        # A barcode match wins over a SKU match if a code happens to be both
+        found.setdefault(row['sku'], row)
+        found[row['barcode']] = row
+    return found
+
+
+def resolve_codes(codes):
+    """
+    Return {code: product dict or None} for every code, serving from the
+    in-process cache and querying only for codes that are not cached.
+    """
+    results = {}
+    missing = []
+    for code in codes:
+        entry = resolver_cache.get(code, default=False)
+        if entry is False:
+            missing.append(code)
+        else:
+            results[code] = entry
+
+    if missing:
+        found = _lookup(missing)
+        for code in missing:
+            entry = found.get(code)
+            results[code] = entry
+            resolver_cache.set(code, entry)
+            if entry is not None:
+                key = ('product', entry['product_id'])
+                resolver_cache.set(key, (resolver_cache.get(key) or set()) | {code})
+    return results
+
+
+def invalidate_product(product_id, *codes):
+    """Drop every cached code of a product, plus `codes` (its current SKU/barcode)."""
+    key = ('product', product_id)
+    cached_codes = resolver_cache.get(key) or set()
+    resolver_cache.delete(key, *cached_codes, *codes)
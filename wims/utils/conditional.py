@@ -0,0 +1,38 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def queryset_validators(queryset, timestamp_field):
+    """
+    Cheap validators for a whole (filtered) queryset: max(timestamp) plus
+    row count in one aggregate query. Edits bump the max, deletes lower the count.
+    """
+    stamp = queryset.order_by().aggregate(last_modified=Max(timestamp_field), count=Count('pk'))
+    return stamp['last_modified'], stamp['count']
+
+
+def make_etag(request, *parts):
+    """Strong ETag over the full request URL (filters, cursor, fields) and the validators."""
+    raw = '|'.join([request.get_full_path()] + [str(part) for part in parts])
+    return quote_etag(hashlib.md5(raw.encode('utf-8')).hexdigest())
+
+
+def conditional_response(request, etag, last_modified, render):
+    """
+    Return 304 if the client's If-None-Match/If-Modified-Since still match,
+    otherwise call `render()` and stamp ETag/Last-Modified on its response.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if not_modified is not None:
+        return not_modified
+
+    response = render()
+    if response.status_code == 200:
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+    return response
@@ -0,0 +1,89 @@
+"""
+Archival of the StockTransactions ledger.
+
+Whole calendar months older than LEDGER_ARCHIVE_AFTER_DAYS are moved into
+StockTransactionArchive (one `period` per month). For every placement whose
+history moved, a single OPENING row carrying the signed net of that history
+is left in the hot table, dated at the cutoff, so summing a placement's hot
+ledger still gives its balance. OPENING rows are archived like any other row
+on the next run and folded into the new one.
+
+Work is done in chunks of placements, each in its own transaction; the rows
+being moved are locked, and new movements are always dated after the cutoff.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from wims.models import StockTransactionArchive, StockTransactions
+
+OPENING = 'OPENING'
+ARCHIVE_FIELDS = ('transaction_id', 'stock_id', 'transaction_type', 'quantity', 'transaction_date')
+
+
+def signed_quantity():
+    """Ledger quantity with its sign: OUTBOUND negative, INBOUND and (signed) OPENING as stored."""
+    return Case(When(transaction_type='OUTBOUND', then=-F('quantity')), default=F('quantity'))
+
+
+def month_start(value):
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date().replace(day=1)
+
+
+def archive_cutoff(days=None, now=None):
+    """Start of the month containing now - days; everything before it is archived."""
+    days = settings.LEDGER_ARCHIVE_AFTER_DAYS if days is None else days
+    period = month_start((now or timezone.now()) - timedelta(days=days))
+    return timezone.make_aware(datetime.combine(period, time.min))
+
+
+def _archive_chunk(stock_ids, cutoff):
+    old = StockTransactions.objects.filter(stock_id__in=stock_ids, transaction_date__lt=cutoff)
+    rows = list(old.select_for_update().order_by().values(*ARCHIVE_FIELDS))
+    if not rows:
+        return 0
+
+    net = defaultdict(int)
+    for row in rows:
+        net[row['stock_id']] += -row['quantity'] if row['transaction_type'] == 'OUTBOUND' else row['quantity']
+
+    StockTransactionArchive.objects.bulk_create(
+        [StockTransactionArchive(period=month_start(row['transaction_date']), **row) for row in rows],
+        batch_size=settings.STOCK_BATCH_INSERT_SIZE,
+    )
+    old.delete()
+    StockTransactions.objects.bulk_create(
+        [StockTransactions(stock_id=stock_id, transaction_type=OPENING, quantity=quantity)
+         for stock_id, quantity in net.items() if quantity],
+        batch_size=settings.STOCK_BATCH_INSERT_SIZE,
+    )
+    # transaction_date is auto_now_add; backdate the new openings to the cutoff
+    StockTransactions.objects.filter(
+        stock_id__in=stock_ids, transaction_type=OPENING, transaction_date__gt=cutoff,
+    ).update(transaction_date=cutoff)
+    return len(rows)
+
+
+def archive_ledger(cutoff, chunk_size=None):
+    """
+    Archive every ledger row dated before `cutoff`, chunk by chunk.
+    Yields (placements, rows) for each committed chunk.
+    """
+    chunk_size = chunk_size or settings.LEDGER_ARCHIVE_CHUNK_SIZE
+    placements = (StockTransactions.objects.filter(transaction_date__lt=cutoff)
+                  .order_by('stock_id').values_list('stock_id', flat=True).distinct())
+    last_stock_id = 0
+    while True:
+        stock_ids = list(placements.filter(stock_id__gt=last_stock_id)[:chunk_size])
+        if not stock_ids:
+            return
+        with transaction.atomic():
+            moved = _archive_chunk(stock_ids, cutoff)
+        last_stock_id = stock_ids[-1]
+        yield len(stock_ids), moved
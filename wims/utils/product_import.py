@@ -0,0 +1,408 @@
+import hashlib
+import logging
+from datetime import timedelta
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from wims.models import Product, ProductImportJob
+from wims.utils.barcode_resolver import invalidate_product
+from wims.utils.product_search import index_products
+from wims.utils.reference_cache import category_cache, supplier_cache
+
+logger = logging.getLogger(__name__)
+
+IMPORT_MODES = ('insert', 'upsert')
+
+UPDATE_FIELDS = ['name', 'category', 'supplier', 'sku', 'barcode', 'price', 'weight', 'quantity', 'is_active', 'updated_at']
+
+
+def _text_column(df, column, default=''):
+    """Return a stripped string column, falling back to `default` for blanks."""
+    if column not in df:
+        return pd.Series(default, index=df.index, dtype=object)
+    values = df[column].where(df[column].notna(), default).astype(str).str.strip()
+    return values.mask(values == '', default)
+
+
+def _number_column(df, column, default='0', na_values=()):
+    """Return a float column; unparsable cells become NaN so they can be reported."""
+    values = _text_column(df, column, default).str.replace('$', '', regex=False).str.strip()
+    if na_values:
+        values = values.mask(values.isin(na_values), '0')
+    return pd.to_numeric(values.mask(values == '', default), errors='coerce')
+
+
+def _invalidate_resolved(codes):
+    for product_id, *product_codes in codes:
+        invalidate_product(product_id, *filter(None, product_codes))
+
+
+class ProductBulkImporter:
+    """
+    Set-based product import.
+
+    Rows are cleaned and validated column-wise with pandas, categories and
+    suppliers are resolved with one query per chunk of names (missing ones are
+    bulk created) and products are written with chunked bulk_create/bulk_update.
+    Errors keep the same shape as the old row-by-row import: the spreadsheet
+    row number plus field errors.
+    """
+
+    def __init__(self, mode='insert', chunk_size=1000):
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"Invalid import mode: {mode}")
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+        self._category_ids = {}
+        self._supplier_ids = {}
+
+    # ------------------------------------------------------------------
+    # Validation
+    # ------------------------------------------------------------------
+    def prepare(self, df):
+        """Normalise raw spreadsheet columns into typed product columns."""
+        frame = pd.DataFrame(index=df.index)
+        frame['name'] = _text_column(df, 'Name')
+        frame['sku'] = _text_column(df, 'SKU')
+        frame['barcode'] = _text_column(df, 'Barcode')
+        frame['category_name'] = _text_column(df, 'Category', 'Uncategorized')
+        frame['supplier_name'] = _text_column(df, 'Supplier', 'N/A')
+        frame['price'] = _number_column(df, 'Price')
+        frame['weight'] = _number_column(df, 'Weight', na_values=('N/A',))
+        frame['quantity'] = _number_column(df, 'Quantity')
+        frame['is_active'] = _text_column(df, 'Status', 'Active').str.lower() == 'active'
+        return frame
+
+    def validate(self, frame):
+        """Return {index: {field: [messages]}} for every invalid row."""
+        errors = {}
+
+        def flag(mask, field, message):
+            for index in mask[mask].index:
+                errors.setdefault(index, {}).setdefault(field, []).append(message)
+
+        for field, max_length in (('name', 100), ('sku', 20), ('barcode', 50)):
+            flag(frame[field] == '', field, "This field may not be blank.")
+            flag(frame[field].str.len() > max_length, field, f"Ensure this field has no more than {max_length} characters.")
+        flag(frame['category_name'].str.len() > 255, 'category', "Ensure this field has no more than 255 characters.")
+        flag(frame['supplier_name'].str.len() > 150, 'supplier', "Ensure this field has no more than 150 characters.")
+
+        price = frame['price']
+        flag(price.isna(), 'price', "A valid number is required.")
+        flag(price < 0, 'price', "Ensure this value is greater than or equal to 0.")
+        flag(price >= 10 ** 8, 'price', "Ensure that there are no more than 10 digits in total.")
+        cents = price * 100
+        flag(price.notna() & ~np.isclose(cents, cents.round()), 'price', "Ensure that there are no more than 2 decimal places.")
+
+        weight = frame['weight']
+        flag(weight.isna(), 'weight', "A valid number is required.")
+        flag(weight < 0, 'weight', "Ensure this value is greater than or equal to 0.")
+
+        quantity = frame['quantity']
+        flag(quantity.isna() | (quantity.notna() & (quantity != quantity.round())), 'quantity', "A valid integer is required.")
+        flag(quantity < 0, 'quantity', "Ensure this value is greater than or equal to 0.")
+
+        for field, label in (('sku', 'SKU'), ('barcode', 'Barcode')):
+            duplicated = frame[field].duplicated(keep='first') & (frame[field] != '')
+            flag(duplicated, field, f"Duplicate {label} in file.")
+        return errors
+
+    # ------------------------------------------------------------------
+    # Reference data
+    # ------------------------------------------------------------------
+    def _resolve_names(self, reference_cache, names, resolved):
+        """Map names to primary keys through the reference cache, bulk creating the ones that do not exist yet."""
+        missing = set(names) - resolved.keys()
+        if not missing:
+            return
+        model, field = reference_cache.model, reference_cache.name_field
+        found = reference_cache.pks_by_name(missing)
+        to_create = missing - found.keys()
+        if to_create:
+            model.objects.bulk_create([model(**{field: name}) for name in to_create], ignore_conflicts=True)
+            found.update(reference_cache.pks_by_name(to_create))
+        # Case-insensitive collations (MySQL) may hand back a differently cased name
+        unresolved = missing - found.keys()
+        if unresolved:
+            rows = model.objects.filter(**{f'{field}__in': unresolved}).values_list(field, 'pk')
+            folded = {name.casefold(): pk for name, pk in rows}
+            found.update((name, folded[name.casefold()]) for name in unresolved if name.casefold() in folded)
+        resolved.update(found)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def _existing(self, field, values):
+        """Return {value: (product_id, sku, barcode)} for products already in the database."""
+        existing = {}
+        values = list(values)
+        for start in range(0, len(values), self.chunk_size):
+            rows = Product.objects.filter(**{f'{field}__in': values[start:start + self.chunk_size]}).values_list(
+                field, 'product_id', 'sku', 'barcode'
+            )
+            for value, product_id, sku, barcode in rows:
+                existing[value] = (product_id, sku, barcode)
+        return existing
+
+    def _build(self, row, product_id=None):
+        return Product(
+            product_id=product_id,
+            name=row.name,
+            category_id=self._category_ids[row.category_name],
+            supplier_id=self._supplier_ids[row.supplier_name],
+            sku=row.sku,
+            barcode=row.barcode,
+            price=round(row.price, 2),
+            weight=float(row.weight),
+            quantity=int(row.quantity),
+            is_active=bool(row.is_active),
+        )
+
+    def _write_chunk(self, chunk, errors):
+        by_sku = self._existing('sku', chunk['sku'])
+        by_barcode = self._existing('barcode', chunk['barcode'])
+        now = timezone.now()
+        to_create, to_update = [], []
+
+        for row in chunk.itertuples():
+            sku_match = by_sku.get(row.sku)
+            barcode_match = by_barcode.get(row.barcode)
+            if self.mode == 'insert':
+                row_errors = {}
+                if sku_match:
+                    row_errors['sku'] = ["Product with this SKU already exists."]
+                if barcode_match:
+                    row_errors['barcode'] = ["Product with this Barcode already exists."]
+                if row_errors:
+                    errors[row.Index] = row_errors
+                    continue
+                to_create.append((row.Index, self._build(row)))
+                continue
+
+            match = sku_match or barcode_match
+            if sku_match and barcode_match and sku_match[0] != barcode_match[0]:
+                errors[row.Index] = {'barcode': ["Barcode belongs to a different product than SKU."]}
+            elif match:
+                product = self._build(row, product_id=match[0])
+                product.updated_at = now
+                to_update.append((row.Index, product))
+            else:
+                to_create.append((row.Index, self._build(row)))
+
+        try:
+            with transaction.atomic():
+                if to_create:
+                    Product.objects.bulk_create([product for _, product in to_create], batch_size=self.chunk_size)
+                if to_update:
+                    Product.objects.bulk_update([product for _, product in to_update], UPDATE_FIELDS, batch_size=self.chunk_size)
+                # bulk writes skip post_save, so refresh the search index and the
+                # barcode resolver here (re-read by SKU: MySQL does not return ids from bulk_create)
+                skus = [product.sku for _, product in to_create + to_update]
+                if skus:
+                    written = list(Product.objects.filter(sku__in=skus).only('product_id', 'name', 'sku', 'barcode'))
+                    index_products(written)
+                    codes = [(product.product_id, product.sku, product.barcode) for product in written]
+                    transaction.on_commit(lambda: _invalidate_resolved(codes))
+            self.created += len(to_create)
+            self.updated += len(to_update)
+        except IntegrityError as e:
+            # A concurrent writer took a SKU/barcode after our existence check:
+            # fall back to row-by-row saves for this chunk to pinpoint the rows.
+            logger.warning(f"Bulk write failed, retrying chunk row by row: {e}")
+            rows = [(index, product, True) for index, product in to_create]
+            rows += [(index, product, False) for index, product in to_update]
+            for index, product, is_new in rows:
+                try:
+                    with transaction.atomic():
+                        if is_new:
+                            # bulk_create may have set a pk before the rollback
+                            product.product_id = None
+                            product.save(force_insert=True)
+                        else:
+                            # _build() rows carry only the import columns; a full save
+                            # would null created_at and wipe image/image_variants
+                            product.save(update_fields=UPDATE_FIELDS)
+                    if is_new:
+                        self.created += 1
+                    else:
+                        self.updated += 1
+                except IntegrityError as row_error:
+                    errors[index] = {'non_field_errors': [str(row_error)]}
+
+    # ------------------------------------------------------------------
+    # Entry point
+    # ------------------------------------------------------------------
+    def run(self, df, first_row=2):
+        """
+        Import a DataFrame of raw spreadsheet rows. `first_row` is the
+        spreadsheet row number of df's first record (header is row 1).
+        """
+        df = df.reset_index(drop=True)
+        frame = self.prepare(df)
+        errors = self.validate(frame)
+        valid = frame.drop(index=list(errors))
+
+        self._resolve_names(category_cache, valid['category_name'].unique(), self._category_ids)
+        self._resolve_names(supplier_cache, valid['supplier_name'].unique(), self._supplier_ids)
+
+        for start in range(0, len(valid), self.chunk_size):
+            self._write_chunk(valid.iloc[start:start + self.chunk_size], errors)
+
+        raw = df.astype(object).where(df.notna(), None)
+        for index in sorted(errors):
+            self.errors.append({
+                'row': index + first_row,
+                'data': raw.loc[index].to_dict(),
+                'errors': errors[index],
+            })
+        return self
+
+    def summary(self):
+        data = {'created': self.created}
+        if self.mode == 'upsert':
+            data['updated'] = self.updated
+        data['errors'] = self.errors or None
+        return data
+
+
+# ----------------------------------------------------------------------
+# Streaming import
+# ----------------------------------------------------------------------
+def file_checksum(uploaded_file):
+    """sha256 of an upload, read in chunks so the file never sits in memory."""
+    digest = hashlib.sha256()
+    for block in uploaded_file.chunks():
+        digest.update(block)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def _cell_text(value):
+    """Render an openpyxl cell value the way pandas' dtype=str would."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))  # Barcodes/SKUs typed as numbers in Excel
+    return str(value)
+
+
+def _iter_xlsx_frames(uploaded_file, chunk_size, skip_rows):
+    workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [_cell_text(cell) or '' for cell in header]
+        batch = []
+        for row in rows:
+            if all(cell is None for cell in row):
+                continue
+            if skip_rows:
+                skip_rows -= 1
+                continue
+            batch.append([_cell_text(cell) for cell in row])
+            if len(batch) == chunk_size:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def _iter_csv_frames(uploaded_file, chunk_size, skip_rows):
+    reader = pd.read_csv(uploaded_file, dtype=str, chunksize=chunk_size, skip_blank_lines=True)
+    # skiprows= would count raw lines (blank ones too); skip parsed records instead
+    for frame in reader:
+        if skip_rows >= len(frame):
+            skip_rows -= len(frame)
+            continue
+        if skip_rows:
+            frame = frame.iloc[skip_rows:].reset_index(drop=True)
+            skip_rows = 0
+        yield frame
+
+
+def iter_frames(uploaded_file, chunk_size, skip_rows=0):
+    """Yield DataFrames of at most chunk_size raw rows from an xlsx or csv upload."""
+    if uploaded_file.name.lower().endswith('.csv'):
+        return _iter_csv_frames(uploaded_file, chunk_size, skip_rows)
+    return _iter_xlsx_frames(uploaded_file, chunk_size, skip_rows)
+
+
+def count_rows(uploaded_file):
+    """Best-effort row count for progress reporting (None when unknown)."""
+    if uploaded_file.name.lower().endswith('.csv'):
+        return None
+    workbook = openpyxl.load_workbook(uploaded_file, read_only=True)
+    try:
+        max_row = workbook.active.max_row
+    finally:
+        workbook.close()
+        uploaded_file.seek(0)
+    return max_row - 1 if max_row else None
+
+
+def claim_import_job(job):
+    """
+    Take over a Failed job, or a Running one that stopped making progress
+    PRODUCT_IMPORT_STALE_AFTER seconds ago, for a resume. Compare-and-set on
+    status and updated_at, so of two concurrent resumes only one wins.
+    Returns False if the job is still running elsewhere.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.PRODUCT_IMPORT_STALE_AFTER)
+    claimed = ProductImportJob.objects.filter(pk=job.pk, updated_at=job.updated_at).filter(
+        Q(status='Failed') | Q(status='Running', updated_at__lt=stale)
+    ).update(status='Running', last_error='', updated_at=timezone.now())
+    if claimed:
+        job.refresh_from_db()
+    return bool(claimed)
+
+
+def run_import_job(job, uploaded_file):
+    """
+    Stream an upload into the database chunk by chunk. Each chunk's products
+    and the job's progress are committed together, so a crash leaves the job
+    pointing at the last fully imported row.
+    """
+    importer = ProductBulkImporter(mode=job.mode, chunk_size=job.chunk_size)
+    job.status = 'Running'
+    job.last_error = ''
+    job.save(update_fields=['status', 'last_error', 'updated_at'])
+
+    try:
+        for frame in iter_frames(uploaded_file, job.chunk_size, skip_rows=job.rows_processed):
+            created, updated = importer.created, importer.updated
+            importer.errors = []
+            with transaction.atomic():
+                importer.run(frame, first_row=job.rows_processed + 2)
+                job.rows_processed += len(frame)
+                job.created_count += importer.created - created
+                job.updated_count += importer.updated - updated
+                job.error_count += len(importer.errors)
+                room = ProductImportJob.MAX_STORED_ERRORS - len(job.errors)
+                if room > 0:
+                    job.errors.extend(importer.errors[:room])
+                job.save()
+            logger.info(f"Import job {job.job_id}: {job.rows_processed} rows committed")
+    except Exception as e:
+        job.refresh_from_db()  # Drop in-memory counters of the chunk that rolled back
+        logger.error(f"Import job {job.job_id} failed after {job.rows_processed} rows: {str(e)}")
+        job.status = 'Failed'
+        job.last_error = str(e)
+        job.save(update_fields=['status', 'last_error', 'updated_at'])
+        raise
+
+    job.status = 'Completed'
+    job.save(update_fields=['status', 'updated_at'])
+    return job
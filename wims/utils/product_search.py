@@ -0,0 +1,98 @@
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from wims.models import Product, ProductSearchToken
+
+TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+MAX_TOKEN_LENGTH = ProductSearchToken._meta.get_field('token').max_length
+MAX_QUERY_TERMS = 8
+
+
+def tokenize(text):
+    """Lowercased alphanumeric words of `text`, truncated to the token column length."""
+    return [word[:MAX_TOKEN_LENGTH] for word in TOKEN_RE.findall((text or '').lower())]
+
+
+def product_tokens(product):
+    """(token, weight) pairs for one product; codes are kept whole, names split into words."""
+    tokens = {token: ProductSearchToken.NAME_WEIGHT for token in tokenize(product.name)}
+    for code in (product.sku, product.barcode):
+        if code:
+            tokens[code.lower()[:MAX_TOKEN_LENGTH]] = ProductSearchToken.CODE_WEIGHT
+    return tokens.items()
+
+
+def index_products(products):
+    """Replace the search tokens of `products` (an iterable of Product instances)."""
+    products = list(products)
+    if not products:
+        return
+    with transaction.atomic():
+        ProductSearchToken.objects.filter(product_id__in=[p.product_id for p in products]).delete()
+        ProductSearchToken.objects.bulk_create(
+            [ProductSearchToken(product_id=p.product_id, token=token, weight=weight)
+             for p in products for token, weight in product_tokens(p)],
+            batch_size=2000,
+        )
+
+
+def _prefix_match(term):
+    """
+    Index-friendly prefix condition. MySQL turns LIKE 'term%' into an index
+    range scan under its case-insensitive collation (tokens are stored
+    lowercased). SQLite only does that for NOCASE columns, so there the prefix
+    is expressed as an explicit binary range instead.
+    """
+    if connection.vendor == 'mysql':
+        return Q(token__istartswith=term)
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return Q(token__gte=term, token__lt=upper)
+
+
+def search_products(query):
+    """
+    Ranked search over product name words, SKU and barcode. Terms of at least
+    SEARCH_MIN_PREFIX_LENGTH characters match as prefixes, shorter ones only
+    as whole tokens. At most SEARCH_MAX_CANDIDATES index rows are read (exact
+    matches first, then prefix matches in token order) and scored in memory,
+    so a very common prefix costs a bounded range scan rather than a grouping
+    of the whole index. Returns a list of {'product_id', 'score'} by score.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+    limit = settings.SEARCH_MAX_CANDIDATES
+    index = ProductSearchToken.objects.order_by('token').values_list('product_id', 'token', 'weight')
+
+    rows = list(index.filter(token__in=terms)[:limit])
+    prefixes = [term for term in terms if len(term) >= settings.SEARCH_MIN_PREFIX_LENGTH]
+    if prefixes and len(rows) < limit:
+        condition = Q()
+        for term in prefixes:
+            condition |= _prefix_match(term)
+        rows += index.filter(condition).exclude(token__in=terms)[:limit - len(rows)]
+
+    # Exact token matches count double compared to prefix matches
+    scores = defaultdict(int)
+    exact = set(terms)
+    for product_id, token, weight in rows:
+        scores[product_id] += weight * 2 if token in exact else weight
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [{'product_id': product_id, 'score': score} for product_id, score in ranked]
+
+
+def ranked_products(ranked_rows):
+    """Fetch the Product rows for one page of search results, in ranking order."""
+    scores = {row['product_id']: row['score'] for row in ranked_rows}
+    products = Product.objects.select_related('category', 'supplier').in_bulk(list(scores))
+    ordered = []
+    for product_id, score in scores.items():
+        product = products.get(product_id)
+        if product is not None:
+            product.search_score = score
+            ordered.append(product)
+    return ordered
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from wims.models import Category, Supplier, Warehouse, WarehouseLocation
+
+
+class ReferenceCache:
+    """
+    Versioned in-process map for a rarely changing table.
+
+    Rows are loaded lazily (one IN query per batch of misses) and kept per
+    worker. Every save/delete bumps a version counter in Django's cache; a
+    worker re-reads that counter at most every REFERENCE_CACHE_CHECK_INTERVAL
+    seconds and drops its maps when it moved. With the default LocMemCache the
+    counter is per process, so configure a shared CACHES backend (Redis,
+    Memcached) to invalidate across workers; REFERENCE_CACHE_MAX_AGE bounds
+    staleness either way.
+
+    Rows read inside a transaction are only kept once it commits, so a row
+    created by a transaction that rolls back is never cached.
+    """
+
+    def __init__(self, model, name_field=None, select_related=()):
+        self.model = model
+        self.name_field = name_field
+        self.select_related = select_related
+        self.version_key = f"wims:reference-cache:{model._meta.label_lower}"
+        self._lock = threading.Lock()
+        self._reset(version=None)
+
+    def __deepcopy__(self, memo):
+        # Shared per process; DRF deep-copies declared serializer fields and their arguments
+        return self
+
+    def _reset(self, version):
+        self._by_pk = {}
+        self._pk_by_name = {}
+        self._version = version
+        self._loaded_at = time.monotonic()
+        self._checked_at = self._loaded_at
+
+    def _queryset(self):
+        return self.model.objects.select_related(*self.select_related)
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < settings.REFERENCE_CACHE_CHECK_INTERVAL:
+            return
+        version = cache.get(self.version_key, 0)
+        with self._lock:
+            self._checked_at = now
+            if version != self._version or now - self._loaded_at > settings.REFERENCE_CACHE_MAX_AGE:
+                self._reset(version)
+
+    def _store(self, objects):
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._store_committed(objects))
+        else:
+            self._store_committed(objects)
+
+    def _store_committed(self, objects):
+        with self._lock:
+            for obj in objects:
+                self._by_pk[obj.pk] = obj
+                if self.name_field:
+                    self._pk_by_name[getattr(obj, self.name_field)] = obj.pk
+
+    def get_many(self, pks):
+        """{pk: instance} for the pks that exist."""
+        self._check_version()
+        pks = set(pks)
+        found = {pk: self._by_pk[pk] for pk in pks if pk in self._by_pk}
+        missing = pks - found.keys()
+        if missing:
+            loaded = list(self._queryset().filter(pk__in=missing))
+            self._store(loaded)
+            found.update((obj.pk, obj) for obj in loaded)
+        return found
+
+    def get(self, pk):
+        return self.get_many([pk]).get(pk)
+
+    def pks_by_name(self, names):
+        """{name: pk} for the names that exist (exact match)."""
+        self._check_version()
+        names = set(names)
+        found = {name: self._pk_by_name[name] for name in names if name in self._pk_by_name}
+        missing = names - found.keys()
+        if missing:
+            loaded = list(self._queryset().filter(**{f'{self.name_field}__in': missing}))
+            self._store(loaded)
+            found.update((getattr(obj, self.name_field), obj.pk) for obj in loaded)
+        return found
+
+    def invalidate(self):
+        """Bump the shared version so every worker drops its copy."""
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 1, timeout=None)
+        with self._lock:
+            self._reset(version=None)
+
+
+category_cache = ReferenceCache(Category, name_field='name_category')
+supplier_cache = ReferenceCache(Supplier, name_field='name_company')
+warehouse_cache = ReferenceCache(Warehouse)
+location_cache = ReferenceCache(WarehouseLocation, select_related=('warehouse',))
+
+REFERENCE_CACHES = {
+    Category: [category_cache],
+    Supplier: [supplier_cache],
+    Warehouse: [warehouse_cache, location_cache],  # Locations carry their warehouse
+    WarehouseLocation: [location_cache],
+}
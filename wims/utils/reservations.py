@@ -0,0 +1,106 @@
+"""
+Expiry of stale order reservations.
+
+An order holds its allocated batches (WarehouseStockPlacement.reserved_quantity)
+from the moment it is Reserved. Orders still Reserved RESERVATION_TTL seconds
+later are cancelled and their stock given back: per chunk of orders, one
+aggregate over their items, one locking read and one CASE UPDATE of the
+placements (wims.utils.stock.release_placements), one UPDATE of StockLevel and
+one UPDATE cancelling the orders. Every chunk is its own short transaction;
+order rows locked by someone else (an order being picked right now) are
+skipped and picked up by the next sweep.
+
+The sweep runs from `manage.py release_expired_reservations` (cron) or, with
+RESERVATION_SWEEP_INTERVAL set, from a daemon thread in each web worker.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from wims.models import Order, OrderItem
+from wims.utils.stock import release_placements
+
+logger = logging.getLogger(__name__)
+
+RESERVED = 'Reserved'
+CANCELLED = 'Cancelled'
+
+_sweeper = None
+
+
+def expiry_cutoff(ttl=None, now=None):
+    """Orders reserved before this moment have expired."""
+    ttl = settings.RESERVATION_TTL if ttl is None else ttl
+    return (now or timezone.now()) - timedelta(seconds=ttl)
+
+
+def expired_orders(cutoff):
+    return Order.objects.filter(status=RESERVED, reserved_at__lt=cutoff)
+
+
+def _release_chunk(cutoff, chunk_size):
+    order_ids = list(
+        expired_orders(cutoff).select_for_update(skip_locked=True)
+        .order_by('reserved_at', 'order_id').values_list('order_id', flat=True)[:chunk_size]
+    )
+    if not order_ids:
+        return 0, 0
+    quantities = dict(
+        OrderItem.objects.filter(order_id__in=order_ids, stock__isnull=False).order_by()
+        .values_list('stock_id').annotate(quantity=Sum('quantity'))
+    )
+    released = release_placements(quantities)
+    Order.objects.filter(order_id__in=order_ids).update(status=CANCELLED, updated_at=timezone.now())
+    return len(order_ids), sum(released.values())
+
+
+def release_expired_reservations(cutoff=None, chunk_size=None):
+    """
+    Cancel every order Reserved before `cutoff` and release its stock, chunk by
+    chunk. Yields (orders cancelled, units released) for each committed chunk.
+    """
+    cutoff = cutoff or expiry_cutoff()
+    chunk_size = chunk_size or settings.RESERVATION_SWEEP_CHUNK_SIZE
+    while True:
+        with transaction.atomic():
+            orders, units = _release_chunk(cutoff, chunk_size)
+        if not orders:
+            return
+        yield orders, units
+
+
+def sweep():
+    """One full pass; returns (orders cancelled, units released)."""
+    orders = units = 0
+    for chunk_orders, chunk_units in release_expired_reservations():
+        orders += chunk_orders
+        units += chunk_units
+    if orders:
+        logger.info(f"Released {units} reserved units of {orders} expired orders")
+    return orders, units
+
+
+def _sweep_forever(interval, stop):
+    while not stop.wait(interval):
+        try:
+            sweep()
+        except Exception as e:
+            logger.error(f"Reservation sweep failed: {e}")
+        finally:
+            close_old_connections()
+
+
+def start_sweeper():
+    """Start the in-process sweeper thread if RESERVATION_SWEEP_INTERVAL is set. Returns its stop Event."""
+    global _sweeper
+    interval = settings.RESERVATION_SWEEP_INTERVAL
+    if not interval or _sweeper is not None:
+        return _sweeper
+    _sweeper = threading.Event()
+    threading.Thread(target=_sweep_forever, args=(interval, _sweeper), name='reservation-sweeper', daemon=True).start()
+    return _sweeper
@@ -0,0 +1,180 @@
+"""
+Put-away slotting: rank the locations of a warehouse for inbound stock.
+
+Each warehouse gets an in-memory snapshot of its locations, grouped by
+storage type with each group sorted by free capacity. A suggestion bisects
+that list to the smallest locations the quantity fits in (best fit), looks
+at a bounded window from there plus the locations that already hold the
+product, and re-reads only the short list from the database before
+answering. The cost therefore stays flat when a warehouse has 100k locations.
+
+Snapshots are rebuilt after SLOTTING_INDEX_TTL seconds, or sooner when a
+location is saved or deleted (the location reference cache's version key).
+Only the first request of a warehouse waits for a build; later rebuilds run
+in one background thread per warehouse while requests keep using the old
+snapshot. Free capacity in a snapshot may therefore be minutes old; the
+final re-read and the capacity check on placement create keep answers
+correct, and locations added since the last build show up after the next.
+"""
+import bisect
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from wims.models import WarehouseLocation, WarehouseStockPlacement
+from wims.utils.reference_cache import location_cache
+
+logger = logging.getLogger(__name__)
+
+COLD_STORAGE = 'cold_storage'
+LOCATION_FIELDS = (
+    'id', 'section_name', 'storage_type', 'capacity_class', 'max_capacity', 'occupied_quantity', 'placement_count',
+)
+
+
+def storage_key(storage_type):
+    """Placements say 'cold_storage', locations 'Cold Storage'; compare them as the former."""
+    return (storage_type or '').strip().lower().replace(' ', '_')
+
+
+class SlottingIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._snapshots = {}
+        self._refreshing = set()
+
+    def _build(self, warehouse_id, version):
+        rows = WarehouseLocation.objects.filter(warehouse_id=warehouse_id).values(*LOCATION_FIELDS)
+        locations = {}
+        groups = {}
+        for row in rows:
+            row['free'] = row['max_capacity'] - row['occupied_quantity']
+            locations[row['id']] = row
+            groups.setdefault(storage_key(row['storage_type']), []).append((row['free'], row['id']))
+        by_type = {}
+        for key, entries in groups.items():
+            entries.sort()
+            by_type[key] = ([free for free, _ in entries], [location_id for _, location_id in entries])
+        return {'version': version, 'loaded_at': time.monotonic(), 'locations': locations, 'by_type': by_type}
+
+    def _refresh(self, warehouse_id, version):
+        try:
+            snapshot = self._build(warehouse_id, version)
+            with self._lock:
+                self._snapshots[warehouse_id] = snapshot
+        except Exception as e:
+            logger.error(f"Slotting index rebuild for warehouse {warehouse_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(warehouse_id)
+            connections.close_all()  # This thread's connection only
+
+    def snapshot(self, warehouse_id):
+        version = cache.get(location_cache.version_key, 0)
+        snapshot = self._snapshots.get(warehouse_id)
+        if snapshot is None:
+            # First use in this worker: build once, concurrent requests wait for it
+            with self._build_lock:
+                snapshot = self._snapshots.get(warehouse_id)
+                if snapshot is None:
+                    snapshot = self._build(warehouse_id, version)
+                    with self._lock:
+                        self._snapshots[warehouse_id] = snapshot
+            return snapshot
+        if snapshot['version'] != version or time.monotonic() - snapshot['loaded_at'] > settings.SLOTTING_INDEX_TTL:
+            # Keep answering from the old snapshot while one thread rebuilds it
+            with self._lock:
+                start = warehouse_id not in self._refreshing
+                self._refreshing.add(warehouse_id)
+            if start:
+                threading.Thread(target=self._refresh, args=(warehouse_id, version),
+                                 name=f'slotting-index-{warehouse_id}', daemon=True).start()
+        return snapshot
+
+    def clear(self):
+        with self._lock:
+            self._snapshots = {}
+
+
+slotting_index = SlottingIndex()
+
+
+def _weight_allowed(capacity_class, weight):
+    limit = settings.SLOTTING_CLASS_MAX_WEIGHT.get(capacity_class)
+    return limit is None or weight <= limit
+
+
+def _score(row, quantity, requested_type, colocated):
+    weights = settings.SLOTTING_WEIGHTS
+    free = row['max_capacity'] - row['occupied_quantity']
+    reasons = {
+        'storage_type_match': 1.0 if storage_key(row['storage_type']) == requested_type else 0.0,
+        'colocated': 1.0 if row['id'] in colocated else 0.0,
+        # Best fit: fill locations whose free space matches the quantity, keep big gaps for big loads
+        'fit': quantity / free if free > 0 else 0.0,
+        # Fewer distinct batches in a location means less mixing and cheaper picks
+        'fragmentation': 1.0 / (1 + row['placement_count']),
+    }
+    score = sum(weights[name] * value for name, value in reasons.items())
+    return round(score, 4), free, reasons
+
+
+def suggest_locations(warehouse_id, quantity, storage_type=None, product_id=None, weight=0, limit=5):
+    """
+    Up to `limit` locations ranked for putting away `quantity` units, best first:
+    [{'location_id', 'section_name', 'storage_type', 'capacity_class', 'max_capacity',
+      'free_capacity', 'score', 'reasons'}, ...]
+    """
+    snapshot = slotting_index.snapshot(warehouse_id)
+    requested_type = storage_key(storage_type)
+    if requested_type == COLD_STORAGE:
+        types = [COLD_STORAGE]  # Chilled goods only go to cold storage...
+    elif requested_type:
+        # ...and ambient goods never take cold space; other ambient types are allowed with a lower score
+        types = [requested_type] + [key for key in snapshot['by_type'] if key not in (requested_type, COLD_STORAGE)]
+    else:
+        types = [key for key in snapshot['by_type'] if key != COLD_STORAGE]
+
+    window = settings.SLOTTING_CANDIDATE_WINDOW
+    candidates = set()
+    for key in types:
+        frees, location_ids = snapshot['by_type'].get(key, ([], []))
+        start = bisect.bisect_left(frees, quantity)
+        candidates.update(location_ids[start:start + window])
+
+    colocated = set()
+    if product_id is not None:
+        # Served by the (product, warehouse, location) index
+        colocated = set(WarehouseStockPlacement.objects
+                        .filter(product_id=product_id, warehouse_id=warehouse_id)
+                        .values_list('location_id', flat=True).distinct())
+        candidates.update(location_id for location_id in colocated if location_id in snapshot['locations'])
+
+    allowed_types = set(types)
+    ranked = []
+    for location_id in candidates:
+        row = snapshot['locations'][location_id]
+        if storage_key(row['storage_type']) in allowed_types and _weight_allowed(row['capacity_class'], weight):
+            ranked.append((_score(row, quantity, requested_type, colocated)[0], location_id))
+    ranked.sort(reverse=True)
+    shortlist = [location_id for _, location_id in ranked[:limit * 3]]
+
+    # Re-read the shortlist so the answer reflects committed occupancy, not the snapshot
+    fresh = WarehouseLocation.objects.filter(pk__in=shortlist).values(*LOCATION_FIELDS)
+    suggestions = []
+    for row in fresh:
+        score, free, reasons = _score(row, quantity, requested_type, colocated)
+        if free < quantity:
+            continue
+        suggestions.append({
+            'location_id': row['id'], 'section_name': row['section_name'], 'storage_type': row['storage_type'],
+            'capacity_class': row['capacity_class'], 'max_capacity': row['max_capacity'],
+            'free_capacity': free, 'score': score, 'reasons': reasons,
+        })
+    suggestions.sort(key=lambda suggestion: (-suggestion['score'], suggestion['location_id']))
+    return suggestions[:limit]
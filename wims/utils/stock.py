@@ -0,0 +1,282 @@
+"""
+Stock mutations as single conditional UPDATEs.
+
+Every change to a quantity counter goes through here as
+`UPDATE ... SET col = col + n WHERE pk = ... AND <enough stock>` built from
+F-expressions. The database applies it atomically, so concurrent POS and
+receiving requests cannot lose updates and no counter can go negative.
+Nothing here reads a row, changes it in Python and saves it back.
+
+The StockLevel summary (product x warehouse) and the occupancy counters of
+WarehouseLocation are bumped with the same kind of UPDATE in the same
+transaction, so neither needs a request-time aggregate; an increase that
+would overfill a location is refused by the UPDATE's WHERE clause. Min/max
+alerts are opened or resolved when a change crosses a threshold.
+"""
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+from rest_framework import serializers
+
+from wims.models import Product, StockLevel, WarehouseLocation, WarehouseStockPlacement
+from wims.utils.barcode_resolver import invalidate_product
+from wims.utils.stock_alerts import placement_thresholds, record_quantity_change
+
+
+# Fields a placement needs for the helpers below; load them with .only(*PLACEMENT_KEY_FIELDS)
+PLACEMENT_KEY_FIELDS = ('stock_id', 'product_id', 'warehouse_id', 'location_id')
+
+
+class StockConflict(serializers.ValidationError):
+    """A compare-and-set lost against a concurrent writer; the client should retry."""
+    status_code = 409
+
+
+def _conditional_update(queryset, **updates):
+    return queryset.update(**updates) == 1
+
+
+def _placement_changed(placement):
+    # QuerySet.update() sends no post_save, so drop the resolver entry here
+    product_id = placement.product_id
+    transaction.on_commit(lambda: invalidate_product(product_id))
+
+
+def bump_stock_level(product_id, warehouse_id, on_hand=0, reserved=0, weight=0, create=True):
+    """Add deltas to a StockLevel row, creating it on first use unless `create` is False."""
+    if not (on_hand or reserved or weight):
+        return
+    updates = {'updated_at': timezone.now()}
+    if on_hand or reserved:
+        updates['available'] = F('available') + (on_hand - reserved)
+    if on_hand:
+        updates['on_hand'] = F('on_hand') + on_hand
+    if reserved:
+        updates['reserved'] = F('reserved') + reserved
+    if weight:
+        updates['weight'] = F('weight') + weight
+    levels = StockLevel.objects.filter(product_id=product_id, warehouse_id=warehouse_id)
+    if levels.update(**updates) or not create:
+        return
+    try:
+        with transaction.atomic():
+            StockLevel.objects.create(
+                product_id=product_id, warehouse_id=warehouse_id, on_hand=on_hand,
+                reserved=reserved, available=on_hand - reserved, weight=weight,
+            )
+    except IntegrityError:
+        # Another transaction created the row first
+        levels.update(**updates)
+
+
+def bump_stock_levels_reserved(reserved, create=True):
+    """bump_stock_level(reserved=n) for many {(product_id, warehouse_id): n} pairs with one UPDATE."""
+    # Conditions grouped per warehouse (and amount) keep the statement short for large orders
+    products = defaultdict(list)
+    by_amount = defaultdict(list)
+    for (product_id, warehouse_id), quantity in reserved.items():
+        products[warehouse_id].append(product_id)
+        by_amount[warehouse_id, quantity].append(product_id)
+    pairs = reduce(or_, (Q(warehouse_id=warehouse_id, product_id__in=product_ids) for warehouse_id, product_ids in products.items()))
+    amount = Case(
+        *[When(warehouse_id=warehouse_id, product_id__in=product_ids, then=Value(quantity))
+          for (warehouse_id, quantity), product_ids in by_amount.items()],
+        default=Value(0), output_field=IntegerField(),
+    )
+    levels = StockLevel.objects.filter(pairs)
+    updated = levels.update(reserved=F('reserved') + amount, available=F('available') - amount, updated_at=timezone.now())
+    if updated < len(reserved):
+        existing = set(levels.values_list('product_id', 'warehouse_id'))
+        for (product_id, warehouse_id), quantity in reserved.items():
+            if (product_id, warehouse_id) not in existing:
+                bump_stock_level(product_id, warehouse_id, reserved=quantity, create=create)
+
+
+def occupy_location(location_id, quantity=0, weight=0, placements=0):
+    """
+    Move a location's occupancy counters. Adding quantity only succeeds while
+    it still fits under max_capacity; removals always apply.
+    """
+    if not (quantity or weight or placements):
+        return
+    updates = {}
+    if quantity:
+        updates['occupied_quantity'] = F('occupied_quantity') + quantity
+    if weight:
+        updates['occupied_weight'] = F('occupied_weight') + weight
+    if placements:
+        updates['placement_count'] = F('placement_count') + placements
+    queryset = WarehouseLocation.objects.filter(pk=location_id)
+    if quantity > 0:
+        queryset = queryset.filter(occupied_quantity__lte=F('max_capacity') - quantity)
+    if _conditional_update(queryset, **updates) or quantity <= 0:
+        return  # A removal from a location that is being deleted updates nothing, which is fine
+    row = WarehouseLocation.objects.filter(pk=location_id).values('section_name', 'max_capacity', 'occupied_quantity').first()
+    raise serializers.ValidationError(
+        f"Location {row['section_name']} is full. Capacity: {row['max_capacity']}, "
+        f"Occupied: {row['occupied_quantity']}, Requested: {quantity}"
+    )
+
+
+def add_placement_to_location(placement, sign=1):
+    """Add (sign=1, capacity enforced) or remove (sign=-1) a whole placement at its location."""
+    occupy_location(placement.location_id, quantity=sign * placement.quantity, weight=sign * placement.weight, placements=sign)
+
+
+def _quantity_changed(placement, delta):
+    row = placement_thresholds(placement.pk)
+    record_quantity_change(row, row['quantity'] - delta)
+
+
+def add_placement_to_levels(placement, sign=1, create=True):
+    """Add (sign=1) or remove (sign=-1) a whole placement's contribution to its StockLevel."""
+    bump_stock_level(
+        placement.product_id, placement.warehouse_id,
+        on_hand=sign * placement.quantity, reserved=sign * placement.reserved_quantity,
+        weight=sign * placement.weight, create=create,
+    )
+
+
+def adjust_product_quantity(product_id, delta):
+    """Add `delta` (may be negative) to Product.quantity, refusing to go below zero."""
+    queryset = Product.objects.filter(product_id=product_id)
+    if delta < 0:
+        queryset = queryset.filter(quantity__gte=-delta)
+    if not _conditional_update(queryset, quantity=F('quantity') + delta, updated_at=timezone.now()):
+        available = Product.objects.filter(product_id=product_id).values_list('quantity', flat=True).first()
+        if available is None:
+            raise serializers.ValidationError(f"Product {product_id} does not exist")
+        raise serializers.ValidationError(
+            f"Insufficient stock. Available: {available}, Requested: {-delta}"
+        )
+
+
+@transaction.atomic
+def adjust_placement_quantity(placement, delta):
+    """
+    Add `delta` to the placement's quantity. A decrease must leave at least
+    the reserved quantity on hand. `placement` is only used for its ids; its
+    in-memory counters are never written back.
+    """
+    stock_id = placement.pk
+    occupy_location(placement.location_id, quantity=delta)
+    queryset = WarehouseStockPlacement.objects.filter(stock_id=stock_id)
+    if delta < 0:
+        queryset = queryset.filter(quantity__gte=F('reserved_quantity') - delta)
+    if not _conditional_update(queryset, quantity=F('quantity') + delta, last_updated=timezone.now()):
+        row = WarehouseStockPlacement.objects.filter(stock_id=stock_id).values('quantity', 'reserved_quantity').first()
+        if row is None:
+            raise serializers.ValidationError(f"Stock placement {stock_id} does not exist")
+        raise serializers.ValidationError(
+            f"Insufficient stock. Available: {row['quantity'] - row['reserved_quantity']}, Requested: {-delta}"
+        )
+    bump_stock_level(placement.product_id, placement.warehouse_id, on_hand=delta)
+    _quantity_changed(placement, delta)
+    _placement_changed(placement)
+
+
+@transaction.atomic
+def set_placement_quantity(placement, expected, new, occupy=True):
+    """
+    Compare-and-set an absolute quantity (for PUT/PATCH of a placement).
+    With occupy=False the location counters are left to the caller (a move).
+    """
+    if new < 0:
+        raise serializers.ValidationError("Quantity cannot be negative")
+    if occupy:
+        occupy_location(placement.location_id, quantity=new - expected)
+    queryset = WarehouseStockPlacement.objects.filter(
+        stock_id=placement.pk, quantity=expected, reserved_quantity__lte=new
+    )
+    if not _conditional_update(queryset, quantity=new, last_updated=timezone.now()):
+        raise StockConflict("Stock placement changed concurrently or would drop below its reserved quantity; reload and retry")
+    bump_stock_level(placement.product_id, placement.warehouse_id, on_hand=new - expected)
+    _quantity_changed(placement, new - expected)
+    _placement_changed(placement)
+
+
+def _amount_per_placement(quantities):
+    """CASE giving each row its amount from {stock_id: quantity}, one WHEN per distinct amount."""
+    by_amount = defaultdict(list)
+    for stock_id, quantity in quantities.items():
+        by_amount[quantity].append(stock_id)
+    return Case(
+        *[When(stock_id__in=stock_ids, then=Value(quantity)) for quantity, stock_ids in by_amount.items()],
+        default=Value(0), output_field=IntegerField(),
+    )
+
+
+def reserve_placements(placements, quantities):
+    """
+    Reserve {stock_id: quantity} across many placements with one conditional
+    UPDATE (the amounts picked per row by CASE). All or nothing: if any row
+    lacks the free stock, nothing is reserved and StockConflict is raised.
+    `placements` maps stock_id to a placement loaded with PLACEMENT_KEY_FIELDS.
+    """
+    if not quantities:
+        return
+    amount = _amount_per_placement(quantities)
+    with transaction.atomic():
+        updated = WarehouseStockPlacement.objects.filter(
+            stock_id__in=list(quantities), quantity__gte=F('reserved_quantity') + amount,
+        ).update(reserved_quantity=F('reserved_quantity') + amount, last_updated=timezone.now())
+        if updated != len(quantities):
+            raise StockConflict("Stock changed while it was being reserved; please retry.")
+
+    levels = defaultdict(int)
+    changed = {}
+    for stock_id, quantity in quantities.items():
+        placement = placements[stock_id]
+        levels[placement.product_id, placement.warehouse_id] += quantity
+        changed[placement.product_id] = placement
+    bump_stock_levels_reserved(levels)
+    for placement in changed.values():
+        _placement_changed(placement)
+
+
+@transaction.atomic
+def release_placements(quantities):
+    """
+    Give back {stock_id: quantity} reserved units across many placements with
+    one UPDATE. The rows are locked first (in stock_id order) and a release
+    never takes reserved_quantity below zero; deleted placements are skipped.
+    Returns {stock_id: units actually released}.
+    """
+    if not quantities:
+        return {}
+    placements = list(
+        WarehouseStockPlacement.objects.select_for_update().filter(stock_id__in=list(quantities))
+        .order_by('stock_id').only(*PLACEMENT_KEY_FIELDS, 'reserved_quantity')
+    )
+    released = {
+        placement.pk: min(quantities[placement.pk], placement.reserved_quantity)
+        for placement in placements if placement.reserved_quantity > 0
+    }
+    if not released:
+        return {}
+    amount = _amount_per_placement(released)
+    WarehouseStockPlacement.objects.filter(stock_id__in=list(released)).update(
+        reserved_quantity=F('reserved_quantity') - amount, last_updated=timezone.now(),
+    )
+
+    levels = defaultdict(int)
+    changed = {}
+    for placement in placements:
+        if placement.pk in released:
+            levels[placement.product_id, placement.warehouse_id] -= released[placement.pk]
+            changed[placement.product_id] = placement
+    bump_stock_levels_reserved(levels, create=False)
+    for placement in changed.values():
+        _placement_changed(placement)
+    return released
+
+
+def apply_transaction(placement, transaction_type, quantity):
+    """Apply an INBOUND/OUTBOUND ledger movement to its placement. Returns the signed delta."""
+    delta = quantity if transaction_type == 'INBOUND' else -quantity
+    adjust_placement_quantity(placement, delta)
+    return delta
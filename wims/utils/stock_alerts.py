@@ -0,0 +1,71 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from wims.models import StockAlert, WarehouseStockPlacement
+
+# Columns needed to evaluate a placement against its thresholds
+THRESHOLD_FIELDS = ('stock_id', 'product_id', 'warehouse_id', 'quantity', 'min_stock_level', 'max_stock_level')
+
+
+def breach_kind(quantity, min_stock_level, max_stock_level):
+    """StockAlert.LOW / StockAlert.OVER if `quantity` is outside the thresholds, else None."""
+    if quantity < min_stock_level:
+        return StockAlert.LOW
+    if quantity > max_stock_level:
+        return StockAlert.OVER
+    return None
+
+
+def _open_key(stock_id, kind):
+    return f"{stock_id}:{kind}"
+
+
+def _open(row, kind):
+    threshold = row['min_stock_level'] if kind == StockAlert.LOW else row['max_stock_level']
+    try:
+        with transaction.atomic():
+            StockAlert.objects.create(
+                placement_id=row['stock_id'], product_id=row['product_id'], warehouse_id=row['warehouse_id'],
+                kind=kind, threshold=threshold, quantity=row['quantity'], open_key=_open_key(row['stock_id'], kind),
+            )
+    except IntegrityError:
+        pass  # Already open
+
+
+def _resolve(row, kinds):
+    StockAlert.objects.filter(open_key__in=[_open_key(row['stock_id'], kind) for kind in kinds]).update(
+        open_key=None, is_open=False, resolved_at=timezone.now(), resolved_quantity=row['quantity'],
+    )
+
+
+def placement_thresholds(stock_id):
+    """Current threshold row for a placement (read after our own UPDATE, so it includes it)."""
+    return WarehouseStockPlacement.objects.filter(stock_id=stock_id).values(*THRESHOLD_FIELDS).first()
+
+
+def record_quantity_change(row, old_quantity):
+    """
+    Open/resolve alerts if the move from `old_quantity` to row['quantity']
+    crossed a threshold. Moves that stay on the same side cost no queries.
+    The caller's UPDATE holds the placement row lock until commit, so
+    crossings of one placement are seen one at a time.
+    """
+    old = breach_kind(old_quantity, row['min_stock_level'], row['max_stock_level'])
+    new = breach_kind(row['quantity'], row['min_stock_level'], row['max_stock_level'])
+    if old == new:
+        return
+    if old:
+        _resolve(row, [old])
+    if new:
+        _open(row, new)
+
+
+def sync_alerts(row):
+    """
+    Make the open alerts of one placement match its current state; used when
+    a placement is created or its thresholds are edited.
+    """
+    kind = breach_kind(row['quantity'], row['min_stock_level'], row['max_stock_level'])
+    _resolve(row, [other for other, _ in StockAlert.KIND_CHOICES if other != kind])
+    if kind:
+        _open(row, kind)
@@ -0,0 +1,209 @@
+"""
+Batch cycle counts: reconcile a whole count sheet against the placements.
+
+A count sheet is a list of (product, location, recorded_quantity) lines for
+one warehouse. System quantities come from a single query over the
+warehouse's placements (joined with product and location names) and are
+summed per product and location, then matched to the sheet with a pandas
+merge. Every line is stored as a WarehouseStockAudit with its system
+quantity and variance. Optionally the variances are posted as adjusting
+INBOUND/OUTBOUND transactions through wims.utils.stock_batch.
+"""
+import uuid
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from wims.models import Product, WarehouseLocation, WarehouseStockAudit, WarehouseStockPlacement
+from wims.utils.stock_batch import apply_movements
+
+KEY = ['product_id', 'location_id']
+COLUMN_ALIASES = {
+    'product': 'product_id', 'location': 'location_id',
+    'quantity': 'recorded_quantity', 'count': 'recorded_quantity', 'counted': 'recorded_quantity',
+}
+PLACEMENT_FIELDS = {
+    'stock_id': 'stock_id', 'product_id': 'product_id', 'product__name': 'product_name', 'product__sku': 'sku',
+    'location_id': 'location_id', 'location__section_name': 'location_name', 'quantity': 'quantity',
+    'reserved_quantity': 'reserved_quantity',
+}
+
+
+def read_count_sheet(uploaded_file):
+    return pd.read_csv(uploaded_file, dtype=str, skip_blank_lines=True)
+
+
+def _whole(series):
+    return series.notna() & (series == series.round())
+
+
+def parse_counts(frame, warehouse_id):
+    """
+    Validate raw count lines. Returns (counts DataFrame with product_id,
+    location_id, recorded_quantity, product_name, sku, location_name, errors),
+    errors being [{'row': n, 'errors': {field: [messages]}}] with 1-based rows.
+    """
+    frame = frame.rename(columns=lambda name: str(name).strip().lower()).rename(columns=COLUMN_ALIASES)
+    missing = [column for column in KEY + ['recorded_quantity'] if column not in frame.columns]
+    if missing:
+        return None, [{'row': 0, 'errors': {column.replace('_id', ''): ["This column is required."] for column in missing}}]
+
+    counts = pd.DataFrame({
+        column: pd.to_numeric(frame[column], errors='coerce') for column in KEY + ['recorded_quantity']
+    })
+    counts['row'] = np.arange(1, len(counts) + 1)
+    products = dict((pk, (name, sku)) for pk, name, sku in Product.objects.filter(
+        pk__in=counts['product_id'].dropna().astype(np.int64).unique().tolist()).values_list('pk', 'name', 'sku'))
+    locations = dict(WarehouseLocation.objects.filter(
+        warehouse_id=warehouse_id, pk__in=counts['location_id'].dropna().astype(np.int64).unique().tolist(),
+    ).values_list('pk', 'section_name'))
+
+    checks = {
+        'product_id': (~_whole(counts['product_id']) | ~counts['product_id'].isin(list(products)),
+                       "Unknown product."),
+        'location_id': (~_whole(counts['location_id']) | ~counts['location_id'].isin(list(locations)),
+                        f"Unknown location for warehouse {warehouse_id}."),
+        'recorded_quantity': (~_whole(counts['recorded_quantity']) | (counts['recorded_quantity'] < 0),
+                              "Ensure this value is a whole number greater than or equal to 0."),
+    }
+    duplicated = counts.duplicated(KEY, keep=False) & counts[KEY].notna().all(axis=1)
+    errors = {}
+    for column, (failed, message) in checks.items():
+        for row in counts.loc[failed, 'row']:
+            errors.setdefault(int(row), {})[column.replace('_id', '')] = [message]
+    for row in counts.loc[duplicated, 'row']:
+        errors.setdefault(int(row), {})['non_field_errors'] = ["Product and location counted more than once."]
+    if errors:
+        return None, [{'row': row, 'errors': errors[row]} for row in sorted(errors)]
+
+    counts = counts.drop(columns='row').astype(np.int64)
+    counts['product_name'] = counts['product_id'].map(lambda pk: products[pk][0])
+    counts['sku'] = counts['product_id'].map(lambda pk: products[pk][1])
+    counts['location_name'] = counts['location_id'].map(locations)
+    return counts, []
+
+
+def system_placements(warehouse_id, counts, full_count, lock=False):
+    """Placements behind the sheet in one joined query, as a DataFrame."""
+    placements = WarehouseStockPlacement.objects.filter(warehouse_id=warehouse_id)
+    if not full_count:
+        placements = placements.filter(product_id__in=counts['product_id'].unique().tolist(),
+                                       location_id__in=counts['location_id'].unique().tolist())
+    if lock:
+        # Stock must not move between reading it and posting the adjustments
+        placements = placements.select_for_update(of=('self',))
+    rows = placements.order_by('location_id', 'stock_id').values_list(*PLACEMENT_FIELDS)
+    frame = pd.DataFrame.from_records(rows, columns=list(PLACEMENT_FIELDS.values()))
+    return frame.astype({column: np.int64 for column in ('stock_id', 'product_id', 'location_id', 'quantity', 'reserved_quantity')})
+
+
+def reconcile(counts, placements, full_count=False):
+    """
+    Variance report: one row per counted (product, location), plus, for a
+    full count, every stocked (product, location) missing from the sheet
+    (recorded as 0).
+    """
+    names = ['product_name', 'sku', 'location_name']
+    system = (placements.groupby(KEY + names, as_index=False)
+              .agg(system_quantity=('quantity', 'sum'), placements=('stock_id', 'count')))
+    report = counts.merge(system.drop(columns=names), on=KEY, how='left')
+    if full_count:
+        uncounted = system.merge(counts[KEY], on=KEY, how='left', indicator=True)
+        uncounted = uncounted[uncounted['_merge'] == 'left_only'].drop(columns='_merge')
+        report = pd.concat([report, uncounted.assign(recorded_quantity=0)], ignore_index=True)
+    report[['system_quantity', 'placements']] = report[['system_quantity', 'placements']].fillna(0).astype(np.int64)
+    report['recorded_quantity'] = report['recorded_quantity'].astype(np.int64)
+    report['variance'] = report['recorded_quantity'] - report['system_quantity']
+    report['adjusted'] = False
+    return report.reset_index(drop=True)
+
+
+def adjustment_movements(report, placements, warehouse_id):
+    """
+    Movements that bring the placements to the counted quantities. A surplus is
+    booked INBOUND on the first placement of the (product, location); a shortage
+    is taken OUTBOUND from its placements in order, never below their reserved
+    quantity. Returns (movements keyed by report row, report rows that cannot be adjusted).
+    """
+    free = placements.assign(free=placements['quantity'] - placements['reserved_quantity'])
+    by_key = {key: group for key, group in free.groupby(KEY)}
+    movements = []
+    unadjustable = []
+    for index, row in report[report['variance'] != 0].iterrows():
+        group = by_key.get((row['product_id'], row['location_id']))
+        if group is None:
+            unadjustable.append(index)  # Counted stock with no placement to book it on
+            continue
+        planned = []
+        if row['variance'] > 0:
+            planned.append((group.iloc[0], 'INBOUND', int(row['variance'])))
+        else:
+            remaining = -int(row['variance'])
+            for _, placement in group.iterrows():
+                take = min(remaining, int(placement['free']))
+                if take > 0:
+                    planned.append((placement, 'OUTBOUND', take))
+                    remaining -= take
+            if remaining:
+                unadjustable.append(index)  # Reserved stock cannot be written off
+                continue
+        movements.extend(
+            (index, WarehouseStockPlacement(stock_id=int(placement['stock_id']), product_id=int(placement['product_id']),
+                                            warehouse_id=warehouse_id, location_id=int(placement['location_id'])),
+             transaction_type, quantity)
+            for placement, transaction_type, quantity in planned
+        )
+    return movements, unadjustable
+
+
+@transaction.atomic
+def submit_count_sheet(warehouse_id, counts, full_count=False, adjust=False):
+    """
+    Reconcile `counts` (from parse_counts), optionally post the adjustments and
+    store the audits. Returns (audit_batch, report DataFrame, adjustment errors).
+    Adjustments are all or nothing; the audits are stored either way. A line
+    with a PLANNED cycle-count task completes that task instead of adding a row.
+    """
+    placements = system_placements(warehouse_id, counts, full_count, lock=adjust)
+    report = reconcile(counts, placements, full_count)
+    errors = {}
+    if adjust:
+        movements, unadjustable = adjustment_movements(report, placements, warehouse_id)
+        for index in unadjustable:
+            errors[index] = ["No placement with enough unreserved stock to adjust."]
+        if movements and not errors:
+            _, failed = apply_movements(movements)
+            for index, detail in failed.items():
+                errors[index] = detail['stock_id']
+            if not failed:
+                report.loc[sorted({index for index, _, _, _ in movements}), 'adjusted'] = True
+
+    audit_batch = uuid.uuid4().hex
+    # Planned cycle-count tasks for the counted lines are completed by this sheet
+    planned = {}
+    for audit in (WarehouseStockAudit.objects.select_for_update()
+                  .filter(warehouse_id=warehouse_id, status=WarehouseStockAudit.PLANNED,
+                          product_id__in=report['product_id'].unique().tolist(),
+                          location_id__in=report['location_id'].unique().tolist())
+                  .order_by('pk')):
+        planned.setdefault((audit.product_id, audit.location_id), []).append(audit)
+    created, completed = [], []
+    for row in report.itertuples(index=False):
+        counted = dict(recorded_quantity=row.recorded_quantity, system_quantity=row.system_quantity,
+                       variance=row.variance, adjusted=row.adjusted, audit_batch=audit_batch)
+        tasks = planned.get((row.product_id, row.location_id))
+        if not tasks:
+            created.append(WarehouseStockAudit(warehouse_id=warehouse_id, product_id=row.product_id,
+                                               location_id=row.location_id, **counted))
+            continue
+        for audit in tasks:
+            for field, value in counted.items():
+                setattr(audit, field, value)
+            audit.status = WarehouseStockAudit.COUNTED
+            completed.append(audit)
+    WarehouseStockAudit.objects.bulk_create(created, batch_size=2000)
+    WarehouseStockAudit.objects.bulk_update(
+        completed, ['status', 'recorded_quantity', 'system_quantity', 'variance', 'adjusted', 'audit_batch'], batch_size=2000,
+    )
+    return audit_batch, report, errors
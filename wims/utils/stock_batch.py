@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from wims.models import StockTransactions, WarehouseStockPlacement
+from wims.utils.stock import PLACEMENT_KEY_FIELDS, adjust_placement_quantity
+
+TRANSACTION_TYPES = dict(StockTransactions.MOVEMENT_TYPES)
+
+
+def _positive_int(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    if number != value and str(number) != str(value).strip():
+        return None  # Reject 1.5 / "1.5" instead of truncating
+    return number if number > 0 else None
+
+
+def validate_movements(items):
+    """
+    Validate raw movement dicts in bulk: one query for all referenced placements.
+    Returns (movements, errors); movements are (index, placement, type, quantity)
+    tuples, errors are {index: {field: [messages]}}.
+    """
+    errors = defaultdict(dict)
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index]['non_field_errors'] = ["Expected an object."]
+            continue
+        stock_id = _positive_int(item.get('stock_id', item.get('stock')))
+        transaction_type = item.get('transaction_type')
+        quantity = _positive_int(item.get('quantity'))
+        if stock_id is None:
+            errors[index]['stock_id'] = ["A valid stock placement id is required."]
+        if transaction_type not in TRANSACTION_TYPES:
+            errors[index]['transaction_type'] = [f"\"{transaction_type}\" is not a valid choice."]
+        if quantity is None:
+            errors[index]['quantity'] = ["Ensure this value is a whole number greater than or equal to 1."]
+        if index not in errors:
+            parsed.append((index, stock_id, transaction_type, quantity))
+
+    placements = WarehouseStockPlacement.objects.only(*PLACEMENT_KEY_FIELDS).in_bulk(
+        {stock_id for _, stock_id, _, _ in parsed}
+    )
+    movements = []
+    for index, stock_id, transaction_type, quantity in parsed:
+        placement = placements.get(stock_id)
+        if placement is None:
+            errors[index]['stock_id'] = [f"Invalid pk \"{stock_id}\" - object does not exist."]
+        else:
+            movements.append((index, placement, transaction_type, quantity))
+    return movements, dict(errors)
+
+
+def apply_movements(movements):
+    """
+    Apply validated movements atomically: the net delta of each placement is
+    applied with one conditional UPDATE (in (location, stock_id) order, so
+    concurrent batches lock rows in the same order) and the ledger is written with
+    bulk_create. If any placement would go below its reserved quantity or
+    overfill its location, nothing is applied and the offending items are
+    returned as errors.
+    """
+    net = defaultdict(int)
+    items_by_placement = defaultdict(list)
+    for index, placement, transaction_type, quantity in movements:
+        net[placement.pk] += quantity if transaction_type == 'INBOUND' else -quantity
+        items_by_placement[placement.pk].append(index)
+    placements = {placement.pk: placement for _, placement, _, _ in movements}
+
+    errors = {}
+    with transaction.atomic():
+        for stock_id in sorted(net, key=lambda pk: (placements[pk].location_id, pk)):
+            if net[stock_id] == 0:
+                continue
+            try:
+                adjust_placement_quantity(placements[stock_id], net[stock_id])
+            except serializers.ValidationError as exc:
+                for index in items_by_placement[stock_id]:
+                    errors[index] = {'stock_id': list(exc.detail)}
+        if errors:
+            transaction.set_rollback(True)
+            return 0, errors
+
+        StockTransactions.objects.bulk_create(
+            [StockTransactions(stock_id=placement.pk, transaction_type=transaction_type, quantity=quantity)
+             for _, placement, transaction_type, quantity in movements],
+            batch_size=settings.STOCK_BATCH_INSERT_SIZE,
+        )
+    return len(movements), {}
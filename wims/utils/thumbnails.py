@@ -0,0 +1,78 @@
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from wims.models import Product
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'product_images/variants'
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+_executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails')
+
+
+def build_variants(image_name):
+    """
+    Render every configured size of `image_name` as WebP and JPEG.
+    File names embed a hash of the source bytes, so a URL never changes
+    content and can be cached forever; identical uploads share files.
+    Returns {'source': image_name, size: {format: storage path}}.
+    """
+    with default_storage.open(image_name, 'rb') as source:
+        data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:20]
+
+    original = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+    variants = {'source': image_name}
+    for size_name, max_side in settings.PRODUCT_IMAGE_VARIANTS.items():
+        resized = original.copy()
+        resized.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        variants[size_name] = {}
+        for extension, pil_format in FORMATS.items():
+            path = f"{VARIANT_DIR}/{digest}_{max_side}.{extension}"
+            if not default_storage.exists(path):
+                frame = resized.convert('RGB') if pil_format == 'JPEG' else resized
+                buffer = io.BytesIO()
+                frame.save(buffer, pil_format, quality=settings.THUMBNAIL_QUALITY, optimize=True)
+                default_storage.save(path, ContentFile(buffer.getvalue()))
+            variants[size_name][extension] = path
+    return variants
+
+
+def generate_product_variants(product_id, image_name):
+    """Worker entry point: render variants and attach them if the image is still current."""
+    try:
+        variants = build_variants(image_name)
+        # update() skips post_save, so this does not schedule another run; bumping
+        # updated_at changes the ETag so clients holding the old one get the variants
+        Product.objects.filter(product_id=product_id, image=image_name).update(
+            image_variants=variants, updated_at=timezone.now())
+        logger.info(f"Generated image variants for product {product_id}")
+    except Exception as e:
+        logger.error(f"Thumbnail generation failed for product {product_id}: {str(e)}")
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(product):
+    """Queue variant generation for a product once the current transaction commits."""
+    if not product.image:
+        return
+    product_id, image_name = product.product_id, product.image.name
+    transaction.on_commit(lambda: _executor.submit(generate_product_variants, product_id, image_name))
+
+
+def needs_variants(product):
+    return bool(product.image) and product.image_variants.get('source') != product.image.name
@@ -0,0 +1,248 @@
+"""
+Movement velocity, ABC classes and the daily cycle-count plan.
+
+Velocity is an exponentially decayed count of hits (ledger movements and
+order lines) and units (OUTBOUND and ordered quantities) per product and
+location, with a half-life of VELOCITY_HALF_LIFE_DAYS. Each contribution is
+stored scaled to an epoch, q * 2 ** ((t - epoch) / half_life), so scores of
+different keys stay comparable without rewriting every row on every run: a
+run reads only ledger rows and order lines past its watermarks (JobWatermark)
+and adds to the keys they touch. The current value of a score is
+score * 2 ** (-(now - epoch) / half_life). The scale grows without bound, so
+once new events are REBASE_AFTER_HALF_LIVES past the epoch every stored score
+is rescaled with one UPDATE and the epoch moves up to them; it is kept in the
+'velocity.epoch' JobWatermark row (last_id, in Unix seconds).
+
+Watermarks are primary keys, so a row committed after a later row was read
+is not counted; for a heuristic used to schedule counts that is acceptable.
+
+ABC classes are then assigned per warehouse by cumulative share of product
+hits (ABC_THRESHOLDS), and plan_cycle_counts() turns due product/locations
+into PLANNED WarehouseStockAudit tasks, A items first.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from wims.models import (
+    JobWatermark, OrderItem, StockTransactions, StockVelocity, WarehouseStockAudit, WarehouseStockPlacement,
+)
+
+EPOCH = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)  # Initial epoch
+REBASE_AFTER_HALF_LIVES = 64  # Weights stay below 2 ** 64, far from float overflow
+KEY = ['product_id', 'warehouse_id', 'location_id']
+LEDGER_WATERMARK = 'velocity.ledger'
+ORDER_WATERMARK = 'velocity.order_items'
+EPOCH_WATERMARK = 'velocity.epoch'
+
+
+def _half_life_seconds():
+    if not settings.VELOCITY_HALF_LIFE_DAYS > 0:
+        raise ImproperlyConfigured("VELOCITY_HALF_LIFE_DAYS must be positive")
+    return settings.VELOCITY_HALF_LIFE_DAYS * 86400
+
+
+def current_epoch():
+    """The moment stored scores are scaled to."""
+    seconds = JobWatermark.objects.filter(name=EPOCH_WATERMARK).values_list('last_id', flat=True).first()
+    return EPOCH if seconds is None else datetime.fromtimestamp(seconds, dt_timezone.utc)
+
+
+def _rebase(until):
+    """
+    Move the epoch up to `until` if it is more than REBASE_AFTER_HALF_LIVES
+    behind, rescaling every stored score to match. Returns the epoch to use.
+    """
+    row, _ = JobWatermark.objects.select_for_update().get_or_create(
+        name=EPOCH_WATERMARK, defaults={'last_id': int(EPOCH.timestamp())}
+    )
+    if (until.timestamp() - row.last_id) / _half_life_seconds() <= REBASE_AFTER_HALF_LIVES:
+        return datetime.fromtimestamp(row.last_id, dt_timezone.utc)
+    epoch = int(until.timestamp())
+    factor = math.pow(2, -(epoch - row.last_id) / _half_life_seconds())
+    StockVelocity.objects.update(hits=F('hits') * factor, units=F('units') * factor)
+    row.last_id = epoch
+    row.ran_at = timezone.now()
+    row.save(update_fields=['last_id', 'ran_at'])
+    return datetime.fromtimestamp(epoch, dt_timezone.utc)
+
+
+def _epoch_weights(moments, epoch):
+    """2 ** ((t - epoch) / half_life) for a Series of datetimes."""
+    seconds = (pd.to_datetime(moments, utc=True) - pd.Timestamp(epoch)).dt.total_seconds().to_numpy()
+    return np.exp2(seconds / _half_life_seconds())
+
+
+def current_factor(now=None, epoch=None):
+    """Multiply a stored score by this to get its decayed value now."""
+    seconds = ((now or timezone.now()) - (epoch or current_epoch())).total_seconds()
+    return math.pow(2, -seconds / _half_life_seconds())
+
+
+def per_day(units, now=None, epoch=None):
+    """Steady-state daily rate behind a stored decayed sum."""
+    return units * current_factor(now, epoch) * math.log(2) / settings.VELOCITY_HALF_LIFE_DAYS
+
+
+def _read_since(watermark, queryset, id_field, fields, chunk_size):
+    rows = list(queryset.filter(**{f'{id_field}__gt': watermark.last_id}).order_by(id_field)
+                .values_list(id_field, *fields)[:chunk_size])
+    return pd.DataFrame.from_records(rows, columns=['id'] + list(fields))
+
+
+def _ledger_events(watermark, chunk_size):
+    frame = _read_since(
+        watermark, StockTransactions.objects.exclude(transaction_type='OPENING'), 'transaction_id',
+        ('stock__product_id', 'stock__warehouse_id', 'stock__location_id', 'transaction_type', 'quantity', 'transaction_date'),
+        chunk_size,
+    )
+    frame.columns = ['id'] + KEY + ['transaction_type', 'quantity', 'moment']
+    frame['units'] = np.where(frame['transaction_type'] == 'OUTBOUND', frame['quantity'], 0)
+    return frame
+
+
+def _order_events(watermark, chunk_size):
+    frame = _read_since(
+        watermark, OrderItem.objects.exclude(order__status='Cancelled'), 'order_item_id',
+        ('product_id', 'warehouse_id', 'location_id', 'quantity', 'order__order_date'),
+        chunk_size,
+    )
+    frame.columns = ['id'] + KEY + ['units', 'moment']
+    return frame
+
+
+def _add_events(events):
+    """Fold a frame of events (KEY, units, moment) into StockVelocity."""
+    if events.empty:
+        return 0
+    epoch = _rebase(pd.to_datetime(events['moment'], utc=True).max().to_pydatetime())
+    weights = _epoch_weights(events['moment'], epoch)
+    events = events.assign(hits=weights, units=events['units'].to_numpy(dtype=np.float64) * weights)
+    delta = events.groupby(KEY, as_index=False).agg(hits=('hits', 'sum'), units=('units', 'sum'), last=('moment', 'max'))
+
+    existing = {
+        (row.product_id, row.location_id): row
+        for row in StockVelocity.objects.filter(
+            product_id__in=delta['product_id'].unique().tolist(), location_id__in=delta['location_id'].unique().tolist(),
+        )
+    }
+    created, changed = [], []
+    for row in delta.itertuples(index=False):
+        last = row.last.to_pydatetime() if hasattr(row.last, 'to_pydatetime') else row.last
+        velocity = existing.get((row.product_id, row.location_id))
+        if velocity is None:
+            created.append(StockVelocity(product_id=row.product_id, warehouse_id=row.warehouse_id, location_id=row.location_id,
+                                         hits=row.hits, units=row.units, last_movement_at=last))
+            continue
+        velocity.hits += row.hits
+        velocity.units += row.units
+        velocity.warehouse_id = row.warehouse_id
+        velocity.last_movement_at = max(filter(None, (velocity.last_movement_at, last)))
+        changed.append(velocity)
+    StockVelocity.objects.bulk_create(created, batch_size=2000)
+    StockVelocity.objects.bulk_update(changed, ['hits', 'units', 'warehouse_id', 'last_movement_at'], batch_size=2000)
+    return len(events)
+
+
+def refresh_velocity(chunk_size=20000):
+    """Read ledger rows and order lines past the watermarks. Returns (ledger rows, order lines) processed."""
+    processed = {}
+    for name, read in ((LEDGER_WATERMARK, _ledger_events), (ORDER_WATERMARK, _order_events)):
+        processed[name] = 0
+        while True:
+            with transaction.atomic():
+                watermark, _ = JobWatermark.objects.select_for_update().get_or_create(name=name)
+                events = read(watermark, chunk_size)
+                if events.empty:
+                    break
+                processed[name] += _add_events(events)
+                watermark.last_id = int(events['id'].max())
+                watermark.ran_at = timezone.now()
+                watermark.save(update_fields=['last_id', 'ran_at'])
+    return processed[LEDGER_WATERMARK], processed[ORDER_WATERMARK]
+
+
+def assign_abc_classes():
+    """A/B/C per warehouse by cumulative share of product hits. Returns {class: rows reclassified}."""
+    totals = pd.DataFrame.from_records(
+        StockVelocity.objects.order_by().values('warehouse_id', 'product_id').annotate(hits=Sum('hits')),
+        columns=['warehouse_id', 'product_id', 'hits'],
+    )
+    if totals.empty:
+        return {}
+    a_share, b_share = settings.ABC_THRESHOLDS
+    totals = totals.sort_values(['warehouse_id', 'hits', 'product_id'], ascending=[True, False, True])
+    warehouse_hits = totals.groupby('warehouse_id')['hits'].transform('sum')
+    # Share of hits before this product: the product that crosses a threshold stays in the higher class
+    before = (totals.groupby('warehouse_id')['hits'].cumsum() - totals['hits']) / warehouse_hits.where(warehouse_hits > 0)
+    totals['abc_class'] = np.select([before < a_share, before < b_share], ['A', 'B'], default='C')
+    totals.loc[totals['hits'] <= 0, 'abc_class'] = 'C'
+
+    assigned = {}
+    with transaction.atomic():
+        for (warehouse_id, abc_class), group in totals.groupby(['warehouse_id', 'abc_class']):
+            assigned[abc_class] = assigned.get(abc_class, 0) + StockVelocity.objects.filter(
+                warehouse_id=warehouse_id, product_id__in=group['product_id'].tolist(),
+            ).exclude(abc_class=abc_class).update(abc_class=abc_class)
+    return assigned
+
+
+def track_stocked_locations():
+    """Give every stocked product/location a velocity row, so items that never move are counted too."""
+    stocked = set(WarehouseStockPlacement.objects.filter(quantity__gt=0).order_by()
+                  .values_list('product_id', 'warehouse_id', 'location_id').distinct())
+    tracked = set(StockVelocity.objects.values_list('product_id', 'warehouse_id', 'location_id'))
+    StockVelocity.objects.bulk_create(
+        [StockVelocity(product_id=product_id, warehouse_id=warehouse_id, location_id=location_id)
+         for product_id, warehouse_id, location_id in stocked - tracked],
+        batch_size=2000, ignore_conflicts=True,
+    )
+    return len(stocked - tracked)
+
+
+@transaction.atomic
+def plan_cycle_counts(day=None, limit=None):
+    """
+    Create today's PLANNED count tasks: product/locations whose next count is due
+    (or never counted) and have no open task from the last
+    CYCLE_COUNT_TASK_WINDOW_DAYS, A before B before C, at most `limit` per warehouse.
+    Returns the number of tasks created.
+    """
+    day = day or timezone.localdate()
+    limit = limit or settings.CYCLE_COUNT_DAILY_LIMIT
+    intervals = settings.CYCLE_COUNT_INTERVAL_DAYS
+
+    open_tasks = WarehouseStockAudit.objects.filter(status=WarehouseStockAudit.PLANNED)
+    due = (StockVelocity.objects.select_for_update()
+           .filter(Q(next_count_due__isnull=True) | Q(next_count_due__lte=day))
+           .order_by('warehouse_id', 'abc_class', F('next_count_due').asc(nulls_first=True), '-hits', 'pk')
+           .values('pk', 'product_id', 'warehouse_id', 'location_id', 'abc_class'))
+    # A task left uncounted past its window no longer blocks planning the item again
+    window_start = day - timedelta(days=settings.CYCLE_COUNT_TASK_WINDOW_DAYS)
+    pending = set(open_tasks.filter(scheduled_for__gte=window_start).values_list('product_id', 'location_id'))
+
+    # Tasks already planned for the day count towards the limit when the plan is re-run
+    per_warehouse = dict(open_tasks.filter(scheduled_for=day).order_by().values_list('warehouse_id')
+                         .annotate(count=Count('pk')))
+    tasks, scheduled = [], {}
+    for row in due:
+        if per_warehouse.get(row['warehouse_id'], 0) >= limit or (row['product_id'], row['location_id']) in pending:
+            continue
+        per_warehouse[row['warehouse_id']] = per_warehouse.get(row['warehouse_id'], 0) + 1
+        tasks.append(WarehouseStockAudit(
+            warehouse_id=row['warehouse_id'], product_id=row['product_id'], location_id=row['location_id'],
+            status=WarehouseStockAudit.PLANNED, scheduled_for=day, audit_batch=f"cycle-{day:%Y%m%d}",
+        ))
+        scheduled.setdefault(row['abc_class'], []).append(row['pk'])
+
+    WarehouseStockAudit.objects.bulk_create(tasks, batch_size=2000)
+    for abc_class, pks in scheduled.items():
+        StockVelocity.objects.filter(pk__in=pks).update(next_count_due=day + timedelta(days=intervals[abc_class]))
+    return len(tasks)
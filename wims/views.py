@@ -1,7 +1,7 @@
 import datetime
 import traceback
 from wims.authentication import CookieJWTAuthentication
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes , authentication_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -10,6 +10,7 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenVerifyView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.db import transaction
+from django.db.models import Count, F, Q, Sum
 from django.utils import timezone
 from rest_framework import serializers
 from django.shortcuts import get_object_or_404
@@ -22,9 +23,26 @@ from .models import Category,Product,StockTransactions,Customer,CustomerAccount,
 from rest_framework import viewsets
 from .serializers import SupplierSerializer,WarehouseLocation,WarehouseStockPlacementSerializer,StockTransactionsSerializer,WarehouseStockAuditSerializer,CustomerSerializer,CustomerAccountSerializer
 from rest_framework.decorators import action
-from .models import Supplier,Warehouse,WarehouseStockAudit
+from .models import Supplier,Warehouse,WarehouseStockAudit,ProductImportJob,StockLevel,StockAlert,StockTransactionArchive
+from .serializers import ProductImportJobSerializer, StockAlertSerializer, StockLevelSerializer, StockTransactionArchiveSerializer
 from rest_framework.exceptions import ValidationError
 import pandas as pd
+from .utils.barcode_resolver import resolve_codes
+from .utils.conditional import conditional_response, make_etag, queryset_validators
+from .utils.exporters import EXPORT_TYPES, streaming_export
+from .utils.product_search import ranked_products, search_products
+from .pagination import KeysetPagination, SearchPagination
+from .utils.product_import import (
+    IMPORT_MODES, ProductBulkImporter, claim_import_job, count_rows, file_checksum, run_import_job,
+)
+from .utils.allocation import allocate_order_lines
+from .utils.reference_cache import warehouse_cache
+from .utils.slotting import suggest_locations
+from .utils.stock_alerts import placement_thresholds, sync_alerts
+from .utils.stock_audit import parse_counts, read_count_sheet, submit_count_sheet
+from .utils.stock_batch import apply_movements, validate_movements
+from .utils.stock_history import parse_as_of, placement_as_of, warehouse_as_of
+from .utils.stock import StockConflict, add_placement_to_levels, add_placement_to_location, adjust_product_quantity, apply_transaction, bump_stock_level, occupy_location, set_placement_quantity
 User = get_user_model()
 import logging
 
@@ -51,12 +69,74 @@ class CustomTokenVerifyView(TokenVerifyView):
         return response
 
 
-class CategoryListCreateView(generics.ListCreateAPIView):
+class ConditionalGetMixin:
+    """
+    ETag/Last-Modified support for list and retrieve. Validators come from one
+    aggregate (list) or one single-column lookup (detail) on
+    `last_modified_field`, and a matching If-None-Match/If-Modified-Since gets
+    a 304 before the serializer runs. Only the model's own timestamp is
+    tracked: renaming a related category does not change a product's ETag.
+    """
+    last_modified_field = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        last_modified, count = queryset_validators(self.filter_queryset(self.get_queryset()), self.last_modified_field)
+        etag = make_etag(request, last_modified, count)
+        return conditional_response(request, etag, last_modified, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        last_modified = (self.filter_queryset(self.get_queryset())
+                         .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+                         .values_list(self.last_modified_field, flat=True)
+                         .first())
+        render = lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        if last_modified is None:
+            return render()  # Let the normal lookup produce the 404
+        return conditional_response(request, make_etag(request, last_modified), last_modified, render)
+
+
+class SparseFieldsetViewMixin:
+    """
+    Applies the serializer's ?fields=/?expand= driven select_related()/only()
+    on read actions. Writes keep full rows so save() never sees deferred fields.
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in ('list', 'retrieve'):
+            queryset = self.get_serializer_class().optimize_queryset(queryset, self.request)
+        return queryset
+
+
+class ExportMixin:
+    """
+    Adds GET <list-url>/export/?file_type=csv|xlsx, streaming every row matched
+    by the list view's own queryset and filters. CSV starts sending at once;
+    xlsx only after the workbook is complete, so it is limited to
+    EXPORT_XLSX_MAX_ROWS rows.
+    """
+    export_columns = []  # (header, ORM lookup) pairs
+    export_filename = 'export'
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        file_type = request.query_params.get('file_type', 'csv').lower()
+        if file_type not in EXPORT_TYPES:
+            return Response({"error": f"Invalid file_type: {file_type}. Choose from {', '.join(EXPORT_TYPES)}"}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())
+        # An xlsx download cannot start before the whole workbook is built; keep that wait bounded
+        if file_type == 'xlsx' and queryset.order_by()[:settings.EXPORT_XLSX_MAX_ROWS + 1].count() > settings.EXPORT_XLSX_MAX_ROWS:
+            return Response({"error": f"More than {settings.EXPORT_XLSX_MAX_ROWS} rows; use file_type=csv, which streams as it goes"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return streaming_export(queryset, self.export_columns, self.export_filename, file_type)
+
+
+class CategoryListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
     
-class CategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CategoryDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     lookup_field = 'id'  # Explicitly set to 'id' (default is 'pk')    
@@ -179,12 +259,19 @@ class SupplierViewSet(viewsets.ModelViewSet):
     queryset = Supplier.objects.all().order_by("name_company")
     serializer_class = SupplierSerializer   
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, SparseFieldsetViewMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     authentication_classes = [CookieJWTAuthentication]
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]  # Enable file uploads
+    export_filename = 'products'
+    export_columns = [
+        ('Product ID', 'product_id'), ('Name', 'name'), ('Category', 'category__name_category'),
+        ('Supplier', 'supplier__name_company'), ('SKU', 'sku'), ('Barcode', 'barcode'),
+        ('Unit Type', 'unit_type'), ('Price', 'price'), ('Weight', 'weight'), ('Quantity', 'quantity'),
+        ('Is Active', 'is_active'), ('Created At', 'created_at'), ('Updated At', 'updated_at'),
+    ]
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data, context={'request': request})
@@ -193,6 +280,55 @@ class ProductViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['get', 'post'], parser_classes=[JSONParser, FormParser, MultiPartParser])
+    def resolve(self, request):
+        """
+        Resolve one or many barcodes/SKUs for POS scanning.
+        GET ?code=...&code=... (or ?codes=a,b) / POST {"codes": [...]}
+        """
+        if request.method == 'POST':
+            codes = request.data.get('codes') or request.data.get('code') or []
+            if isinstance(codes, str):
+                codes = [codes]
+        else:
+            codes = request.query_params.getlist('code')
+            for value in request.query_params.getlist('codes'):
+                codes.extend(value.split(','))
+        codes = list(dict.fromkeys(str(code).strip() for code in codes if str(code).strip()))
+
+        if not codes:
+            return Response({"error": "No barcode or SKU provided"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(codes) > settings.BARCODE_RESOLVE_MAX_CODES:
+            return Response({"error": f"At most {settings.BARCODE_RESOLVE_MAX_CODES} codes per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        resolved = resolve_codes(codes)
+        results = []
+        for code in codes:
+            product = resolved[code]
+            if product is None:
+                results.append({'code': code, 'found': False})
+            else:
+                results.append({'code': code, 'found': True, **product})
+        return Response({'results': results})
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Ranked product search: GET ?q=<words, SKU or barcode prefix>.
+        Served from the ProductSearchToken index, paginated with ?page=&page_size=.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "Query parameter 'q' is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(search_products(query), request, view=self)
+        products = ranked_products(page)
+        data = self.get_serializer(products, many=True).data
+        for item, product in zip(data, products):
+            item['search_score'] = product.search_score
+        return paginator.get_paginated_response(data)
+
     @action(detail=False, methods=['get'])
     def choices(self, request):
         return Response({
@@ -209,89 +345,88 @@ class ProductViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'], url_path='import-excel')
     def import_excel(self, request):
+        """
+        Bulk import products from an Excel sheet.
+        Pass mode=upsert to update existing products matched by SKU/barcode.
+        """
         if 'file' not in request.FILES:
             return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
 
         excel_file = request.FILES['file']
-        
+        mode = request.data.get('mode', 'insert')
+        if mode not in IMPORT_MODES:
+            return Response({"error": f"Invalid mode: {mode}. Choose from {', '.join(IMPORT_MODES)}"}, status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            # Read Excel file with pandas
-            df = pd.read_excel(excel_file)
+            # Read everything as text; the importer does the type conversion column-wise
+            df = pd.read_excel(excel_file, dtype=str)
             if df.empty:
                 return Response({"error": "Excel file is empty"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Convert to list of dictionaries
-            products_data = df.to_dict('records')
-            created_products = []
-            errors = []
-
-            for index, product_data in enumerate(products_data):
-                try:
-                    # Handle category and supplier
-                    category, _ = Category.objects.get_or_create(
-                        name_category=str(product_data.get('Category', 'Uncategorized') or 'Uncategorized')
-                    )
-                    supplier, _ = Supplier.objects.get_or_create(
-                        name_company=str(product_data.get('Supplier', 'N/A') or 'N/A')
-                    )
-
-                    # Handle Price: Remove '$' and convert to float
-                    price_str = str(product_data.get('Price', '0') or '0')
-                    price = float(price_str.replace('$', '').strip()) if price_str else 0.0
-
-                    # Handle Weight: Convert "N/A" to 0.0
-                    weight_str = str(product_data.get('Weight', '0') or '0')
-                    weight = 0.0 if weight_str == 'N/A' else float(weight_str)
-
-                    # Build product data
-                    product_dict = {
-                        
-                        'name': str(product_data.get('Name', '') or ''),
-                        'sku': str(product_data.get('SKU', '') or ''),
-                        'barcode': str(product_data.get('Barcode', '') or ''),
-                        'price': price,
-                        'weight': weight,
-                        'quantity': int(product_data.get('Quantity', 0) or 0),
-                        'category': category.pk,
-                        'supplier': supplier.pk,
-                        'is_active': str(product_data.get('Status', 'Active')).lower() == 'active'
-                    }
-
-                    # Validate and save
-                    serializer = ProductSerializer(data=product_dict, context={'request': request})
-                    if serializer.is_valid():
-                        serializer.save()
-                        created_products.append(serializer.data)
-                    else:
-                        errors.append({
-                            'row': index + 2,
-                            'data': product_dict,
-                            'errors': serializer.errors
-                        })
-                except (ValueError, TypeError) as e:
-                    errors.append({
-                        'row': index + 2,
-                        'data': product_data,
-                        'error': f"Invalid data format: {str(e)}"
-                    })
-                except Exception as e:
-                    errors.append({
-                        'row': index + 2,
-                        'data': product_data,
-                        'error': str(e)
-                    })
-
-            response_data = {
-                'created': len(created_products),
-                'errors': errors if errors else None
-            }
-            status_code = status.HTTP_201_CREATED if not errors else status.HTTP_207_MULTI_STATUS
+            importer = ProductBulkImporter(mode=mode).run(df)
+            response_data = importer.summary()
+            status_code = status.HTTP_201_CREATED if not importer.errors else status.HTTP_207_MULTI_STATUS
             return Response(response_data, status=status_code)
 
         except pd.errors.EmptyDataError:
             return Response({"error": "Excel file is empty or invalid"}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": f"Failed to process Excel file: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'], url_path='import-stream')
+    def import_stream(self, request):
+        """
+        Streaming import for large .xlsx/.csv files. Rows are read incrementally
+        and committed in chunks; pass job_id with the same file to resume a
+        failed import from its last committed chunk.
+        """
+        if 'file' not in request.FILES:
+            return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = request.FILES['file']
+        checksum = file_checksum(upload)
+        job_id = request.data.get('job_id')
+
+        if job_id:
+            job = get_object_or_404(ProductImportJob, job_id=job_id)
+            if job.file_sha256 != checksum:
+                return Response({"error": "Uploaded file does not match the file of this import job"}, status=status.HTTP_400_BAD_REQUEST)
+            if job.status == 'Completed':
+                return Response(ProductImportJobSerializer(job).data, status=status.HTTP_200_OK)
+            if not claim_import_job(job):
+                return Response({"error": f"Import job {job.job_id} is already running"}, status=status.HTTP_409_CONFLICT)
+        else:
+            mode = request.data.get('mode', 'insert')
+            if mode not in IMPORT_MODES:
+                return Response({"error": f"Invalid mode: {mode}. Choose from {', '.join(IMPORT_MODES)}"}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                chunk_size = int(request.data.get('chunk_size', settings.PRODUCT_IMPORT_CHUNK_SIZE))
+            except (TypeError, ValueError):
+                return Response({"error": "chunk_size must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            chunk_size = max(1, min(chunk_size, settings.PRODUCT_IMPORT_MAX_CHUNK_SIZE))
+            job = ProductImportJob.objects.create(
+                file_name=upload.name,
+                file_sha256=checksum,
+                mode=mode,
+                chunk_size=chunk_size,
+                total_rows=count_rows(upload),
+            )
+
+        try:
+            run_import_job(job, upload)
+        except Exception as e:
+            data = ProductImportJobSerializer(job).data
+            data['error'] = f"Import failed, resume with job_id={job.job_id}: {str(e)}"
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+
+        status_code = status.HTTP_201_CREATED if not job.error_count else status.HTTP_207_MULTI_STATUS
+        return Response(ProductImportJobSerializer(job).data, status=status_code)
+
+    @action(detail=False, methods=['get'], url_path=r'import-jobs/(?P<job_id>\d+)')
+    def import_job(self, request, job_id=None):
+        """Progress of a streaming import."""
+        job = get_object_or_404(ProductImportJob, job_id=job_id)
+        return Response(ProductImportJobSerializer(job).data)
         
 
 class WarehouseViewSet(viewsets.ModelViewSet):
@@ -324,6 +459,68 @@ class WarehouseViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['get'])
+    def utilisation(self, request, pk=None):
+        """
+        Capacity utilisation read from the occupancy counters on WarehouseLocation,
+        never from placements. Optional ?storage_type= filter. Fleet-wide it gives
+        one row of totals per warehouse; /warehouses/<id>/utilisation/ adds that
+        warehouse's per-location breakdown (heat map), keyset-paginated.
+        """
+        locations = WarehouseLocation.objects.all()
+        if pk is not None:
+            warehouse = self.get_object()
+            locations = locations.filter(warehouse_id=pk)
+        if request.query_params.get('storage_type'):
+            locations = locations.filter(storage_type=request.query_params['storage_type'])
+        totals = (locations.order_by('warehouse_id').values('warehouse_id', 'warehouse__name')
+                  .annotate(capacity=Sum('max_capacity'), quantity=Sum('occupied_quantity'),
+                            weight=Sum('occupied_weight'), locations_count=Count('id'),
+                            full_locations=Count('id', filter=Q(occupied_quantity__gte=F('max_capacity')))))
+        warehouses = [{
+            'warehouse_id': row['warehouse_id'], 'name': row['warehouse__name'], 'max_capacity': row['capacity'],
+            'occupied_quantity': row['quantity'], 'occupied_weight': row['weight'],
+            'locations_count': row['locations_count'], 'full_locations': row['full_locations'],
+            'utilisation': round(row['quantity'] / row['capacity'], 4) if row['capacity'] else 0,
+        } for row in totals]
+        if pk is None:
+            return Response({'warehouses': warehouses})
+
+        data = warehouses[0] if warehouses else {
+            'warehouse_id': warehouse.pk, 'name': warehouse.name, 'max_capacity': 0, 'occupied_quantity': 0,
+            'occupied_weight': 0, 'locations_count': 0, 'full_locations': 0, 'utilisation': 0,
+        }
+        paginator = KeysetPagination()
+        paginator.cursor_ordering = ('section_name', 'id')
+        page = paginator.paginate_queryset(locations.values(
+            'id', 'section_name', 'storage_type', 'capacity_class',
+            'max_capacity', 'occupied_quantity', 'occupied_weight', 'placement_count',
+        ), request, view=self)
+        for row in page:
+            row['utilisation'] = round(row['occupied_quantity'] / row['max_capacity'], 4) if row['max_capacity'] else 0
+        data.update(next=paginator.get_next_link(), previous=paginator.get_previous_link(), locations=page)
+        return Response(data)
+
+    @action(detail=True, methods=['get'], url_path='utilisation')
+    def warehouse_utilisation(self, request, pk=None):
+        return self.utilisation(request, pk=pk)
+
+    @action(detail=True, methods=['get'], url_path='stock-as-of')
+    def stock_as_of(self, request, pk=None):
+        """
+        Stock and value of the warehouse at a past moment (month-end valuation):
+        GET ?at=2026-03-31T23:59 (or a date for end of day)[&group_by=product].
+        Starts from the nearest earlier StockSnapshot and replays only later movements.
+        """
+        warehouse = self.get_object()
+        at = parse_as_of(request.query_params.get('at'))
+        if at is None:
+            return Response({"error": "Query parameter 'at' must be an ISO date or datetime"}, status=status.HTTP_400_BAD_REQUEST)
+        group_by = request.query_params.get('group_by')
+        if group_by not in (None, 'placement', 'product'):
+            return Response({"error": "group_by must be 'placement' or 'product'"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(warehouse_as_of(warehouse.pk, at, group_by=group_by))
     
 
 
@@ -336,9 +533,18 @@ class WarehouseLocationDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = WarehouseLocationSerializer
     lookup_field = 'id'
 
-class WarehouseStockPlacementViewSet(viewsets.ModelViewSet):
+class WarehouseStockPlacementViewSet(ConditionalGetMixin, SparseFieldsetViewMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = WarehouseStockPlacement.objects.all()
     serializer_class = WarehouseStockPlacementSerializer
+    last_modified_field = 'last_updated'
+    export_filename = 'stock-placements'
+    export_columns = [
+        ('Stock ID', 'stock_id'), ('Warehouse', 'warehouse__name'), ('Product', 'product__name'),
+        ('SKU', 'product__sku'), ('Location', 'location__section_name'), ('Category', 'category__name_category'),
+        ('Quantity', 'quantity'), ('Reserved Quantity', 'reserved_quantity'), ('Weight', 'weight'),
+        ('Storage Type', 'storage_type'), ('Batch Number', 'batch_number'), ('Expiry Date', 'expiry_date'),
+        ('Min Stock Level', 'min_stock_level'), ('Max Stock Level', 'max_stock_level'), ('Last Updated', 'last_updated'),
+    ]
     def get_queryset(self):
         """
         Optionally filter the queryset by product_id if provided in query params
@@ -348,45 +554,101 @@ class WarehouseStockPlacementViewSet(viewsets.ModelViewSet):
         if product_id is not None:
             queryset = queryset.filter(product__product_id=product_id)
         return queryset
+
+    @action(detail=True, methods=['get'], url_path='as-of')
+    def as_of(self, request, pk=None):
+        """Quantity of this placement at a past moment: GET ?at=2026-03-31T23:59 (or a date for end of day)."""
+        placement = self.get_object()
+        at = parse_as_of(request.query_params.get('at'))
+        if at is None:
+            return Response({"error": "Query parameter 'at' must be an ISO date or datetime"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(placement_as_of(placement, at))
+
+    @action(detail=False, methods=['get'], url_path='suggest-location')
+    def suggest_location(self, request):
+        """
+        Rank put-away locations: GET ?warehouse=&quantity=[&product=&weight=&storage_type=&limit=].
+        Scores combine storage-type match, co-location with the product's batches,
+        best fit on free capacity and fragmentation (see SLOTTING_WEIGHTS).
+        """
+        params = request.query_params
+        try:
+            warehouse_id = int(params['warehouse'])
+            quantity = int(params['quantity'])
+            product_id = int(params['product']) if params.get('product') else None
+            weight = float(params.get('weight') or 0)
+            limit = min(int(params.get('limit', 5)), 50)
+        except KeyError as e:
+            return Response({"error": f"Query parameter '{e.args[0]}' is required"}, status=status.HTTP_400_BAD_REQUEST)
+        except ValueError:
+            return Response({"error": "warehouse, quantity, product and limit must be integers, weight a number"}, status=status.HTTP_400_BAD_REQUEST)
+        if quantity < 1 or weight < 0 or limit < 1:
+            return Response({"error": "quantity and limit must be positive, weight non-negative"}, status=status.HTTP_400_BAD_REQUEST)
+        if warehouse_cache.get(warehouse_id) is None:
+            return Response({"error": f"Warehouse {warehouse_id} does not exist"}, status=status.HTTP_404_NOT_FOUND)
+
+        suggestions = suggest_locations(
+            warehouse_id, quantity, storage_type=params.get('storage_type'),
+            product_id=product_id, weight=weight, limit=limit,
+        )
+        return Response({'warehouse': warehouse_id, 'quantity': quantity, 'suggestions': suggestions})
+
+    @action(detail=False, methods=['get'])
+    def recall(self, request):
+        """
+        Trace a batch: GET ?batch_number=... returns every placement holding it,
+        every order item allocated from it and the POS transactions of those items.
+        Three indexed queries (batch_number, OrderItem.stock, OrderItem.pos_transaction).
+        """
+        batch_number = request.query_params.get('batch_number', '').strip()
+        if not batch_number:
+            return Response({"error": "Query parameter 'batch_number' is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        placements = list(WarehouseStockPlacement.objects
+                          .filter(batch_number=batch_number)
+                          .values('stock_id', 'product_id', 'product__name', 'product__sku', 'warehouse_id',
+                                  'warehouse__name', 'location_id', 'location__section_name', 'quantity',
+                                  'reserved_quantity', 'expiry_date'))
+        order_items = list(OrderItem.objects
+                           .filter(stock__batch_number=batch_number)
+                           .order_by('order_item_id')
+                           .values('order_item_id', 'order_id', 'order__status', 'order__order_date',
+                                   'order__customer_id', 'order__customer__full_name', 'stock_id', 'quantity',
+                                   'pos_transaction_id'))
+        pos_transactions = list(POSTransaction.objects
+                                .filter(orderitem__stock__batch_number=batch_number)
+                                .order_by('pos_transaction_id')
+                                .values('pos_transaction_id', 'order_id', 'customer_id', 'barcode', 'quantity',
+                                        'pos_terminal_id', 'transaction_date', 'status')
+                                .distinct())
+        return Response({
+            'batch_number': batch_number,
+            'placements': placements,
+            'order_items': order_items,
+            'pos_transactions': pos_transactions,
+        })
         
     @transaction.atomic
     def perform_create(self, serializer):
         """
-        Create a new placement and update product quantity
+        Create a new placement, drawing its quantity from the product pool.
+
+        Product.quantity is the stock not yet placed: create takes the placement
+        quantity from it, update takes/returns the difference and destroy returns
+        what is left, whatever the transaction type (which only labels the ledger row).
         """
-        # Get the product before saving the placement
-        product_id = self.request.data.get('product')
-        product = get_object_or_404(Product, product_id=product_id)
         transaction_type = self.request.data.get('transaction_type', 'INBOUND')
-        if transaction_type not in dict(StockTransactions.TRANSACTION_TYPES):
+        if transaction_type not in dict(StockTransactions.MOVEMENT_TYPES):
             raise serializers.ValidationError(f"Invalid transaction type: {transaction_type}")
-        
-        # Get the quantity from the request data
-        placement_quantity = int(self.request.data.get('quantity', 0))
-        
-        # Check if there's enough quantity in product
-        if transaction_type == 'INBOUND':
-            # For INBOUND, we might want to ADD to product quantity instead of subtract
-            # Adjust this logic based on your business requirements
-            pass  # No validation needed for adding stock
-        elif transaction_type == 'OUTBOUND':
-            # For OUTBOUND, check if there's enough stock
-            if product.quantity < placement_quantity:
-                raise serializers.ValidationError(
-                    f"Insufficient stock. Available: {product.quantity}, Requested: {placement_quantity}"
-                )
-        
-        # Save the placement
+
+        product = serializer.validated_data['product']
+        placement_quantity = serializer.validated_data.get('quantity', 0)
+
+        # The conditional UPDATE refuses to take the pool negative
+        adjust_product_quantity(product.product_id, -placement_quantity)
+        logger.info(f"{transaction_type}: Placing {placement_quantity} of product {product.product_id}")
+
         instance = serializer.save()
-        if transaction_type == 'INBOUND':
-            product.quantity += placement_quantity  # Add stock for inbound
-            logger.info(f"INBOUND: Adding {placement_quantity} to product {product.product_id}")
-        elif transaction_type == 'OUTBOUND':
-            product.quantity -= placement_quantity  # Remove stock for outbound
-            logger.info(f"OUTBOUND: Removing {placement_quantity} from product {product.product_id}")
-        # Update product quantity
-        product.quantity -= placement_quantity
-        product.save()
 
         StockTransactions.objects.create(
             stock=instance,
@@ -398,88 +660,305 @@ class WarehouseStockPlacementViewSet(viewsets.ModelViewSet):
     @transaction.atomic
     def perform_update(self, serializer):
         """
-        Update existing placement and adjust product quantity accordingly
+        Update existing placement and adjust product quantity accordingly.
+
+        Descriptive fields are written with a plain UPDATE and the quantity with
+        a compare-and-set against the value this request read, so a concurrent
+        movement is never overwritten by a whole-row save.
         """
-        instance = self.get_object()
+        instance = serializer.instance
+        fields = dict(serializer.validated_data)
         old_quantity = instance.quantity
-        product = instance.product
-        
-        # Save the updated placement
-        instance = serializer.save()
-        new_quantity = instance.quantity
-        
-        # Calculate the difference and adjust product quantity
+        new_quantity = fields.pop('quantity', old_quantity)
+
+        if fields:
+            WarehouseStockPlacement.objects.filter(stock_id=instance.stock_id).update(
+                **fields, last_updated=timezone.now()
+            )
+
+        moved = 'location' in fields and fields['location'].pk != instance.location_id
         quantity_diff = new_quantity - old_quantity
         if quantity_diff != 0:
-            if product.quantity < quantity_diff:
-                raise serializers.ValidationError(
-                    f"Insufficient stock. Available: {product.quantity}, Requested increase: {quantity_diff}"
-                )
-            product.quantity -= quantity_diff
-            product.save()
+            # A move re-occupies both locations below; only the new one needs room
+            set_placement_quantity(instance, old_quantity, new_quantity, occupy=not moved)
+            # Stock moved into the placement is taken from the product pool and vice versa
+            adjust_product_quantity(instance.product_id, -quantity_diff)
+
+        updated = WarehouseStockPlacement.objects.get(stock_id=instance.stock_id)
+        if (updated.product_id, updated.warehouse_id, updated.weight) != (instance.product_id, instance.warehouse_id, instance.weight):
+            # Move the whole contribution from the old StockLevel to the new one
+            bump_stock_level(
+                instance.product_id, instance.warehouse_id,
+                on_hand=-updated.quantity, reserved=-updated.reserved_quantity, weight=-instance.weight,
+            )
+            add_placement_to_levels(updated)
+            StockAlert.objects.filter(placement_id=updated.stock_id, is_open=True).update(
+                product_id=updated.product_id, warehouse_id=updated.warehouse_id
+            )
+        if (updated.location_id, updated.weight) != (instance.location_id, instance.weight):
+            # Vacate the old location and occupy the new one (capacity enforced)
+            vacated = old_quantity if moved and quantity_diff else updated.quantity
+            occupy_location(instance.location_id, quantity=-vacated, weight=-instance.weight, placements=-1)
+            add_placement_to_location(updated)
+        if (updated.min_stock_level, updated.max_stock_level) != (instance.min_stock_level, instance.max_stock_level):
+            sync_alerts(placement_thresholds(updated.stock_id))
+        serializer.instance = updated
 
+    @transaction.atomic
     def perform_destroy(self, instance):
         """
         Delete placement and add quantity back to product
         """
-        product = instance.product
         placement_quantity = instance.quantity
+        logger.info(f"Deleting placement {instance.stock_id} for product {instance.product_id} with quantity {placement_quantity}")
+
+        # Only delete the placement if nobody moved stock since it was read
+        deleted, _ = WarehouseStockPlacement.objects.filter(
+            stock_id=instance.stock_id, quantity=placement_quantity
+        ).delete()
+        if not deleted:
+            raise StockConflict("Stock placement changed concurrently; reload and retry")
+
+        if placement_quantity > 0:
+            adjust_product_quantity(instance.product_id, placement_quantity)
+        logger.info(f"Placement {instance.stock_id} deleted, {placement_quantity} returned to product {instance.product_id}")
+    
+class StockTransactionsViewSet(SparseFieldsetViewMixin, ExportMixin, viewsets.ModelViewSet):
+    queryset = StockTransactions.objects.all()
+    serializer_class = StockTransactionsSerializer
+    permission_classes = [IsAuthenticated]
+    export_filename = 'stock-transactions'
+    export_columns = [
+        ('Transaction ID', 'transaction_id'), ('Stock ID', 'stock_id'), ('Product', 'stock__product__name'),
+        ('Warehouse', 'stock__warehouse__name'), ('Transaction Type', 'transaction_type'),
+        ('Quantity', 'quantity'), ('Transaction Date', 'transaction_date'),
+    ]
 
-        logger.info(f"Deleting placement {instance.stock_id} for product {product.product_id} with quantity {placement_quantity}")
-        logger.info(f"Current product quantity: {product.quantity}")
+    @transaction.atomic
+    def perform_create(self, serializer):
+        # Move the placement first; the ledger row is only written if the stock was there
+        data = serializer.validated_data
+        apply_transaction(data['stock'], data['transaction_type'], data['quantity'])
+        serializer.save()
 
-        try:
-            with transaction.atomic():
-                # Lock the product row to prevent concurrent updates
-                product = Product.objects.select_for_update().get(product_id=product.product_id)
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser])
+    def batch(self, request):
+        """
+        Apply many INBOUND/OUTBOUND movements in one atomic unit.
+        POST {"movements": [{"stock_id": 1, "transaction_type": "INBOUND", "quantity": 5}, ...]}
+        (a bare list is accepted too). Either every movement is applied or none is,
+        with per-item errors keyed by their position in the payload.
+        """
+        items = request.data.get('movements') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Provide a non-empty 'movements' list"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.STOCK_BATCH_MAX_ITEMS:
+            return Response({"error": f"At most {settings.STOCK_BATCH_MAX_ITEMS} movements per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        movements, errors = validate_movements(items)
+        if not errors:
+            created, errors = apply_movements(movements)
+        if errors:
+            return Response(
+                {'errors': [{'index': index, 'errors': errors[index]} for index in sorted(errors)]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-                # Verify quantity is positive before updating
-                if placement_quantity < 0:
-                    logger.error(f"Invalid placement quantity: {placement_quantity}")
-                    raise ValueError("Cannot add back negative quantity to product")
+        placements = len({placement.pk for _, placement, _, _ in movements})
+        logger.info(f"Applied {created} stock movements across {placements} placements")
+        return Response({'created': created, 'placements': placements}, status=status.HTTP_201_CREATED)
 
-                # Update product quantity
-                product.quantity += placement_quantity
-                logger.info(f"New product quantity will be: {product.quantity}")
 
-                # Save the product
-                product.save()
-                logger.info(f"Product {product.product_id} saved with new quantity: {product.quantity}")
+class StockTransactionArchiveViewSet(ExportMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Ledger history moved out of /stock-transactions/ by archive_stock_transactions.
+    Filter with ?stock_id=, ?period=YYYY-MM, ?date_from=/?date_to=YYYY-MM-DD and
+    ?transaction_type=; the month and per-placement filters use the archive indexes.
+    """
+    queryset = StockTransactionArchive.objects.select_related('stock__product', 'stock__warehouse')
+    serializer_class = StockTransactionArchiveSerializer
+    permission_classes = [IsAuthenticated]
+    export_filename = 'stock-transactions-archive'
+    export_columns = [
+        ('Transaction ID', 'transaction_id'), ('Stock ID', 'stock_id'), ('Product', 'stock__product__name'),
+        ('Warehouse', 'stock__warehouse__name'), ('Transaction Type', 'transaction_type'),
+        ('Quantity', 'quantity'), ('Transaction Date', 'transaction_date'), ('Period', 'period'),
+    ]
 
-                # Delete the placement
-                instance.delete()
-                logger.info(f"Placement {instance.stock_id} deleted successfully")
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        try:
+            if params.get('stock_id'):
+                queryset = queryset.filter(stock_id=int(params['stock_id']))
+            if params.get('period'):
+                queryset = queryset.filter(period=datetime.datetime.strptime(params['period'], '%Y-%m').date())
+            if params.get('date_from'):
+                queryset = queryset.filter(transaction_date__date__gte=datetime.date.fromisoformat(params['date_from']))
+            if params.get('date_to'):
+                queryset = queryset.filter(transaction_date__date__lte=datetime.date.fromisoformat(params['date_to']))
+        except ValueError:
+            raise ValidationError({"detail": "stock_id must be an integer, period YYYY-MM and date_from/date_to YYYY-MM-DD"})
+        if params.get('transaction_type'):
+            queryset = queryset.filter(transaction_type=params['transaction_type'].upper())
+        return queryset
 
-        except Exception as e:
-            logger.error(f"Error in perform_destroy: {str(e)}")
-            raise
-    
-class StockTransactionsViewSet(viewsets.ModelViewSet):
-    queryset = StockTransactions.objects.all()
-    serializer_class = StockTransactionsSerializer
+
+class StockLevelViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Stock per product and warehouse, read straight from the StockLevel summary.
+    Filter with ?product_id=, ?warehouse_id= and ?available_lte= (low stock).
+    """
+    queryset = StockLevel.objects.select_related('product', 'warehouse')
+    serializer_class = StockLevelSerializer
     permission_classes = [IsAuthenticated]
+    last_modified_field = 'updated_at'
 
-    def perform_create(self, serializer):
-        # Add business logic, e.g., update stock quantity
-        instance = serializer.save()
-        stock = instance.stock
-        if instance.transaction_type == 'INBOUND':
-            stock.quantity += instance.quantity
-        elif instance.transaction_type == 'OUTBOUND':
-            stock.quantity -= instance.quantity
-        stock.save()    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        try:
+            if params.get('product_id'):
+                queryset = queryset.filter(product_id=int(params['product_id']))
+            if params.get('warehouse_id'):
+                queryset = queryset.filter(warehouse_id=int(params['warehouse_id']))
+            if params.get('available_lte'):
+                queryset = queryset.filter(available__lte=int(params['available_lte']))
+        except ValueError:
+            raise ValidationError({"detail": "product_id, warehouse_id and available_lte must be integers"})
+        return queryset
 
 
+class StockAlertViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Min/max stock alerts, newest first. Open alerts by default; ?status=resolved
+    or ?status=all for history. Filter with ?warehouse_id=, ?product_id=, ?kind=LOW|OVER.
+    Open-alert pages are keyset scans over the (is_open[, warehouse], opened_at) indexes.
+    """
+    queryset = StockAlert.objects.select_related('product', 'warehouse', 'placement__location')
+    serializer_class = StockAlertSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        alert_status = params.get('status', 'open')
+        if alert_status not in ('open', 'resolved', 'all'):
+            raise ValidationError({"status": "Expected one of: open, resolved, all"})
+        if alert_status != 'all':
+            queryset = queryset.filter(is_open=alert_status == 'open')
+        kind = params.get('kind')
+        if kind:
+            if kind not in dict(StockAlert.KIND_CHOICES):
+                raise ValidationError({"kind": f"Expected one of: {', '.join(dict(StockAlert.KIND_CHOICES))}"})
+            queryset = queryset.filter(kind=kind)
+        try:
+            if params.get('warehouse_id'):
+                queryset = queryset.filter(warehouse_id=int(params['warehouse_id']))
+            if params.get('product_id'):
+                queryset = queryset.filter(product_id=int(params['product_id']))
+        except ValueError:
+            raise ValidationError({"detail": "warehouse_id and product_id must be integers"})
+        return queryset
+
 
 class WarehouseStockAuditListCreateView(generics.ListCreateAPIView):
     queryset = WarehouseStockAudit.objects.all()
     serializer_class = WarehouseStockAuditSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if params.get('audit_batch'):
+            queryset = queryset.filter(audit_batch=params['audit_batch'])
+        if params.get('status'):
+            queryset = queryset.filter(status=params['status'].upper())
+        if params.get('warehouse_id'):
+            queryset = queryset.filter(warehouse_id=params['warehouse_id'])
+        return queryset
+
+
+class WarehouseStockAuditBatchView(APIView):
+    """
+    Submit a whole count sheet and get its variance report back.
+    JSON: {"warehouse": 1, "counts": [{"product": 1, "location": 2, "recorded_quantity": 10}, ...],
+           "full_count": false, "adjust": false}
+    or multipart with a CSV `file` (columns product, location, recorded_quantity) and the
+    other keys as form fields. full_count treats stocked product/locations missing from the
+    sheet as counted at 0; adjust posts the variances as INBOUND/OUTBOUND transactions.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    def post(self, request):
+        data = request.data
+
+        def flag(name):
+            return str(data.get(name, False)).lower() in ('1', 'true', 'yes', 'on')
+
+        try:
+            warehouse_id = int(data.get('warehouse'))
+        except (TypeError, ValueError):
+            return Response({"error": "warehouse is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if warehouse_cache.get(warehouse_id) is None:
+            return Response({"error": f"Warehouse {warehouse_id} does not exist"}, status=status.HTTP_404_NOT_FOUND)
+
+        if 'file' in request.FILES:
+            try:
+                frame = read_count_sheet(request.FILES['file'])
+            except (ValueError, UnicodeDecodeError) as e:
+                return Response({"error": f"Could not read count sheet: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        elif isinstance(data.get('counts'), list) and all(isinstance(line, dict) for line in data['counts']):
+            frame = pd.DataFrame.from_records(data['counts'])
+        else:
+            return Response({"error": "Provide a 'counts' list or a CSV 'file'"}, status=status.HTTP_400_BAD_REQUEST)
+        if frame.empty:
+            return Response({"error": "The count sheet is empty"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(frame) > settings.STOCK_AUDIT_MAX_ROWS:
+            return Response({"error": f"At most {settings.STOCK_AUDIT_MAX_ROWS} lines per count sheet"}, status=status.HTTP_400_BAD_REQUEST)
+
+        counts, errors = parse_counts(frame, warehouse_id)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        audit_batch, report, adjust_errors = submit_count_sheet(
+            warehouse_id, counts, full_count=flag('full_count'), adjust=flag('adjust'),
+        )
+        variances = report[report['variance'] != 0]
+        logger.info(f"Count sheet {audit_batch}: {len(report)} lines, {len(variances)} with variance in warehouse {warehouse_id}")
+        return Response({
+            'audit_batch': audit_batch,
+            'warehouse': warehouse_id,
+            'lines': len(report),
+            'matched': len(report) - len(variances),
+            'with_variance': len(variances),
+            'net_variance': int(report['variance'].sum()),
+            'absolute_variance': int(report['variance'].abs().sum()),
+            'adjusted': int(report['adjusted'].sum()),
+            'adjustment_errors': [
+                {'product': int(report.at[index, 'product_id']), 'location': int(report.at[index, 'location_id']), 'errors': messages}
+                for index, messages in sorted(adjust_errors.items())
+            ],
+            'variances': variances.to_dict('records'),
+        }, status=status.HTTP_201_CREATED)
+
 class WarehouseStockAuditDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = WarehouseStockAudit.objects.all()
     serializer_class = WarehouseStockAuditSerializer
     permission_classes = [IsAuthenticated]
+
+    def perform_update(self, serializer):
+        """Recording the count of a planned cycle-count task completes it and stores its variance."""
+        audit = serializer.save()
+        if audit.status == WarehouseStockAudit.PLANNED and audit.recorded_quantity is not None:
+            system_quantity = WarehouseStockPlacement.objects.filter(
+                warehouse_id=audit.warehouse_id, product_id=audit.product_id, location_id=audit.location_id,
+            ).aggregate(total=Sum('quantity'))['total'] or 0
+            audit.status = WarehouseStockAudit.COUNTED
+            audit.system_quantity = system_quantity
+            audit.variance = audit.recorded_quantity - system_quantity
+            audit.save(update_fields=['status', 'system_quantity', 'variance'])
     
 
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -529,9 +1008,10 @@ class UserAPIView(APIView):
     def get(self, request):
         return Response({"username": request.user.username, "message": "Protected data"})        
     
-class CustomerListCreateView(generics.ListCreateAPIView):
+class CustomerListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    last_modified_field = 'last_updated'
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -540,9 +1020,10 @@ class CustomerListCreateView(generics.ListCreateAPIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class CustomerDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CustomerDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    last_modified_field = 'last_updated'
     lookup_field = 'customer_id'
 
     def put(self, request, *args, **kwargs):
@@ -578,8 +1059,8 @@ class CustomerAccountViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
 
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all().select_related('customer').prefetch_related('items__product', 'items__warehouse', 'items__location')
+class OrderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Order.objects.all().select_related('customer').prefetch_related('items__product', 'items__warehouse', 'items__location', 'items__stock')
     serializer_class = OrderSerializer
     http_method_names = ['get', 'post', 'put', 'delete']
 
@@ -592,55 +1073,18 @@ class OrderViewSet(viewsets.ModelViewSet):
             logger.error(f"Validation error: {e}")
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Save the order with items
-        order = serializer.save()
-
-        total_price = 0
-        for item in order.items.all():  # Items are already created by the serializer
-            product = item.product
-            quantity = item.quantity
-            warehouse = item.warehouse
-            location = item.location
-
-           # Check stock availability
-            stock = (WarehouseStockPlacement.objects
-                     .select_related('product')
-                     .filter(product=product, warehouse=warehouse, location=location)
-                     .first())
-            logger.info(f"Checking stock for {product.name} at {warehouse.name}")
-            if not stock or stock.quantity - stock.reserved_quantity < quantity:
-                logger.warning(f"Insufficient stock for {product.name} at {warehouse.name}")
-                return Response(
-                    {"error": f"Insufficient stock for {product.name}"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-          #  Reserve stock
-            stock.reserved_quantity += quantity
-            stock.save()
-
-            # Create POS transaction
-            pos_transaction = POSTransaction.objects.create(
-                order=order,
-                customer=order.customer,
-                product=product,
-                barcode=product.barcode,
-                quantity=quantity,
-                pos_terminal_id=order.pos_terminal_id or "POS_DEFAULT",
-                status='Verified'
-            )
-
-            # Update the OrderItem with the POS transaction
-            item.pos_transaction = pos_transaction
-            item.save()
-
-            total_price += item.price
+        # Reserve every line in FEFO order before anything is written
+        lines = serializer.validated_data['items']
+        try:
+            allocations = allocate_order_lines(lines)
+        except serializers.ValidationError as e:
+            logger.warning(f"Could not allocate order: {e.detail[0]}")
+            transaction.set_rollback(True)
+            return Response({"error": e.detail[0]}, status=e.status_code)
 
-        # Update order
-        order.total_price = total_price
-        order.status = 'Reserved'
-        order.reserved_at = timezone.now()
-        order.save()
+        # Save the order with one item (and POS transaction) per allocated batch
+        order = serializer.save(allocations=allocations, status='Reserved', reserved_at=timezone.now())
+        order = self.get_queryset().get(pk=order.pk)
 
         logger.info(f"Order {order.order_id} created successfully")
         return Response(self.get_serializer(order).data, status=status.HTTP_201_CREATED)
\ No newline at end of file